@@ -1,34 +1,98 @@
-from flask import Flask, send_from_directory
-from .routes.index_route import init_index_route
-from .routes.predict_route import init_predict_route
-from .routes.reports_route import init_reports_route
+import os
 
 def create_app(config):
+    # Flask y las rutas se importan aquí: así app.reports_store y app.inference se pueden
+    # importar (generador de informes, entrenamiento, scripts) sin cargar la app web
+    from flask import Flask, send_from_directory
+    from .routes.index_route import init_index_route
+    from .routes.predict_route import init_predict_route
+    from .routes.batch_predict_route import init_batch_predict_route
+    from .routes.reports_route import init_reports_route
+    from .routes.health_route import init_health_route
+    from .routes.metrics_route import init_metrics_route
+    from .inference import MicroBatcher, PerceptualCache, create_backend, served_model_path
+    from .inference.labels import load_class_labels
+    from .metrics import ApiMetrics, stats_collector
+    from .reports_store import ReportStore
+    from model_bundle import load_bundle
+
     app = Flask(__name__)
+    app.config["MODEL_READY"] = False
 
-    # Modelo y clases
-    import tensorflow as tf
-    from tensorflow.keras.models import load_model
-    import json
+    # Bundle del modelo: las clases vienen de sus metadatos, en el orden de las salidas.
+    # Los modelos sin metadatos usan el orden heredado (class_labels.json invertido).
+    _, legacy_class_names = load_class_labels(config["classes_path"])
+    # Con el backend tflite los metadatos se leen junto al .tflite: el .keras no tiene por qué estar desplegado
+    bundle = load_bundle(served_model_path(config), config["image_size"], fallback_class_names=legacy_class_names)
+    class_translations, default_class_names = load_class_labels(config["classes_path"], bundle.class_names)
 
-    model = load_model(config["model_path"])
+    print(default_class_names)
 
-    with open(config["classes_path"], "r", encoding="utf-8") as f:
-        classes = json.load(f)
-    class_translations = [c["class"]["translations"] for c in classes]
-    class_translations = class_translations[::-1]
-    default_class_names = [c["class"]["name"] for c in classes]
-    default_class_names = default_class_names[::-1]
+    # Idiomas con traducción (más el de por defecto): acotan las series de la etiqueta "language"
+    languages = {config["default_language"]}.union(*(t.keys() for t in class_translations))
+    metrics = ApiMetrics(languages)
 
-    print(default_class_names)
+    # Backend de inferencia (keras o tflite): carga del modelo + warm-up, que es la primera predicción
+    backend = create_backend(config, bundle)
+    app.config["WARMUP_SECONDS"] = backend.warmup()
+    bundle.record_first_prediction(app.config["WARMUP_SECONDS"])
+    bundle.log_cold_start()
+    for phase, seconds in bundle.timings.items():
+        metrics.startup.set(seconds, phase=phase)
+    metrics.startup.set(app.config["WARMUP_SECONDS"], phase="warmup")
+    metrics.registry.register_collector(stats_collector(
+        "iavision_forward", lambda: backend.stats()["forward_latency"],
+        {"p50_ms": "Latencia p50 del forward pass (ms)", "p99_ms": "Latencia p99 del forward pass (ms)"}))
+
+    # Micro-batching: agrupa peticiones concurrentes en un solo forward pass
+    batching_config = config.get("batching", {})
+    batcher = None
+    if batching_config.get("enabled", False):
+        batcher = MicroBatcher(
+            backend.predict,
+            max_batch_size=batching_config.get("max_batch_size", 16),
+            max_wait_ms=batching_config.get("max_wait_ms", 10),
+            log_batches=batching_config.get("log_batches", False)
+        )
+        predictor = batcher.predict
+        metrics.registry.register_collector(stats_collector("iavision_batching", batcher.stats, {
+            "batches": "Lotes ejecutados (acumulado)",
+            "mean_occupancy": "Ocupación media de los lotes",
+            "queue_depth": "Peticiones esperando lote"
+        }))
+    else:
+        predictor = lambda image_array: backend.predict(image_array[None, ...])[0]
+
+    # Caché de resultados por hash perceptual (frames repetidos de la cámara)
+    cache_config = config.get("cache", {})
+    cache = None
+    if cache_config.get("enabled", False):
+        cache = PerceptualCache(
+            max_entries=cache_config.get("max_entries", 256),
+            ttl_seconds=cache_config.get("ttl_seconds", 3.0),
+            max_distance=cache_config.get("max_hamming_distance", 4)
+        )
+        metrics.registry.register_collector(stats_collector("iavision_cache", cache.stats, {
+            "hits": "Aciertos de la caché perceptual (acumulado)",
+            "misses": "Fallos de la caché perceptual (acumulado)",
+            "entries": "Entradas en la caché perceptual"
+        }))
 
     # Registro de rutas
+    init_metrics_route(app, metrics)
+    init_health_route(app)
     init_index_route(app)
-    init_predict_route(app, model, class_translations, default_class_names, tuple(config["image_size"]), config["default_language"])
-    init_reports_route(app)
+    init_predict_route(app, predictor, class_translations, default_class_names, tuple(config["image_size"]), config["default_language"], backend, batcher, cache, metrics)
+    init_batch_predict_route(app, backend, class_translations, default_class_names, tuple(config["image_size"]), config["default_language"], config.get("batch_predict"), metrics)
+    # Índice SQLite de los informes (los JSON de reports/ siguen siendo la fuente de verdad)
+    reports_config = config.get("reports", {})
+    reports_dir = reports_config.get("dir") or os.path.join(os.path.dirname(app.root_path), "reports")
+    report_store = ReportStore(reports_dir, reports_config.get("db_path"), reports_config.get("sync_interval_seconds", 2.0))
+    init_reports_route(app, report_store, reports_config)
 
     @app.route("/reports/<path:filename>")
     def serve_reports(filename):
         return send_from_directory("../reports", filename)
 
+    # MODEL_READY lo activa quien sirve la app (main.py, serve.py, asgi) cuando empieza a aceptar conexiones
     return app
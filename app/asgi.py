@@ -0,0 +1,133 @@
+import asyncio
+import json
+import threading
+
+
+class AdmissionController:
+    """Middleware ASGI que acota las inferencias en curso y rechaza el exceso con 503.
+
+    Las peticiones a rutas protegidas esperan un hueco del semáforo; si ya hay
+    ``max_queue`` esperando (o la espera supera ``max_queue_wait_seconds``) se
+    responde de inmediato 503 con ``Retry-After`` en lugar de acumularlas.
+    """
+
+    def __init__(self, app, max_in_flight=4, max_queue=32, max_queue_wait_seconds=5.0,
+                 retry_after_seconds=1, guarded_paths=("/predict",), on_startup=None):
+        self.app = app
+        self.on_startup = on_startup
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait_seconds
+        self.retry_after = str(int(retry_after_seconds))
+        self.guarded_paths = tuple(guarded_paths)
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected_queue_full + self.rejected_timeout,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout
+            }
+
+    def _is_guarded(self, scope):
+        return (scope["type"] == "http" and scope.get("method") == "POST"
+                and scope["path"].startswith(self.guarded_paths))
+
+    async def _reject(self, send, reason):
+        body = json.dumps({"error": "Server busy", "reason": reason}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", self.retry_after.encode("ascii"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        # uvicorn completa el startup justo antes de empezar a aceptar conexiones
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if self.on_startup:
+                    self.on_startup()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if not self._is_guarded(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with self._lock:
+            # Capacidad total = inferencias en curso + cola de espera
+            if self.in_flight + self.waiting >= self.max_in_flight + self.max_queue:
+                self.rejected_queue_full += 1
+                reject = True
+            else:
+                self.waiting += 1
+                reject = False
+        if reject:
+            await self._reject(send, "queue_full")
+            return
+
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.waiting -= 1
+                self.rejected_timeout += 1
+            await self._reject(send, "queue_timeout")
+            return
+
+        with self._lock:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._semaphore.release()
+
+
+def create_asgi_app(config):
+    """App ASGI con las mismas rutas que ``create_app``; la inferencia corre en un pool de hilos."""
+    from a2wsgi import WSGIMiddleware
+    from . import create_app
+
+    asgi_config = config.get("asgi", {})
+    flask_app = create_app(config)
+    # El pool de a2wsgi es el executor donde se ejecutan las vistas (decodificación + inferencia)
+    wsgi_bridge = WSGIMiddleware(flask_app, workers=asgi_config.get("executor_workers", 16))
+    controller = AdmissionController(
+        wsgi_bridge,
+        max_in_flight=asgi_config.get("max_in_flight", 4),
+        max_queue=asgi_config.get("max_queue", 32),
+        max_queue_wait_seconds=asgi_config.get("max_queue_wait_seconds", 5.0),
+        retry_after_seconds=asgi_config.get("retry_after_seconds", 1),
+        guarded_paths=asgi_config.get("guarded_paths", ["/predict"]),
+        on_startup=lambda: flask_app.config.update(MODEL_READY=True)
+    )
+    flask_app.config["ADMISSION_STATS"] = controller.stats
+    return controller
@@ -0,0 +1,16 @@
+from .backends import InferenceBackend, KerasBackend, LatencyTracker, TFLiteBackend, create_backend, served_model_path
+from .batcher import MicroBatcher
+from .cache import PerceptualCache
+from image_hashing import dhash
+
+__all__ = [
+    "InferenceBackend",
+    "KerasBackend",
+    "LatencyTracker",
+    "MicroBatcher",
+    "PerceptualCache",
+    "TFLiteBackend",
+    "create_backend",
+    "dhash",
+    "served_model_path",
+]
@@ -0,0 +1,237 @@
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Ventana deslizante de latencias para calcular percentiles baratos."""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = np.array(self._samples, dtype=np.float64)
+            count = self._count
+        if samples.size == 0:
+            return {"count": count, "window": 0, "p50_ms": None, "p99_ms": None, "mean_ms": None}
+        p50, p99 = np.percentile(samples, [50, 99]) * 1000.0
+        return {
+            "count": count,
+            "window": int(samples.size),
+            "p50_ms": float(p50),
+            "p99_ms": float(p99),
+            "mean_ms": float(samples.mean() * 1000.0)
+        }
+
+
+class InferenceBackend:
+    """Interfaz común: ``predict`` recibe un lote float32 (N, H, W, C) y devuelve (N, clases)."""
+
+    name = "base"
+
+    def __init__(self, img_size, latency_window=1000):
+        self.img_size = tuple(img_size)
+        self.latency = LatencyTracker(latency_window)
+
+    def predict(self, batch):
+        started = time.perf_counter()
+        predictions = self._forward(batch)
+        self.latency.record(time.perf_counter() - started)
+        return predictions
+
+    def warmup(self, batch_size=1):
+        dummy = np.zeros((batch_size,) + self.img_size + (3,), dtype=np.float32)
+        started = time.perf_counter()
+        self._forward(dummy)
+        elapsed = time.perf_counter() - started
+        print(f"🔥 Warm-up {self.name} (batch={batch_size}) en {elapsed * 1000:.1f} ms")
+        return elapsed
+
+    def stats(self):
+        return {"backend": self.name, "forward_latency": self.latency.snapshot()}
+
+    def _forward(self, batch):
+        raise NotImplementedError
+
+
+class KerasBackend(InferenceBackend):
+    """Envuelve el modelo ``.keras`` en un ``tf.function`` con firma fija.
+
+    ``model.predict`` reconstruye el data adapter y el bucle de predicción en cada
+    llamada; aquí se traza una única función concreta (lote variable, 224x224x3)
+    que se reutiliza en todas las peticiones.
+    """
+
+    name = "keras"
+
+    def __init__(self, model, img_size, jit_compile=False, latency_window=1000):
+        super().__init__(img_size, latency_window)
+        import tensorflow as tf
+
+        self.model = model
+        signature = [tf.TensorSpec(shape=(None,) + self.img_size + (3,), dtype=tf.float32)]
+
+        @tf.function(input_signature=signature, jit_compile=jit_compile)
+        def serve(images):
+            return model(images, training=False)
+
+        self._serve = serve
+
+    def _forward(self, batch):
+        return self._serve(batch).numpy()
+
+
+# Tamaños de lote a los que TFLiteBackend rellena cada forward pass
+DEFAULT_TFLITE_BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+
+
+def _load_interpreter_class():
+    # Runtime ligero primero; TensorFlow completo solo como último recurso
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class TFLiteBackend(InferenceBackend):
+    """Sirve un artefacto ``.tflite`` con un pool de intérpretes.
+
+    Un intérprete TFLite no es thread-safe, así que cada forward pass toma un slot
+    del pool y lo devuelve al terminar; ``pool_size`` limita la concurrencia.
+
+    Cambiar la forma de la entrada obliga a ``allocate_tensors``, así que los lotes se
+    rellenan hasta el siguiente tamaño de ``batch_sizes`` y cada slot guarda un intérprete
+    ya reservado por tamaño (creado la primera vez que se usa). Los lotes mayores que el
+    último tamaño se procesan en trozos.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path, img_size, pool_size=2, num_threads=None, latency_window=1000,
+                 batch_sizes=DEFAULT_TFLITE_BATCH_SIZES):
+        super().__init__(img_size, latency_window)
+        self._interpreter_class = _load_interpreter_class()
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.pool_size = pool_size
+        self.batch_sizes = tuple(sorted(set(batch_sizes)))
+        self._pool = queue.Queue()
+        for _ in range(pool_size):
+            slot = {}
+            self._interpreter(slot, self.batch_sizes[0])
+            self._pool.put(slot)
+
+    def _interpreter(self, slot, batch_size):
+        """Intérprete del slot con la entrada fijada a ``batch_size`` (se crea y reserva una sola vez)."""
+        interpreter = slot.get(batch_size)
+        if interpreter is None:
+            interpreter = self._interpreter_class(model_path=self.model_path, num_threads=self.num_threads)
+            input_index = interpreter.get_input_details()[0]["index"]
+            interpreter.resize_tensor_input(input_index, (batch_size,) + self.img_size + (3,))
+            interpreter.allocate_tensors()
+            slot[batch_size] = interpreter
+        return interpreter
+
+    def _padded_size(self, n):
+        return next((size for size in self.batch_sizes if size >= n), self.batch_sizes[-1])
+
+    def _forward(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        slot = self._pool.get()
+        try:
+            outputs = []
+            for start in range(0, len(batch), self.batch_sizes[-1]):
+                chunk = batch[start:start + self.batch_sizes[-1]]
+                padded_size = self._padded_size(len(chunk))
+                if len(chunk) < padded_size:
+                    # Las filas de relleno se infieren y se descartan
+                    padded = np.zeros((padded_size,) + chunk.shape[1:], dtype=np.float32)
+                    padded[:len(chunk)] = chunk
+                    chunk_input = padded
+                else:
+                    chunk_input = chunk
+                interpreter = self._interpreter(slot, padded_size)
+                interpreter.set_tensor(interpreter.get_input_details()[0]["index"], chunk_input)
+                interpreter.invoke()
+                output = interpreter.get_tensor(interpreter.get_output_details()[0]["index"])
+                outputs.append(output[:len(chunk)].copy())
+            return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+        finally:
+            self._pool.put(slot)
+
+    def io_shapes(self):
+        """(forma de entrada, forma de salida) del modelo, para validarlo contra sus metadatos."""
+        slot = self._pool.get()
+        try:
+            interpreter = self._interpreter(slot, self.batch_sizes[0])
+            return (tuple(interpreter.get_input_details()[0]["shape"]),
+                    tuple(interpreter.get_output_details()[0]["shape"]))
+        finally:
+            self._pool.put(slot)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({"pool_size": self.pool_size, "idle_interpreters": self._pool.qsize(),
+                      "batch_sizes": list(self.batch_sizes)})
+        return stats
+
+
+def served_model_path(config):
+    """Artefacto que sirve el backend configurado: sus metadatos son los del bundle."""
+    inference_config = config.get("inference", {})
+    if inference_config.get("backend", "keras") == "tflite":
+        return inference_config["tflite_model_path"]
+    return config["model_path"]
+
+
+def create_backend(config, bundle=None):
+    """Construye el backend de inferencia indicado en la sección ``inference`` del config.
+
+    Con ``bundle`` (``model_bundle.load_bundle``) el modelo se valida contra sus metadatos
+    y los tiempos de import y carga quedan en ``bundle.timings``.
+    """
+    inference_config = config.get("inference", {})
+    backend_type = inference_config.get("backend", "keras")
+    img_size = tuple(config["image_size"])
+    latency_window = inference_config.get("latency_window", 1000)
+
+    if backend_type == "keras":
+        if bundle is not None:
+            model = bundle.load_keras_model()
+        else:
+            from tensorflow.keras.models import load_model
+            model = load_model(config["model_path"])
+        return KerasBackend(model, img_size,
+                            jit_compile=inference_config.get("jit_compile", False),
+                            latency_window=latency_window)
+    if backend_type == "tflite":
+        with bundle.phase("model_load") if bundle is not None else nullcontext():
+            backend = TFLiteBackend(inference_config["tflite_model_path"], img_size,
+                                    pool_size=inference_config.get("pool_size", 2),
+                                    num_threads=inference_config.get("num_threads"),
+                                    latency_window=latency_window,
+                                    batch_sizes=inference_config.get("batch_sizes", DEFAULT_TFLITE_BATCH_SIZES))
+        if bundle is not None:
+            bundle.validate_shapes(*backend.io_shapes())
+        return backend
+    raise ValueError(f"Backend de inferencia desconocido: {backend_type}")
@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Agrupa peticiones concurrentes y ejecuta un único forward pass por lote.
+
+    Cada llamada a ``submit`` encola una imagen ya preprocesada (H, W, C); un hilo
+    de fondo reúne hasta ``max_batch_size`` imágenes o espera como máximo
+    ``max_wait_ms`` desde la primera, invoca ``predict_fn`` sobre el lote y
+    entrega a cada llamador su propia fila del resultado.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10, log_batches=False):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser >= 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.log_batches = log_batches
+
+        self._queue = queue.Queue()
+        self._buffer = None
+        self._stopped = False
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._queue_wait_total = 0.0
+        self._size_histogram = [0] * (self.max_batch_size + 1)
+        self._last_batch_size = 0
+
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, image_array):
+        """Encola una imagen y devuelve un Future con su fila de predicciones."""
+        if self._stopped:
+            raise RuntimeError("MicroBatcher detenido")
+        future = Future()
+        self._queue.put((image_array, future, time.perf_counter()))
+        return future
+
+    def predict(self, image_array, timeout=None):
+        return self.submit(image_array).result(timeout=timeout)
+
+    def close(self, timeout=None):
+        self._stopped = True
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            mean_size = items / batches if batches else 0.0
+            return {
+                "enabled": True,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": batches,
+                "items": items,
+                "mean_batch_size": mean_size,
+                "mean_occupancy": mean_size / self.max_batch_size,
+                "last_batch_size": self._last_batch_size,
+                "mean_queue_wait_ms": (self._queue_wait_total / items * 1000.0) if items else 0.0,
+                "batch_size_histogram": {
+                    str(size): count for size, count in enumerate(self._size_histogram) if count
+                },
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def _collect(self):
+        """Bloquea hasta la primera petición y acumula el resto dentro de la ventana."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        items = [first]
+        stop = False
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            items.append(item)
+        return items, stop
+
+    def _batch_buffer(self, sample):
+        # Buffer reutilizable: evita reservar un tensor nuevo en cada lote
+        shape = (self.max_batch_size,) + tuple(sample.shape)
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.float32)
+        return self._buffer
+
+    def _run(self):
+        while True:
+            items, stop = self._collect()
+            if items:
+                self._process(items)
+            if stop:
+                break
+
+    def _process(self, items):
+        size = len(items)
+        started = time.perf_counter()
+        try:
+            buffer = self._batch_buffer(items[0][0])
+            batch = buffer[:size]
+            for i, (image_array, _, _) in enumerate(items):
+                batch[i] = image_array
+            predictions = np.asarray(self.predict_fn(batch))
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+
+        for i, (_, future, _) in enumerate(items):
+            future.set_result(predictions[i])
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._size_histogram[size] += 1
+            self._last_batch_size = size
+            self._queue_wait_total += sum(started - enqueued for _, _, enqueued in items)
+
+        if self.log_batches:
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            print(f"📦 Lote {size}/{self.max_batch_size} "
+                  f"({size / self.max_batch_size:.0%} ocupación) en {elapsed_ms:.1f} ms")
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PerceptualCache:
+    """LRU con TTL indexada por dHash; acepta coincidencias dentro de ``max_distance`` bits.
+
+    Pensada para los frames casi idénticos que envía la cámara mientras el cliente
+    sostiene el producto: el tamaño es pequeño, así que la búsqueda por distancia
+    de Hamming recorre todas las entradas.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=3.0, max_distance=4):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.max_distance = max_distance
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for entry_key, (stored_at, _) in list(self._entries.items()):
+                if now - stored_at > self.ttl:
+                    del self._entries[entry_key]
+                    self.expired += 1
+                    continue
+                distance = (entry_key ^ key).bit_count()
+                if distance < best_distance:
+                    best_key, best_distance = entry_key, distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "max_hamming_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
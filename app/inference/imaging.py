@@ -0,0 +1,58 @@
+import io
+import threading
+
+import numpy as np
+from PIL import Image
+
+import preprocessing
+
+# Tipos de contenido aceptados como cuerpo binario en /predict
+BINARY_CONTENT_TYPES = ("image/jpeg", "image/png", "image/webp", "application/octet-stream")
+
+_thread_buffers = threading.local()
+
+
+def open_image(source, img_size):
+    """Abre la imagen y, si es JPEG, activa el modo draft para decodificar a escala reducida.
+
+    Con ``draft`` libjpeg aplica el escalado DCT (1/2, 1/4, 1/8) y solo decodifica
+    la resolución mínima que sigue cubriendo ``img_size``.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+    if image.format == "JPEG":
+        image.draft("RGB", img_size)
+    return image
+
+
+def resize_rgb(image, img_size):
+    """Decodifica (si aún no lo está), convierte a RGB y redimensiona a ``img_size``."""
+    return preprocessing.resize_pil(image, img_size)
+
+
+def normalize(image, out=None):
+    """Escala píxeles [0, 255] a [-1, 1] escribiendo directamente sobre ``out`` (float32)."""
+    # Única copia intermedia: la vista uint8 de los píxeles de PIL
+    return preprocessing.normalize(np.asarray(image), out=out)
+
+
+def to_model_input(image, img_size, out=None):
+    """Redimensiona y normaliza a [-1, 1] escribiendo directamente sobre ``out`` (float32)."""
+    return normalize(resize_rgb(image, img_size), out=out)
+
+
+def thread_buffer(img_size):
+    """Buffer float32 preasignado por hilo, reutilizado entre peticiones."""
+    shape = (img_size[1], img_size[0], 3)
+    buffer = getattr(_thread_buffers, "buffer", None)
+    if buffer is None or buffer.shape != shape:
+        buffer = np.empty(shape, dtype=np.float32)
+        _thread_buffers.buffer = buffer
+    return buffer
+
+
+def decode_image(source, img_size, out=None):
+    """Bytes o fichero de imagen -> tensor (H, W, 3) listo para el modelo."""
+    image = open_image(source, img_size)
+    return to_model_input(image, img_size, out=out)
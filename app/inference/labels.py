@@ -0,0 +1,27 @@
+import json
+
+
+def load_class_labels(classes_path, class_names=None):
+    """(traducciones, nombres) en el orden de índices que usa la API.
+
+    Con ``class_names`` (los metadatos del modelo, en el orden de sus salidas) las
+    traducciones de ``class_labels.json`` se buscan por nombre. Sin metadatos se mantiene
+    el orden heredado: ``class_labels.json`` invertido.
+    """
+    with open(classes_path, "r", encoding="utf-8") as f:
+        classes = json.load(f)
+    if class_names is None:
+        class_translations = [c["class"]["translations"] for c in classes][::-1]
+        default_class_names = [c["class"]["name"] for c in classes][::-1]
+        return class_translations, default_class_names
+
+    translations_by_name = {c["class"]["name"]: c["class"]["translations"] for c in classes}
+    missing = [name for name in class_names if name not in translations_by_name]
+    if missing:
+        print(f"⚠️ Clases del modelo sin traducciones en {classes_path}: {missing}")
+    return [translations_by_name.get(name, {}) for name in class_names], list(class_names)
+
+
+def translate_label(index, lang, class_translations, default_class_names):
+    """Nombre de la clase en el idioma pedido, o el nombre por defecto si no hay traducción."""
+    return class_translations[index].get(lang, default_class_names[index])
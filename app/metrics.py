@@ -0,0 +1,223 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets en segundos, de 0.5 ms a 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.82, 0.9, 0.95, 0.99, 1.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = self.header()
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                  for key, value in values]
+        return lines
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = self.header()
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                  for key, value in values]
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Se guarda el conteo por bucket (no acumulado) y se acumula al exportar
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            snapshot = sorted((key, (list(counts), total, count))
+                              for key, (counts, total, count) in self._series.items())
+        lines = self.header()
+        for key, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro mínimo compatible con el formato de texto de Prometheus (sin dependencias)."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """``collector()`` devuelve métricas calculadas en el momento del scrape."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collector in self._collectors:
+            for metric in collector():
+                lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+class ApiMetrics:
+    """Métricas de la API de predicción."""
+
+    OTHER_LANGUAGE = "other"
+
+    def __init__(self, languages=None):
+        self.registry = MetricsRegistry()
+        # El idioma lo elige el cliente: solo los configurados tienen serie propia
+        self.languages = frozenset(languages or ())
+        self.stage_duration = self.registry.histogram(
+            "iavision_stage_duration_seconds",
+            "Duración de cada etapa del procesamiento de una petición",
+            ("endpoint", "stage"))
+        self.request_duration = self.registry.histogram(
+            "iavision_http_request_duration_seconds",
+            "Duración total de la petición HTTP",
+            ("endpoint",))
+        self.requests = self.registry.counter(
+            "iavision_http_requests_total",
+            "Peticiones HTTP por endpoint y código de estado",
+            ("endpoint", "status"))
+        self.predictions = self.registry.counter(
+            "iavision_predictions_total",
+            "Predicciones por clase, idioma y origen (modelo o caché)",
+            ("endpoint", "class", "language", "cached"))
+        self.confidence = self.registry.histogram(
+            "iavision_prediction_confidence",
+            "Distribución de la confianza de la clase predicha",
+            ("endpoint",), buckets=CONFIDENCE_BUCKETS)
+        self.startup = self.registry.gauge(
+            "iavision_startup_seconds",
+            "Tiempo de arranque por fase (metadatos, import, carga del modelo, warm-up, hasta la primera predicción)",
+            ("phase",))
+
+    @contextmanager
+    def stage(self, endpoint, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_duration.observe(time.perf_counter() - started, endpoint=endpoint, stage=stage)
+
+    def language_label(self, language):
+        """El idioma tal cual si está configurado; cualquier otro valor se agrupa en "other"."""
+        return language if language in self.languages else self.OTHER_LANGUAGE
+
+    def record_prediction(self, endpoint, class_name, language, confidence, cached=False):
+        self.predictions.inc(endpoint=endpoint, language=self.language_label(language), cached=str(cached).lower(),
+                             **{"class": class_name})
+        self.confidence.observe(confidence, endpoint=endpoint)
+
+    def render(self):
+        return self.registry.render()
+
+
+def stats_collector(prefix, stats_fn, fields):
+    """Convierte campos numéricos de un ``stats()`` existente en gauges en cada scrape."""
+    def collect():
+        stats = stats_fn()
+        metrics = []
+        for field, documentation in fields.items():
+            value = stats.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauge = Gauge(f"{prefix}_{field}", documentation)
+                gauge.set(value)
+                metrics.append(gauge)
+        return metrics
+    return collect
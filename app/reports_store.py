@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Solo los informes de dataset tienen filas por clase consultables
+REPORT_PATTERN = re.compile(r"^dataset_report_.+_(\d{14})\.json$")
+SIZE_RANGES = {"small": (0, 500), "medium": (500, 2001), "large": (2001, None)}
+SORT_ORDERS = {
+    "name-asc": "class ASC",
+    "name-desc": "class DESC",
+    "count-asc": "train_count + validation_count ASC, class ASC",
+    "count-desc": "train_count + validation_count DESC, class ASC"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL,
+    name TEXT NOT NULL,
+    generated_at TEXT NOT NULL,
+    schema_version INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    class_count INTEGER NOT NULL,
+    train_total INTEGER NOT NULL,
+    validation_total INTEGER NOT NULL,
+    summary TEXT,
+    UNIQUE (version, name)
+);
+CREATE INDEX IF NOT EXISTS reports_version ON reports(version, generated_at);
+CREATE TABLE IF NOT EXISTS report_classes (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    class TEXT NOT NULL,
+    train_count INTEGER NOT NULL,
+    train_status TEXT,
+    validation_count INTEGER NOT NULL,
+    validation_status TEXT,
+    stats TEXT,
+    PRIMARY KEY (report_id, class)
+);
+CREATE INDEX IF NOT EXISTS report_classes_class ON report_classes(class);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def _generated_at(name, data):
+    if isinstance(data, dict) and data.get("generated_at"):
+        return data["generated_at"]
+    # Informes del esquema 1: la fecha solo está en el nombre del fichero
+    stamp = REPORT_PATTERN.match(name).group(1)
+    return datetime.strptime(stamp, "%Y%m%d%H%M%S").isoformat()
+
+
+class ReportStore:
+    """Índice SQLite de los informes de ``reports/<versión>/``, sincronizado por (tamaño, mtime).
+
+    Los JSON siguen siendo la fuente de verdad: ``sync`` solo lee los ficheros nuevos o
+    modificados y la base se puede borrar sin perder nada. ``generation`` cambia con cada
+    modificación y sirve de base para los ETag de la API.
+    """
+
+    def __init__(self, reports_dir, db_path=None, sync_interval=2.0):
+        self.reports_dir = reports_dir
+        self.db_path = db_path or os.path.join(reports_dir, "reports.sqlite")
+        self.sync_interval = sync_interval
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._last_sync = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # Una conexión por hilo: Flask atiende peticiones en varios hilos
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def generation(self):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _bump_generation(self, conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('generation', 1)"
+                     " ON CONFLICT(key) DO UPDATE SET value = value + 1")
+
+    # ---------------- ingesta ----------------
+
+    def ingest_file(self, path, conn=None):
+        """Indexa (o reindexa) un informe; devuelve False si no es un informe de dataset."""
+        name = os.path.basename(path)
+        if not REPORT_PATTERN.match(name):
+            return False
+        version = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        st = os.stat(path)
+        classes = data if isinstance(data, list) else data.get("classes", [])
+        summary = None
+        if isinstance(data, dict) and "summary" in data:
+            duplicates = data.get("duplicates", {})
+            # Los grupos completos de duplicados se quedan en el JSON; aquí solo los totales
+            summary = dict(data["summary"], corrupt_files=len(data.get("corrupt_files", [])),
+                           cross_class_duplicates=len(duplicates.get("cross_class", [])),
+                           split_leaks=duplicates.get("split_leaks", 0))
+
+        conn = conn or self._connect()
+        with conn:
+            conn.execute("DELETE FROM reports WHERE version = ? AND name = ?", (version, name))
+            cursor = conn.execute(
+                "INSERT INTO reports (version, name, generated_at, schema_version, size, mtime_ns, class_count,"
+                " train_total, validation_total, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (version, name, _generated_at(name, data), data.get("schema_version", 1) if isinstance(data, dict) else 1,
+                 st.st_size, st.st_mtime_ns, len(classes),
+                 sum(c.get("train_count", 0) for c in classes), sum(c.get("validation_count", 0) for c in classes),
+                 json.dumps(summary) if summary else None))
+            conn.executemany(
+                "INSERT OR REPLACE INTO report_classes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, c["class"], c.get("train_count", 0), c.get("train_status"),
+                  c.get("validation_count", 0), c.get("validation_status"),
+                  json.dumps({"stats": c["stats"], "cross_class_duplicates": c.get("cross_class_duplicates", 0)})
+                  if "stats" in c else None)
+                 for c in classes])
+            self._bump_generation(conn)
+        return True
+
+    def sync(self, force=False):
+        """Indexa los informes nuevos o modificados y olvida los borrados (como mucho cada ``sync_interval`` s)."""
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+        with self._sync_lock:
+            if not force and now - self._last_sync < self.sync_interval:
+                return
+            conn = self._connect()
+            known = {(row["version"], row["name"]): (row["size"], row["mtime_ns"])
+                     for row in conn.execute("SELECT version, name, size, mtime_ns FROM reports")}
+            seen = set()
+            if os.path.isdir(self.reports_dir):
+                for version_entry in os.scandir(self.reports_dir):
+                    if not version_entry.is_dir():
+                        continue
+                    for entry in os.scandir(version_entry.path):
+                        if not (entry.is_file() and REPORT_PATTERN.match(entry.name)):
+                            continue
+                        key = (version_entry.name, entry.name)
+                        seen.add(key)
+                        st = entry.stat()
+                        if known.get(key) != (st.st_size, st.st_mtime_ns):
+                            try:
+                                self.ingest_file(entry.path, conn)
+                            except (OSError, ValueError, KeyError):
+                                pass  # Informe a medio escribir o inválido: se reintenta en el siguiente sync
+            removed = [key for key in known if key not in seen]
+            if removed:
+                with conn:
+                    conn.executemany("DELETE FROM reports WHERE version = ? AND name = ?", removed)
+                    self._bump_generation(conn)
+            self._last_sync = now
+
+    # ---------------- consultas ----------------
+
+    def versions(self):
+        rows = self._connect().execute(
+            "SELECT version, COUNT(*) AS reports, MAX(generated_at) AS latest FROM reports"
+            " GROUP BY version ORDER BY version DESC")
+        return [dict(row) for row in rows]
+
+    def list_reports(self, version, page, per_page):
+        conn = self._connect()
+        total = conn.execute("SELECT COUNT(*) FROM reports WHERE version = ?", (version,)).fetchone()[0]
+        rows = conn.execute(
+            "SELECT name, generated_at, schema_version, class_count, train_total, validation_total FROM reports"
+            " WHERE version = ? ORDER BY generated_at DESC, name DESC LIMIT ? OFFSET ?",
+            (version, per_page, (page - 1) * per_page))
+        return {"items": [dict(row) for row in rows], "total": total}
+
+    def get_report(self, version, name):
+        row = self._connect().execute(
+            "SELECT id, name, generated_at, schema_version, class_count, train_total, validation_total, summary"
+            " FROM reports WHERE version = ? AND name = ?", (version, name)).fetchone()
+        if row is None:
+            return None
+        report = dict(row)
+        report["summary"] = json.loads(report["summary"]) if report["summary"] else None
+        return report
+
+    def report_classes(self, report_id, search=None, status=None, size=None, sort="name-asc", page=1, per_page=100):
+        """Clases de un informe filtradas y ordenadas en SQL; devuelve la página y los totales del filtro."""
+        where, params = ["report_id = ?"], [report_id]
+        if search:
+            where.append("class LIKE ? ESCAPE '\\'")
+            params.append("%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if status:
+            where.append("(train_status = ? OR validation_status = ?)")
+            params += [status, status]
+        if size in SIZE_RANGES:
+            low, high = SIZE_RANGES[size]
+            where.append("train_count + validation_count >= ?")
+            params.append(low)
+            if high is not None:
+                where.append("train_count + validation_count < ?")
+                params.append(high)
+        clause = " AND ".join(where)
+        conn = self._connect()
+        total, samples = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(train_count + validation_count), 0) FROM report_classes WHERE {clause}",
+            params).fetchone()
+        rows = conn.execute(
+            f"SELECT class, train_count, train_status, validation_count, validation_status, stats"
+            f" FROM report_classes WHERE {clause} ORDER BY {SORT_ORDERS.get(sort, SORT_ORDERS['name-asc'])}"
+            f" LIMIT ? OFFSET ?", params + [per_page, (page - 1) * per_page])
+        items = []
+        for row in rows:
+            item = dict(row)
+            # Filas de informes schema 1 sin estadísticas: la columna es NULL y no se devuelve
+            raw_stats = item.pop("stats")
+            extra = json.loads(raw_stats) if raw_stats else {}
+            item.update(extra)
+            items.append(item)
+        return {"items": items, "total": total, "samples": samples}
+
+    def trends(self, version, class_name=None, limit=50):
+        """Evolución de los conteos a lo largo de los últimos ``limit`` informes de la versión."""
+        conn = self._connect()
+        if class_name:
+            rows = conn.execute(
+                "SELECT r.name, r.generated_at, c.train_count, c.validation_count, c.train_status, c.validation_status"
+                " FROM report_classes c JOIN reports r ON r.id = c.report_id"
+                " WHERE r.version = ? AND c.class = ? ORDER BY r.generated_at DESC LIMIT ?",
+                (version, class_name, limit))
+        else:
+            rows = conn.execute(
+                "SELECT name, generated_at, class_count, train_total AS train_count,"
+                " validation_total AS validation_count FROM reports"
+                " WHERE version = ? ORDER BY generated_at DESC LIMIT ?", (version, limit))
+        return [dict(row) for row in rows][::-1]
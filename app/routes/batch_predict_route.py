@@ -0,0 +1,136 @@
+from flask import Response, jsonify, request, stream_with_context
+import numpy as np
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from ..inference.imaging import decode_image
+from ..inference.labels import translate_label
+from ..metrics import ApiMetrics
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+ENDPOINT = "predict_batch"
+
+def _read_batch_sources(default_lang, default_top_k):
+    """Devuelve ([(id, fuente)], idioma, top_k sin validar) desde JSON (base64) o multipart (campo images).
+
+    Lanza ValueError si el cuerpo JSON no es un objeto o ``images`` no es una lista.
+    """
+    if request.mimetype == "multipart/form-data":
+        uploads = request.files.getlist("images")
+        sources = [(upload.filename or str(i), upload.stream) for i, upload in enumerate(uploads)]
+        lang = request.form.get("lang") or request.args.get("lang", default_lang)
+        top_k = request.form.get("top_k") or request.args.get("top_k", default_top_k)
+        return sources, lang, top_k
+
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError("JSON body must be an object")
+    images = data.get("images", [])
+    if not isinstance(images, list):
+        raise ValueError("images must be a list")
+    sources = []
+    for i, item in enumerate(images):
+        # Cada elemento puede ser el base64 directamente o {"id": ..., "image": base64}
+        if isinstance(item, dict):
+            sources.append((item.get("id", str(i)), item.get("image")))
+        else:
+            sources.append((str(i), item))
+    return sources, data.get("lang", default_lang), data.get("top_k", default_top_k)
+
+def _parse_top_k(value, num_classes):
+    """top_k como entero en [1, num_classes]; acepta la cadena de un formulario. Lanza ValueError si no."""
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= num_classes:
+        raise ValueError(f"top_k must be an integer between 1 and {num_classes}")
+    return value
+
+def _decode(source, img_size, out):
+    if isinstance(source, str):
+        source = base64.b64decode(source)
+    decode_image(source, img_size, out=out)
+
+def init_batch_predict_route(app, backend, class_translations, default_class_names, img_size, default_lang, batch_config=None, metrics=None):
+    batch_config = batch_config or {}
+    metrics = metrics or ApiMetrics()
+    chunk_size = batch_config.get("chunk_size", 32)
+    max_images = batch_config.get("max_images", 1000)
+    stream_threshold = batch_config.get("stream_threshold", 16)
+    decode_pool = ThreadPoolExecutor(max_workers=batch_config.get("decode_workers", 4),
+                                     thread_name_prefix="batch-decode")
+    num_classes = len(class_translations)
+    # El valor por defecto es de configuración: se ajusta a las clases del modelo en vez de rechazarlo
+    default_top_k = min(batch_config.get("default_top_k", 3), num_classes)
+    row_shape = (img_size[1], img_size[0], 3)
+
+    def submit_chunk(chunk, buffer):
+        return [decode_pool.submit(_decode, source, img_size, buffer[row])
+                for row, (_, source) in enumerate(chunk)]
+
+    def run_batch(sources, lang, top_k):
+        """Genera un resultado por imagen; decodifica el siguiente chunk mientras se infiere el actual."""
+        # Doble buffer: mientras el modelo procesa uno, el pool decodifica sobre el otro
+        buffers = [np.empty((chunk_size,) + row_shape, dtype=np.float32) for _ in range(2)]
+        chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+        offsets = range(0, len(sources), chunk_size)
+        pending = submit_chunk(chunks[0], buffers[0]) if chunks else []
+
+        for n, (offset, chunk) in enumerate(zip(offsets, chunks)):
+            buffer = buffers[n % 2]
+            results = []
+            ok_rows = []
+            with metrics.stage(ENDPOINT, "decode_wait"):
+                for row, future in enumerate(pending):
+                    try:
+                        future.result()
+                        ok_rows.append(row)
+                    except Exception:
+                        results.append((row, {"error": "Invalid image"}))
+
+            if n + 1 < len(chunks):
+                pending = submit_chunk(chunks[n + 1], buffers[(n + 1) % 2])
+
+            if ok_rows:
+                # Sin fallos el lote es una vista contigua del buffer (sin copia)
+                batch = buffer[:len(chunk)] if len(ok_rows) == len(chunk) else buffer[ok_rows]
+                with metrics.stage(ENDPOINT, "inference"):
+                    predictions = backend.predict(batch)
+                top_indices = np.argsort(predictions, axis=1)[:, ::-1][:, :top_k]
+                for row, probabilities, indices in zip(ok_rows, predictions, top_indices):
+                    metrics.record_prediction(ENDPOINT, default_class_names[indices[0]], lang,
+                                              float(probabilities[indices[0]]))
+                    results.append((row, {
+                        "predictions": [{
+                            "label": translate_label(int(index), lang, class_translations, default_class_names),
+                            "confidence": float(probabilities[index])
+                        } for index in indices]
+                    }))
+
+            for row, result in sorted(results, key=lambda r: r[0]):
+                image_id = chunk[row][0]
+                yield dict({"index": offset + row, "id": image_id, "language": lang}, **result)
+
+    @app.route("/predict/batch", methods=["POST"])
+    def predict_batch():
+        try:
+            sources, lang, top_k = _read_batch_sources(default_lang, default_top_k)
+            top_k = _parse_top_k(top_k, num_classes)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not sources:
+            return jsonify({"error": "Missing images"}), 400
+        if len(sources) > max_images:
+            return jsonify({"error": f"Too many images (max {max_images})"}), 413
+
+        # Lotes grandes (o clientes que lo piden) reciben NDJSON en streaming
+        wants_stream = NDJSON_MIMETYPE in request.headers.get("Accept", "")
+        if wants_stream or len(sources) > stream_threshold:
+            def generate():
+                for result in run_batch(sources, lang, top_k):
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+            return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+        return jsonify({"results": list(run_batch(sources, lang, top_k))})
@@ -0,0 +1,17 @@
+from flask import jsonify
+
+def init_health_route(app):
+    @app.route("/health/live", methods=["GET"])
+    def live():
+        return jsonify({"status": "alive"})
+
+    @app.route("/health/ready", methods=["GET"])
+    def ready():
+        # Listo cuando el servidor empieza a aceptar conexiones (tras la carga y el warm-up del modelo)
+        body = {"status": "ready" if app.config.get("MODEL_READY") else "starting"}
+        if app.config.get("WARMUP_SECONDS") is not None:
+            body["warmup_ms"] = app.config["WARMUP_SECONDS"] * 1000.0
+        workers_status = app.config.get("WORKERS_STATUS")
+        if workers_status:
+            body["workers"] = workers_status()
+        return jsonify(body), (200 if app.config.get("MODEL_READY") else 503)
@@ -0,0 +1,35 @@
+from flask import Response, g, request
+import time
+
+from ..metrics import stats_collector
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def init_metrics_route(app, metrics):
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        # Se usa la regla de la ruta (no la URL) para acotar la cardinalidad de etiquetas
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        started = g.get("request_started")
+        if started is not None:
+            metrics.request_duration.observe(time.perf_counter() - started, endpoint=endpoint)
+        metrics.requests.inc(endpoint=endpoint, status=response.status_code)
+        return response
+
+    # Las estadísticas del modo ASGI solo existen si la app se envolvió con create_asgi_app
+    metrics.registry.register_collector(stats_collector(
+        "iavision_admission",
+        lambda: app.config["ADMISSION_STATS"]() if app.config.get("ADMISSION_STATS") else {},
+        {
+            "in_flight": "Inferencias en curso",
+            "queue_depth": "Peticiones esperando admisión",
+            "rejected": "Peticiones rechazadas con 503 (acumulado)"
+        }))
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype=PROMETHEUS_MIMETYPE)
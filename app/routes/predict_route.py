@@ -1,33 +1,91 @@
 from flask import jsonify, request
-import tensorflow as tf
 import numpy as np
 import base64
-import io
-from PIL import Image
+from PIL import UnidentifiedImageError
+
+from image_hashing import dhash
+from ..inference.imaging import BINARY_CONTENT_TYPES, normalize, open_image, resize_rgb, thread_buffer
+from ..inference.labels import translate_label
+from ..metrics import ApiMetrics
+
+ENDPOINT = "predict"
+
+def _read_image_source(default_lang, metrics):
+    """Obtiene (imagen, idioma) del cuerpo JSON en base64, binario o multipart."""
+    if request.mimetype in BINARY_CONTENT_TYPES:
+        with metrics.stage(ENDPOINT, "read_body"):
+            return request.get_data(cache=False), request.args.get("lang", default_lang)
+
+    if request.mimetype == "multipart/form-data":
+        with metrics.stage(ENDPOINT, "read_body"):
+            upload = request.files.get("image")
+            lang = request.form.get("lang") or request.args.get("lang", default_lang)
+        return (upload.stream if upload else None), lang
+
+    with metrics.stage(ENDPOINT, "json_parse"):
+        data = request.get_json(silent=True)
+    # Un cuerpo JSON que no es un objeto (cadena, lista...) se trata como imagen ausente
+    if not isinstance(data, dict) or "image" not in data:
+        return None, default_lang
+    if not isinstance(data["image"], str):
+        raise ValueError("image must be a base64 string")
+    lang = data.get("lang", default_lang)
+    with metrics.stage(ENDPOINT, "base64_decode"):
+        return base64.b64decode(data["image"]), (lang if isinstance(lang, str) else default_lang)
+
+def init_predict_route(app, predictor, class_translations, default_class_names, img_size, default_lang, backend, batcher=None, cache=None, metrics=None):
+    metrics = metrics or ApiMetrics()
 
-def init_predict_route(app, model, class_translations, default_class_names, img_size, default_lang):
     @app.route("/predict", methods=["POST"])
     def predict():
-        data = request.get_json()
-        if "image" not in data:
-            return jsonify({"error": "Missing image"}), 400
+        try:
+            source, lang = _read_image_source(default_lang, metrics)
+            if not source:
+                return jsonify({"error": "Missing image"}), 400
+            with metrics.stage(ENDPOINT, "image_decode"):
+                image = resize_rgb(open_image(source, img_size), img_size)
+            predictions = None
+            if cache:
+                with metrics.stage(ENDPOINT, "cache_lookup"):
+                    frame_hash = dhash(image)
+                    predictions = cache.get(frame_hash)
+            if predictions is None:
+                with metrics.stage(ENDPOINT, "preprocess"):
+                    image_array = normalize(image, out=thread_buffer(img_size))
+        except (UnidentifiedImageError, OSError, ValueError):
+            return jsonify({"error": "Invalid image"}), 400
 
-        lang = data.get("lang", default_lang)
+        cached = predictions is not None
+        if not cached:
+            # El predictor recibe una sola imagen (H, W, C) y devuelve su fila de probabilidades
+            with metrics.stage(ENDPOINT, "inference"):
+                predictions = predictor(image_array)
+            if cache:
+                cache.put(frame_hash, predictions)
 
-        image_data = base64.b64decode(data["image"])
-        image = Image.open(io.BytesIO(image_data)).resize(img_size)
-        image_array = tf.keras.applications.mobilenet_v2.preprocess_input(np.array(image))
-        image_array = np.expand_dims(image_array, axis=0)
+        predicted_index = np.argmax(predictions)
+        confidence = float(predictions[predicted_index])
 
-        predictions = model.predict(image_array)
-        predicted_index = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_index])
+        predicted_label = translate_label(predicted_index, lang, class_translations, default_class_names)
+        metrics.record_prediction(ENDPOINT, default_class_names[predicted_index], lang, confidence, cached)
 
-        translations = class_translations[predicted_index]
-        predicted_label = translations.get(lang, default_class_names[predicted_index])
+        with metrics.stage(ENDPOINT, "serialize"):
+            return jsonify({
+                "label": predicted_label,
+                "confidence": confidence,
+                "language": lang,
+                "cached": cached
+            })
 
-        return jsonify({
-            "label": predicted_label,
-            "confidence": confidence,
-            "language": lang
-        })
\ No newline at end of file
+    @app.route("/predict/stats", methods=["GET"])
+    def predict_stats():
+        stats = {
+            "inference": backend.stats(),
+            "batching": batcher.stats() if batcher else {"enabled": False},
+            "cache": cache.stats() if cache else {"enabled": False}
+        }
+        # Solo existe en modo ASGI (control de admisión)
+        admission_stats = app.config.get("ADMISSION_STATS")
+        if admission_stats:
+            stats["admission"] = admission_stats()
+        return jsonify(stats)
@@ -1,6 +1,81 @@
-from flask import render_template
+import hashlib
+
+from flask import Response, jsonify, render_template, request
+
+def init_reports_route(app, store=None, reports_config=None):
+    reports_config = reports_config or {}
+    default_per_page = reports_config.get("per_page", 20)
+    max_per_page = reports_config.get("max_per_page", 200)
 
-def init_reports_route(app):
     @app.route("/reports")
     def reports():
         return render_template("reports.html")
+
+    if store is None:
+        return
+
+    def page_args(default):
+        page = max(request.args.get("page", 1, type=int), 1)
+        per_page = min(max(request.args.get("per_page", default, type=int), 1), max_per_page)
+        return page, per_page
+
+    def conditional(build):
+        """Responde 304 si el cliente ya tiene esta consulta con la misma generación del índice."""
+        store.sync()
+        # La generación cambia con cada informe nuevo o modificado; la consulta completa distingue la respuesta
+        etag = f"{store.generation()}-{hashlib.md5(request.full_path.encode('utf-8')).hexdigest()[:16]}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            body = build()
+            if body is None:
+                return jsonify({"error": "Informe no encontrado"}), 404
+            response = jsonify(body)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    @app.route("/api/reports/versions", methods=["GET"])
+    def report_versions():
+        return conditional(lambda: {"versions": store.versions()})
+
+    @app.route("/api/reports", methods=["GET"])
+    def list_reports():
+        version = request.args.get("version")
+        if not version:
+            return jsonify({"error": "Falta el parámetro 'version'"}), 400
+        page, per_page = page_args(default_per_page)
+
+        def build():
+            result = store.list_reports(version, page, per_page)
+            return dict(result, version=version, page=page, per_page=per_page)
+        return conditional(build)
+
+    @app.route("/api/reports/trends", methods=["GET"])
+    def report_trends():
+        version = request.args.get("version")
+        if not version:
+            return jsonify({"error": "Falta el parámetro 'version'"}), 400
+        class_name = request.args.get("class")
+        limit = min(max(request.args.get("limit", 50, type=int), 1), max_per_page)
+        return conditional(lambda: {"version": version, "class": class_name,
+                                    "points": store.trends(version, class_name, limit)})
+
+    @app.route("/api/reports/<version>/<name>", methods=["GET"])
+    def report_detail(version, name):
+        page, per_page = page_args(max_per_page)
+
+        def build():
+            report = store.get_report(version, name)
+            if report is None:
+                return None
+            classes = store.report_classes(
+                report.pop("id"),
+                search=request.args.get("class"),
+                status=request.args.get("status"),
+                size=request.args.get("size"),
+                sort=request.args.get("sort", "name-asc"),
+                page=page, per_page=per_page)
+            return dict(report, version=version, classes=classes["items"], total=classes["total"],
+                        samples=classes["samples"], page=page, per_page=per_page)
+        return conditional(build)
@@ -29,7 +29,7 @@ document.addEventListener('DOMContentLoaded', function () {
   const sortBy = document.getElementById('sort-by');
   const summaryStats = document.getElementById('summary-stats');
 
-  let currentData = [];
+  let currentReport = null;
   let scrollPosition = 0;
   let currentReportContainer = document.querySelector('.panel:last-child');
 
@@ -43,7 +43,17 @@ document.addEventListener('DOMContentLoaded', function () {
     }
   }
 
-  function showFiles(version, files) {
+  function fetchJson(url) {
+    // La API responde con ETag: el navegador revalida y recibe 304 si nada cambió
+    return fetch(url).then(res => {
+      if (!res.ok) {
+        throw new Error(`HTTP error! status: ${res.status}`);
+      }
+      return res.json();
+    });
+  }
+
+  function showFiles(version) {
     saveScrollPosition();
 
     reportList.innerHTML = '';
@@ -51,63 +61,85 @@ document.addEventListener('DOMContentLoaded', function () {
     summaryStats.innerHTML = '';
 
     document.querySelectorAll('#version-list .btn').forEach(btn => {
-      btn.classList.remove('active');
+      btn.classList.toggle('active', btn.textContent === version);
     });
 
-    document.querySelectorAll('#version-list .btn').forEach(btn => {
-      if (btn.textContent === version) {
-        btn.classList.add('active');
-      }
-    });
+    loadFilesPage(version, 1);
+  }
 
-    files.sort((a, b) => b.localeCompare(a));
+  function loadFilesPage(version, page) {
+    fetchJson(`/api/reports?version=${encodeURIComponent(version)}&page=${page}`)
+      .then(data => {
+        const moreBtn = reportList.querySelector('.load-more');
+        if (moreBtn) moreBtn.remove();
 
-    if (files.length === 0) {
-      reportList.innerHTML = '<div class="empty-state">No hay archivos de reporte para esta versión</div>';
-      reportDetails.innerHTML = '<div class="empty-state">No hay datos para mostrar</div>';
-      return;
-    }
+        if (data.total === 0) {
+          reportList.innerHTML = '<div class="empty-state">No hay archivos de reporte para esta versión</div>';
+          reportDetails.innerHTML = '<div class="empty-state">No hay datos para mostrar</div>';
+          return;
+        }
 
-    files.forEach(file => {
-      const btn = document.createElement('button');
-      btn.className = 'btn';
-      btn.textContent = file;
-      btn.onclick = () => {
-        saveScrollPosition();
-        loadReportDetails(version, file);
-      };
-      reportList.appendChild(btn);
-    });
+        data.items.forEach(item => {
+          const btn = document.createElement('button');
+          btn.className = 'btn';
+          btn.textContent = item.name;
+          btn.title = `${item.generated_at} · ${item.class_count} clases`;
+          btn.onclick = () => {
+            saveScrollPosition();
+            loadReportDetails(version, item.name);
+          };
+          reportList.appendChild(btn);
+        });
+
+        if (data.page * data.per_page < data.total) {
+          const btn = document.createElement('button');
+          btn.className = 'btn load-more';
+          btn.textContent = `Cargar más (${data.total - data.page * data.per_page})`;
+          btn.onclick = () => loadFilesPage(version, page + 1);
+          reportList.appendChild(btn);
+        }
 
-    restoreScrollPosition();
+        if (page === 1) {
+          reportDetails.innerHTML = '<div class="empty-state">Selecciona un archivo de reporte</div>';
+        }
+        restoreScrollPosition();
+      })
+      .catch(showError);
   }
 
   function loadReportDetails(version, file) {
     saveScrollPosition();
 
     document.querySelectorAll('#report-list .btn').forEach(btn => {
-      btn.classList.remove('active');
-    });
-
-    document.querySelectorAll('#report-list .btn').forEach(btn => {
-      if (btn.textContent === file) {
-        btn.classList.add('active');
-      }
+      btn.classList.toggle('active', btn.textContent === file);
     });
 
     reportDetails.innerHTML = '<div class="loading">Cargando detalles del reporte...</div>';
     summaryStats.innerHTML = '';
+    currentReport = { version, name: file };
+    applyFilters();
+  }
 
-    fetch(`/reports/${version}/${file}`)
-      .then(res => {
-        if (!res.ok) {
-          throw new Error(`HTTP error! status: ${res.status}`);
-        }
-        return res.json();
-      })
+  function applyFilters() {
+    if (!currentReport) return;
+
+    // Búsqueda, filtros y orden se resuelven en el servidor
+    const params = new URLSearchParams({ sort: sortBy.value });
+    if (searchInput.value) params.set('class', searchInput.value);
+    if (statusFilter.value !== 'all') params.set('status', statusFilter.value);
+    if (sizeFilter.value !== 'all') params.set('size', sizeFilter.value);
+
+    const { version, name } = currentReport;
+    fetchJson(`/api/reports/${encodeURIComponent(version)}/${encodeURIComponent(name)}?${params}`)
       .then(data => {
-        currentData = data;
-        applyFilters();
+        if (!currentReport || currentReport.name !== name) return;
+        currentReport = Object.assign({ version, name }, data);
+        if (data.class_count === 0) {
+          reportDetails.innerHTML = '<div class="empty-state">No hay datos en este reporte</div>';
+          return;
+        }
+        displayReportDetails(data.classes);
+        updateSummaryStats(data.classes);
         restoreScrollPosition();
       })
       .catch(error => {
@@ -116,64 +148,24 @@ document.addEventListener('DOMContentLoaded', function () {
       });
   }
 
-
-  function applyFilters() {
-    if (!currentData || currentData.length === 0) {
-      reportDetails.innerHTML = '<div class="empty-state">No hay datos en este reporte</div>';
-      return;
-    }
-
-
-    let filteredData = [...currentData];
-
-
-    const searchTerm = searchInput.value.toLowerCase();
-    if (searchTerm) {
-      filteredData = filteredData.filter(entry =>
-        entry.class.toLowerCase().includes(searchTerm)
-      );
-    }
-
-
-    const statusValue = statusFilter.value;
-    if (statusValue !== 'all') {
-      filteredData = filteredData.filter(entry =>
-        entry.train_status === statusValue || entry.validation_status === statusValue
-      );
-    }
-
-
-    const sizeValue = sizeFilter.value;
-    if (sizeValue !== 'all') {
-      filteredData = filteredData.filter(entry => {
-        const total = entry.train_count + entry.validation_count;
-        switch (sizeValue) {
-          case 'small': return total < 500;
-          case 'medium': return total >= 500 && total <= 2000;
-          case 'large': return total > 2000;
-          default: return true;
+  function loadTrend(className, container) {
+    const params = new URLSearchParams({ version: currentReport.version, class: className });
+    container.innerHTML = '<div class="loading">Cargando tendencia...</div>';
+    fetchJson(`/api/reports/trends?${params}`)
+      .then(data => {
+        if (data.points.length === 0) {
+          container.innerHTML = '<div class="empty-state">Sin historial</div>';
+          return;
         }
+        container.innerHTML = data.points.map(point => `
+          <div class="data-row stats-row">
+            <span class="data-label">${point.generated_at.replace('T', ' ')}</span>
+            <span>train ${point.train_count} · validación ${point.validation_count}</span>
+          </div>`).join('');
+      })
+      .catch(error => {
+        container.innerHTML = `<div class="empty-state">${error.message}</div>`;
       });
-    }
-
-
-    const sortValue = sortBy.value;
-    filteredData.sort((a, b) => {
-      const totalA = a.train_count + a.validation_count;
-      const totalB = b.train_count + b.validation_count;
-
-      switch (sortValue) {
-        case 'name-asc': return a.class.localeCompare(b.class);
-        case 'name-desc': return b.class.localeCompare(a.class);
-        case 'count-asc': return totalA - totalB;
-        case 'count-desc': return totalB - totalA;
-        default: return 0;
-      }
-    });
-
-
-    displayReportDetails(filteredData);
-    updateSummaryStats(filteredData);
   }
 
 
@@ -205,25 +197,31 @@ document.addEventListener('DOMContentLoaded', function () {
             <span class="data-label">Validación:</span>
             <span>${entry.validation_count} <span class="status ${validationStatusClass}">${entry.validation_status}</span></span>
           </div>
+          ${entry.stats ? renderClassStats(entry) : ''}
+          <button class="btn trend-btn" data-class="${entry.class}">📈 Tendencia</button>
+          <div class="trend"></div>
         </div>
       `;
     });
 
     reportDetails.innerHTML = html;
+    reportDetails.querySelectorAll('.trend-btn').forEach(btn => {
+      btn.onclick = () => loadTrend(btn.dataset.class, btn.nextElementSibling);
+    });
   }
 
 
   function updateSummaryStats(data) {
     if (!data || data.length === 0) return;
 
-    const totalClasses = data.length;
+    const totalClasses = currentReport.total;
     let okCount = 0;
     let warningCount = 0;
     let errorCount = 0;
     let totalSamples = 0;
 
+    totalSamples = currentReport.samples;
     data.forEach(entry => {
-      totalSamples += entry.train_count + entry.validation_count;
       if (entry.train_status === 'OK' && entry.validation_status === 'OK') {
         okCount++;
       } else if (entry.train_status === 'ERROR' || entry.validation_status === 'ERROR') {
@@ -242,13 +240,69 @@ document.addEventListener('DOMContentLoaded', function () {
       <div class="stat-item"><span class="status status-success">OK</span>: <span class="stat-value">${okCount}</span></div>
       <div class="stat-item"><span class="status status-warning">WARNING</span>: <span class="stat-value">${warningCount}</span></div>
       <div class="stat-item"><span class="status status-danger">ERROR</span>: <span class="stat-value">${errorCount}</span></div>
+      ${currentReport && currentReport.summary ? renderDatasetStats(currentReport) : ''}
+    `;
+  }
+
+  function formatHistogram(histogram) {
+    return Object.entries(histogram || {}).map(([label, count]) => `${label}: ${count}`).join(' · ') || '-';
+  }
+
+  function formatMegabytes(bytes) {
+    return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  }
+
+  function renderClassStats(entry) {
+    let html = '';
+    Object.entries(entry.stats).forEach(([split, stats]) => {
+      const splitName = split === 'train' ? 'Entrenamiento' : 'Validación';
+      html += `
+          <div class="data-row stats-row">
+            <span class="data-label">${splitName} · resolución (lado menor):</span>
+            <span>${formatHistogram(stats.resolutions)}</span>
+          </div>
+          <div class="data-row stats-row">
+            <span class="data-label">${splitName} · formatos / tamaños:</span>
+            <span>${formatHistogram(stats.formats)} | ${formatHistogram(stats.file_sizes)} (${formatMegabytes(stats.bytes)})</span>
+          </div>`;
+      if (stats.corrupt > 0) {
+        html += `
+          <div class="data-row stats-row">
+            <span class="data-label">${splitName} · corruptos:</span>
+            <span class="status status-danger">${stats.corrupt}</span>
+          </div>`;
+      }
+    });
+    if (entry.cross_class_duplicates > 0) {
+      html += `
+          <div class="data-row stats-row">
+            <span class="data-label">Duplicados con otras clases:</span>
+            <span class="status status-warning">${entry.cross_class_duplicates}</span>
+          </div>`;
+    }
+    return html;
+  }
+
+  function renderDatasetStats(report) {
+    const summary = report.summary;
+    return `
+      <div class="stat-item">Tamaño: <span class="stat-value">${formatMegabytes(summary.bytes)}</span></div>
+      <div class="stat-item">Resolución media: <span class="stat-value">${summary.mean_width}x${summary.mean_height}</span></div>
+      <div class="stat-item">Corruptos: <span class="stat-value">${summary.corrupt}</span></div>
+      <div class="stat-item">Duplicados entre clases: <span class="stat-value">${summary.cross_class_duplicates}</span></div>
+      <div class="stat-item">Fugas train/validación: <span class="stat-value">${summary.split_leaks}</span></div>
     `;
   }
 
 
 
 
-  searchInput.addEventListener('input', applyFilters);
+
+  let searchTimer = null;
+  searchInput.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(applyFilters, 250);
+  });
   clearSearchBtn.addEventListener('click', () => {
     searchInput.value = '';
     applyFilters();
@@ -258,25 +312,18 @@ document.addEventListener('DOMContentLoaded', function () {
   sortBy.addEventListener('change', applyFilters);
 
 
-  fetch("/reports/index.json")
-    .then(res => {
-      if (!res.ok) {
-        throw new Error(`HTTP error! status: ${res.status}`);
-      }
-      return res.json();
-    })
-    .then(indexData => {
-      Object.keys(indexData).forEach(ver => {
+  fetchJson('/api/reports/versions')
+    .then(data => {
+      data.versions.forEach(({ version }) => {
         const btn = document.createElement('button');
         btn.className = 'btn';
-        btn.textContent = ver;
-        btn.onclick = () => showFiles(ver, indexData[ver]);
+        btn.textContent = version;
+        btn.onclick = () => showFiles(version);
         versionList.appendChild(btn);
       });
 
-      const versions = Object.keys(indexData);
-      if (versions.length > 0) {
-        showFiles(versions[0], indexData[versions[0]]);
+      if (data.versions.length > 0) {
+        showFiles(data.versions[0].version);
       }
     })
     .catch(error => {
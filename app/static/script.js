@@ -45,10 +45,12 @@ async function capture() {
   try {
     showResult("thinking", "Analizando...");
     
+    // Envío binario: el JPEG viaja tal cual, sin base64 ni JSON
+    const blob = await canvasToBlob(canvas, "image/jpeg", 0.9);
     const response = await fetch("/predict", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ image: canvas.toDataURL("image/jpeg").split(',')[1] })
+      headers: { "Content-Type": "image/jpeg" },
+      body: blob
     });
 
     const result = await response.json();
@@ -69,6 +71,13 @@ async function capture() {
   }
 }
 
+// Convierte el canvas en un Blob JPEG
+function canvasToBlob(canvas, type, quality) {
+  return new Promise((resolve, reject) => {
+    canvas.toBlob(blob => blob ? resolve(blob) : reject(new Error("No se pudo codificar la imagen")), type, quality);
+  });
+}
+
 // Función para hablar el resultado
 function speakResult(text, lang) {
   const msg = new SpeechSynthesisUtterance(text);
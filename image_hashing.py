@@ -0,0 +1,14 @@
+"""Hash perceptual compartido por la caché de la API y el índice de deduplicación del scraper.
+
+Solo depende de numpy y Pillow, así que el scraper puede usarlo sin importar Flask ni la app.
+"""
+import numpy as np
+from PIL import Image
+
+
+def dhash(image, hash_size=8):
+    """Difference hash de 64 bits: compara píxeles vecinos de la imagen en gris a 9x8."""
+    gray = image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
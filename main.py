@@ -5,16 +5,26 @@ from app import create_app
 def main():
     parser = argparse.ArgumentParser(description="IAVisionPay API")
     parser.add_argument("--config", required=True, help="Ruta del archivo de configuración JSON")
+    parser.add_argument("--mode", choices=["wsgi", "asgi"], default="wsgi",
+                        help="wsgi: servidor de desarrollo de Flask; asgi: uvicorn con control de admisión")
     args = parser.parse_args()
 
     # Cargar configuración desde el archivo proporcionado
     with open(args.config, "r", encoding="utf-8") as f:
         config = json.load(f)
 
+    if args.mode == "asgi":
+        # Modo asíncrono: concurrencia acotada y rechazo rápido con 503
+        import uvicorn
+        from app.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(config), host="0.0.0.0", port=5000)
+        return
+
     # Crear la aplicación con la configuración
     app = create_app(config)
 
-    # Ejecutar servidor Flask
+    # Ejecutar servidor Flask (listo a partir de aquí: app.run empieza a aceptar conexiones)
+    app.config["MODEL_READY"] = True
     app.run(host="0.0.0.0", port=5000)
 
 if __name__ == "__main__":
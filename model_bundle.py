@@ -0,0 +1,162 @@
+"""Bundle del modelo: el artefacto ``.keras`` más sus metadatos de clases.
+
+``model_trainer.py`` guarda junto a ``<modelo>.keras`` un ``<modelo>.meta.json`` con los
+nombres de clase en el orden de las salidas del modelo, el tamaño de entrada y el rango de
+normalización. La API (``create_app``) y ``scripts/model_loader.py`` cargan el modelo con
+``load_bundle``, así que conocer las clases no requiere el dataset. Cada ``.tflite`` exportado
+lleva también su ``.meta.json``, de modo que el backend tflite no necesita el ``.keras``.
+
+TensorFlow solo se importa al cargar el modelo. Los tiempos de cada fase (metadatos, import,
+carga, primera predicción) quedan en ``bundle.timings`` y ``log_cold_start`` los imprime.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from preprocessing import INPUT_RANGE
+
+METADATA_VERSION = 1
+
+
+class BundleError(Exception):
+    """El modelo y sus metadatos no existen o no son coherentes."""
+
+
+def metadata_path(model_path):
+    return os.path.splitext(model_path)[0] + ".meta.json"
+
+
+def metadata_candidates(model_path):
+    """Metadatos propios del modelo y, para un ``<base>_<cuantización>.tflite``, los del ``<base>.keras``."""
+    candidates = [metadata_path(model_path)]
+    base, ext = os.path.splitext(model_path)
+    if ext == ".tflite" and "_" in os.path.basename(base):
+        # Exportaciones anteriores a que el entrenamiento escribiera metadatos por .tflite
+        candidates.append(metadata_path(base.rsplit("_", 1)[0]))
+    return candidates
+
+
+def save_metadata(model_path, class_names, image_size, **extra):
+    """Escribe ``<modelo>.meta.json`` junto al modelo (escritura atómica)."""
+    metadata = {
+        "version": METADATA_VERSION,
+        "model_file": os.path.basename(model_path),
+        "class_names": list(class_names),
+        "image_size": list(image_size),
+        "input_range": list(INPUT_RANGE),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        **extra
+    }
+    path = metadata_path(model_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def validate_metadata(metadata, source):
+    if metadata.get("version") != METADATA_VERSION:
+        raise BundleError(f"Versión de metadatos no soportada en {source}: {metadata.get('version')}")
+    class_names = metadata.get("class_names") or []
+    if not class_names or len(set(class_names)) != len(class_names):
+        raise BundleError(f"class_names vacío o con duplicados en {source}")
+    if len(metadata.get("image_size") or []) != 2:
+        raise BundleError(f"image_size inválido en {source}: {metadata.get('image_size')}")
+    if list(metadata.get("input_range", [])) != list(INPUT_RANGE):
+        # Un modelo entrenado con otra normalización daría predicciones sin sentido
+        raise BundleError(f"El modelo de {source} espera entradas en {metadata.get('input_range')} "
+                          f"y el preprocesado produce {list(INPUT_RANGE)}; hay que reentrenarlo")
+    return metadata
+
+
+class ModelBundle:
+    def __init__(self, model_path, metadata, started=None):
+        self.model_path = model_path
+        self.metadata = metadata
+        self.class_names = list(metadata["class_names"])
+        self.image_size = tuple(metadata["image_size"])
+        self.timings = {}
+        self._started = started if started is not None else time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Cronometra una fase del arranque y la guarda en ``timings``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    def load_keras_model(self):
+        """Carga el ``.keras`` (TensorFlow se importa aquí) y comprueba entradas y salidas."""
+        with self.phase("import"):
+            import tensorflow as tf
+        with self.phase("model_load"):
+            model = tf.keras.models.load_model(self.model_path)
+        try:
+            input_shape, output_shape = model.input_shape, model.output_shape
+        except (AttributeError, ValueError):
+            # Modelo guardado sin construir (Sequential sin Input): se construye con la forma de los metadatos
+            input_shape = (1,) + self.image_size + (3,)
+            try:
+                output_shape = model(tf.zeros(input_shape), training=False).shape
+            except Exception as e:
+                raise BundleError(f"{self.model_path} no acepta entradas {input_shape[1:]}: {e}") from e
+        self.validate_shapes(input_shape, output_shape)
+        return model
+
+    def validate_shapes(self, input_shape, output_shape):
+        # Mismo convenio que el entrenamiento: image_size es el (alto, ancho) de la entrada
+        if tuple(input_shape[1:3]) != self.image_size:
+            raise BundleError(f"La entrada del modelo es {tuple(input_shape[1:3])} y los metadatos "
+                              f"indican {self.image_size}")
+        if output_shape[-1] != len(self.class_names):
+            raise BundleError(f"El modelo tiene {output_shape[-1]} salidas y los metadatos "
+                              f"{len(self.class_names)} clases")
+
+    def record_first_prediction(self, seconds):
+        self.timings["first_prediction"] = seconds
+        self.timings["time_to_first_prediction"] = time.perf_counter() - self._started
+
+    def log_cold_start(self):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.timings.items()
+                           if name != "time_to_first_prediction")
+        total = self.timings.get("time_to_first_prediction")
+        name = os.path.basename(self.model_path)
+        if total is None:
+            print(f"⏱️ Arranque de {name}: {phases}")
+        else:
+            print(f"⏱️ Arranque en frío de {name}: {total * 1000:.0f} ms hasta la primera predicción ({phases})")
+
+
+def load_bundle(model_path, image_size=None, fallback_class_names=None):
+    """Lee y valida los metadatos del modelo; el modelo se carga después (``load_keras_model``).
+
+    Los modelos entrenados antes de que existieran los metadatos se pueden abrir con
+    ``fallback_class_names``, que se valida igualmente contra las salidas del modelo.
+    """
+    started = time.perf_counter()
+    path = next((p for p in metadata_candidates(model_path) if os.path.exists(p)), metadata_path(model_path))
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            metadata = validate_metadata(json.load(f), path)
+    elif fallback_class_names:
+        print(f"⚠️ {model_path} no tiene metadatos ({os.path.basename(path)}); "
+              f"se usan las clases indicadas. Reentrena para generarlos.")
+        metadata = validate_metadata({
+            "version": METADATA_VERSION,
+            "class_names": list(fallback_class_names),
+            "image_size": list(image_size or (224, 224)),
+            "input_range": list(INPUT_RANGE)
+        }, model_path)
+    else:
+        raise BundleError(f"No hay metadatos del modelo en {path}; reentrena el modelo o indica las clases")
+
+    bundle = ModelBundle(model_path, metadata, started)
+    if image_size is not None and tuple(image_size) != bundle.image_size:
+        raise BundleError(f"image_size {tuple(image_size)} no coincide con el del modelo {bundle.image_size}")
+    bundle.timings["metadata"] = time.perf_counter() - started
+    return bundle
@@ -1,12 +1,15 @@
 import tensorflow as tf
 from tensorflow.keras import layers
 
+from preprocessing import INPUT_RANGE
+
 def get_augmentation_pipeline():
     """Returns a data augmentation pipeline as a Sequential model."""
     return tf.keras.Sequential([
         layers.RandomFlip("horizontal"),
         layers.RandomRotation(0.2),
         layers.RandomZoom(0.2),
-        layers.RandomBrightness(0.2),
-        layers.RandomContrast(0.2)
+        # Inputs are already normalized, so clipping must use the model's range, not [0, 255]
+        layers.RandomBrightness(0.2, value_range=INPUT_RANGE),
+        layers.RandomContrast(0.2, value_range=INPUT_RANGE)
     ])
\ No newline at end of file
@@ -0,0 +1,154 @@
+import os
+import json
+import shutil
+import hashlib
+import tensorflow as tf
+
+# Same formats image_dataset_from_directory accepts, so both sources see the same files
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+CACHE_FORMAT_VERSION = 1
+
+def list_image_files(directory):
+    """Returns (paths, labels, class_names) using image_dataset_from_directory's class order."""
+    class_names = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(directory, class_name)
+        for root, _, files in sorted(os.walk(class_dir)):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+                    labels.append(label)
+    return paths, labels, class_names
+
+def fingerprint_directory(directory, img_size, mode="stat"):
+    """Fingerprint of the source tree plus the build parameters.
+
+    "stat" hashes (relative path, size, mtime) and costs one stat per file;
+    "content" hashes every file's bytes and survives touch/copy operations.
+    """
+    paths, labels, class_names = list_image_files(directory)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([CACHE_FORMAT_VERSION, list(img_size), class_names]).encode("utf-8"))
+    for path, label in zip(paths, labels):
+        rel_path = os.path.relpath(path, directory)
+        digest.update(f"{rel_path}\0{label}\0".encode("utf-8"))
+        if mode == "content":
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        else:
+            st = os.stat(path)
+            digest.update(f"{st.st_size}\0{st.st_mtime_ns}\0".encode("utf-8"))
+    return digest.hexdigest()[:16], (paths, labels, class_names)
+
+def _decode_and_resize(path, label, img_size):
+    # Mirrors image_dataset_from_directory: decode as RGB, bilinear resize, then stored as uint8
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, img_size)
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+    return image, label
+
+def _serialize(image, label):
+    feature = {
+        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[int(label)]))
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+def build_tfrecord_shards(source_dir, cache_root, img_size, num_shards=16, fingerprint_mode="stat"):
+    """Decodes and resizes source_dir once into sharded TFRecords; skipped if already built.
+
+    Returns the directory holding the shards and their meta.json.
+    """
+    fingerprint, (paths, labels, class_names) = fingerprint_directory(source_dir, img_size, fingerprint_mode)
+    split_name = os.path.basename(os.path.normpath(source_dir))
+    cache_dir = os.path.join(cache_root, f"{split_name}-{fingerprint}")
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        print(f"♻️ Dataset cache up to date: {cache_dir}")
+        return cache_dir
+
+    print(f"🧱 Building TFRecord cache for {source_dir} ({len(paths)} images, {num_shards} shards)")
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    num_shards = max(1, min(num_shards, len(paths) or 1))
+    shard_paths = [os.path.join(tmp_dir, f"shard-{i:05d}-of-{num_shards:05d}.tfrecord") for i in range(num_shards)]
+    writers = [tf.io.TFRecordWriter(p) for p in shard_paths]
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(lambda p, l: _decode_and_resize(p, l, img_size),
+                          num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+    count = 0
+    try:
+        for image, label in dataset.as_numpy_iterator():
+            writers[count % num_shards].write(_serialize(image, label))
+            count += 1
+    finally:
+        for writer in writers:
+            writer.close()
+
+    meta = {
+        "format_version": CACHE_FORMAT_VERSION,
+        "source_dir": source_dir,
+        "fingerprint": fingerprint,
+        "fingerprint_mode": fingerprint_mode,
+        "image_size": list(img_size),
+        "class_names": class_names,
+        "num_examples": count,
+        "shards": [os.path.basename(p) for p in shard_paths]
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    # Atomic publish: a half-written cache is never picked up by a later run
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"✅ Dataset cache written to {cache_dir} ({count} images)")
+    return cache_dir
+
+def load_tfrecord_dataset(cache_dir, batch_size, shuffle=False, shuffle_buffer=2048, seed=None):
+    """Reads the shards with parallel interleave. Yields float32 [0, 255] images, like image_dataset_from_directory."""
+    with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    height, width = meta["image_size"]
+    shard_paths = [os.path.join(cache_dir, name) for name in meta["shards"]]
+
+    feature_spec = {
+        "image": tf.io.FixedLenFeature([], tf.string),
+        "label": tf.io.FixedLenFeature([], tf.int64)
+    }
+
+    def _parse(record):
+        example = tf.io.parse_single_example(record, feature_spec)
+        image = tf.reshape(tf.io.decode_raw(example["image"], tf.uint8), (height, width, 3))
+        return tf.cast(image, tf.float32), tf.cast(example["label"], tf.int32)
+
+    files = tf.data.Dataset.from_tensor_slices(shard_paths)
+    if shuffle:
+        files = files.shuffle(len(shard_paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = files.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=min(len(shard_paths), 8),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle
+    )
+    dataset = dataset.map(_parse, num_parallel_calls=tf.data.AUTOTUNE)
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    return dataset, meta["class_names"]
+
+def cached_dataset(source_dir, cache_config, img_size, batch_size, shuffle):
+    """Builds the shard cache if needed and returns (dataset, class_names)."""
+    cache_dir = build_tfrecord_shards(
+        source_dir,
+        cache_config.get("cache_dir", "data/cache"),
+        img_size,
+        num_shards=cache_config.get("num_shards", 16),
+        fingerprint_mode=cache_config.get("fingerprint", "stat")
+    )
+    return load_tfrecord_dataset(cache_dir, batch_size, shuffle=shuffle,
+                                 shuffle_buffer=cache_config.get("shuffle_buffer", 2048))
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import tensorflow as tf
+
+from dataset_cache import IMAGE_EXTENSIONS, _decode_and_resize
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+SPLITS = ("train_data", "validation_data")
+# Everything the scraper may save is tracked; only TF-decodable formats are materialized in the store
+TRACKED_EXTENSIONS = IMAGE_EXTENSIONS + (".webp",)
+
+def manifest_path(dataset_path):
+    return os.path.join(dataset_path, MANIFEST_NAME)
+
+def load_manifest(dataset_path):
+    path = manifest_path(dataset_path)
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "entries": {}, "classes": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(dataset_path, manifest):
+    # Write-then-rename so readers never see a truncated manifest
+    path = manifest_path(dataset_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_dataset(dataset_path):
+    """Yields (rel_path, split, class_name, stat) for every tracked image, plus class dirs per split."""
+    classes = {}
+    files = []
+    for split in SPLITS:
+        split_dir = os.path.join(dataset_path, split)
+        if not os.path.isdir(split_dir):
+            continue
+        with os.scandir(split_dir) as class_entries:
+            class_dirs = sorted((e for e in class_entries if e.is_dir()), key=lambda e: e.name)
+        classes[split] = [e.name for e in class_dirs]
+        for class_entry in class_dirs:
+            with os.scandir(class_entry.path) as image_entries:
+                for entry in image_entries:
+                    if entry.is_file() and entry.name.lower().endswith(TRACKED_EXTENSIONS):
+                        rel_path = os.path.join(split, class_entry.name, entry.name)
+                        files.append((rel_path, split, class_entry.name, entry.stat()))
+    return files, classes
+
+def store_path(store_dir, img_size, content_hash):
+    size_dir = f"{img_size[0]}x{img_size[1]}"
+    return os.path.join(store_dir, size_dir, content_hash[:2], f"{content_hash}.u8")
+
+def _materialize(dataset_path, store_dir, img_size, pending):
+    """Decodes/resizes the pending (rel_path, hash) pairs into the store. Returns the hashes written."""
+    if not pending:
+        return set()
+    paths = [os.path.join(dataset_path, rel_path) for rel_path, _ in pending]
+    hashes = [content_hash for _, content_hash in pending]
+    dataset = tf.data.Dataset.from_tensor_slices((paths, hashes))
+    dataset = dataset.map(lambda p, h: _decode_and_resize(p, h, img_size), num_parallel_calls=tf.data.AUTOTUNE)
+    # Corrupt files are skipped here and stay out of the store (stored=False in the manifest)
+    dataset = dataset.ignore_errors().prefetch(tf.data.AUTOTUNE)
+
+    written = set()
+    for image, content_hash in dataset.as_numpy_iterator():
+        content_hash = content_hash.decode("utf-8")
+        target = store_path(store_dir, img_size, content_hash)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_target = target + ".tmp"
+        with open(tmp_target, "wb") as f:
+            f.write(image.tobytes())
+        os.replace(tmp_target, target)
+        written.add(content_hash)
+    return written
+
+def update_manifest(dataset_path, store_dir=None, img_size=(224, 224)):
+    """Diffs the dataset tree against its manifest and only re-hashes/decodes what changed.
+
+    Files whose (size, mtime) match the manifest keep their hash; new or modified
+    ones are hashed and, if a store is given and the store has no tensor for that
+    hash yet, decoded into it. Tensors of removed files and of the old content of
+    changed ones are deleted once nothing references them.
+    """
+    started = time.perf_counter()
+    manifest = load_manifest(dataset_path)
+    old_entries = manifest.get("entries", {})
+    size_key = f"{img_size[0]}x{img_size[1]}"
+    if store_dir and manifest.get("store", {}).get("image_size") != size_key:
+        # Different target size: every entry has to be materialized again
+        for entry in old_entries.values():
+            entry["stored"] = False
+
+    files, classes = scan_dataset(dataset_path)
+    entries = {}
+    added = changed = unchanged = 0
+    for rel_path, split, class_name, st in files:
+        old = old_entries.get(rel_path)
+        if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+            entries[rel_path] = old
+            unchanged += 1
+            continue
+        content_hash = file_md5(os.path.join(dataset_path, rel_path))
+        if old and old["hash"] == content_hash and old["class"] == class_name and old["split"] == split:
+            # Touched but same content: keep its store state, only refresh size/mtime
+            entries[rel_path] = dict(old, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            unchanged += 1
+            continue
+        if old:
+            changed += 1
+        else:
+            added += 1
+        entries[rel_path] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hash": content_hash,
+            "class": class_name,
+            "split": split,
+            "stored": False
+        }
+    removed = [rel_path for rel_path in old_entries if rel_path not in entries]
+
+    if store_dir:
+        pending = {}
+        for rel_path, entry in entries.items():
+            # Content-addressed: a tensor already in the store (same hash) is never decoded again
+            if os.path.exists(store_path(store_dir, img_size, entry["hash"])):
+                entry["stored"] = True
+                entry.pop("decode_error", None)
+                continue
+            entry["stored"] = False
+            # Files that failed to decode are retried only once they change on disk
+            if rel_path.lower().endswith(IMAGE_EXTENSIONS) and not entry.get("decode_error"):
+                pending.setdefault(entry["hash"], rel_path)
+        written = _materialize(dataset_path, store_dir, img_size,
+                               [(rel_path, content_hash) for content_hash, rel_path in pending.items()])
+        for entry in entries.values():
+            if entry["hash"] in written:
+                entry["stored"] = True
+            elif entry["hash"] in pending:
+                entry["decode_error"] = True
+
+        # Garbage-collect tensors this manifest referenced and no entry references any more
+        # (removed files and the old content of changed ones)
+        referenced = {entry["hash"] for entry in entries.values()}
+        for old_hash in {entry["hash"] for entry in old_entries.values()} - referenced:
+            try:
+                os.remove(store_path(store_dir, img_size, old_hash))
+            except FileNotFoundError:
+                pass
+        manifest["store"] = {"path": store_dir, "image_size": size_key}
+
+    counts = {}
+    for entry in entries.values():
+        split_counts = counts.setdefault(entry["split"], {})
+        split_counts[entry["class"]] = split_counts.get(entry["class"], 0) + 1
+
+    manifest.update({
+        "version": MANIFEST_VERSION,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "classes": classes,
+        "counts": counts,
+        "entries": entries
+    })
+    save_manifest(dataset_path, manifest)
+
+    elapsed = time.perf_counter() - started
+    print(f"🗂 Manifest {manifest_path(dataset_path)}: +{added} ~{changed} -{len(removed)} "
+          f"={unchanged} ({elapsed:.1f}s)")
+    return manifest
+
+def load_store_dataset(dataset_path, split, store_dir, img_size, batch_size, shuffle=False, seed=None, manifest=None):
+    """Reads the split from the resized-tensor store. Yields float32 [0, 255] images like image_dataset_from_directory.
+
+    Pass the manifest returned by ``update_manifest`` to read several splits from a single scan.
+    """
+    if manifest is None:
+        manifest = update_manifest(dataset_path, store_dir, img_size)
+    class_names = manifest["classes"].get(split, [])
+    class_index = {name: i for i, name in enumerate(class_names)}
+    items = sorted((rel_path, entry) for rel_path, entry in manifest["entries"].items()
+                   if entry["split"] == split and entry["stored"])
+    paths = [store_path(store_dir, img_size, entry["hash"]) for _, entry in items]
+    labels = [class_index[entry["class"]] for _, entry in items]
+    height, width = img_size
+
+    def _load(path, label):
+        image = tf.reshape(tf.io.decode_raw(tf.io.read_file(path), tf.uint8), (height, width, 3))
+        return tf.cast(image, tf.float32), label
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, tf.constant(labels, dtype=tf.int32)))
+    if shuffle:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(_load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    return dataset.batch(batch_size), class_names
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update a dataset version's manifest and resized-image store")
+    parser.add_argument("--dataset", required=True, help="Dataset version root (contains train_data/ and validation_data/)")
+    parser.add_argument("--store", help="Store directory for resized uint8 tensors (omit to only refresh the manifest)")
+    parser.add_argument("--size", type=int, nargs=2, default=[224, 224], metavar=("H", "W"))
+    args = parser.parse_args()
+    update_manifest(args.dataset, args.store, tuple(args.size))
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers, models
+
+from preprocessing import INPUT_RANGE
+from training_callbacks import EpochTimer
+
+def _inbound_layer_names(layer):
+    node = layer._inbound_nodes[0]
+    if hasattr(node, "parent_nodes"):  # Keras 3
+        return [parent.operation.name for parent in node.parent_nodes]
+    return [inbound.name for inbound in tf.nest.flatten(node.inbound_layers)]  # Keras 2
+
+def find_clean_cut(base_model, max_index):
+    """Largest layer index < max_index whose output is the only tensor later layers depend on.
+
+    MobileNetV2 has residual connections, so cutting at an arbitrary layer would
+    leave skip connections dangling; block outputs that feed a non-residual block
+    (e.g. block_9_add) are valid cut points.
+    """
+    index_of = {layer.name: i for i, layer in enumerate(base_model.layers)}
+    min_inbound = [min((index_of[name] for name in _inbound_layer_names(layer)), default=i)
+                   if i > 0 else 0 for i, layer in enumerate(base_model.layers)]
+    suffix_min = len(base_model.layers)
+    best = None
+    for k in range(len(base_model.layers) - 1, 0, -1):
+        if k < max_index and suffix_min >= k:
+            best = k
+            break
+        suffix_min = min(suffix_min, min_inbound[k])
+    if best is None:
+        raise ValueError("No clean cut point found in the base model")
+    return best
+
+def split_base_model(base_model, cut_index):
+    """Returns (prefix, suffix) models sharing the base model's layers (and weights)."""
+    cut_layer = base_model.layers[cut_index]
+    prefix = models.Model(base_model.input, cut_layer.output, name="frozen_prefix")
+
+    suffix_input = layers.Input(shape=cut_layer.output.shape[1:], name="cached_features")
+    tensors = {cut_layer.name: suffix_input}
+    for layer in base_model.layers[cut_index + 1:]:
+        inputs = [tensors[name] for name in _inbound_layer_names(layer)]
+        tensors[layer.name] = layer(inputs[0] if len(inputs) == 1 else inputs)
+    suffix = models.Model(suffix_input, tensors[base_model.layers[-1].name], name="trainable_suffix")
+    return prefix, suffix
+
+def _cache_key(dataset_fingerprint, split, cut_layer_name, views, img_size, weights):
+    # The input range is part of the key: features computed under another normalization are stale
+    payload = json.dumps([dataset_fingerprint, split, cut_layer_name, views, list(img_size), weights, list(INPUT_RANGE)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def extract_features(prefix, dataset, cache_dir, views=1, augmentation=None):
+    """Runs the frozen prefix over the dataset and writes float16 features, one file per view.
+
+    Labels are written alongside so the dataset's (possibly shuffled) order does not matter.
+    """
+    if os.path.exists(os.path.join(cache_dir, "meta.json")):
+        with open(os.path.join(cache_dir, "meta.json"), "r", encoding="utf-8") as f:
+            print(f"♻️ Feature cache up to date: {cache_dir}")
+            return json.load(f)
+
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    @tf.function
+    def _run(images, augment):
+        if augment:
+            images = augmentation(images, training=True)
+        return tf.cast(prefix(images, training=False), tf.float16)
+
+    started = time.perf_counter()
+    count = 0
+    feature_shape = None
+    view_files = [open(os.path.join(tmp_dir, f"view_{v}.f16"), "wb") for v in range(views)]
+    labels = []
+    try:
+        for images, batch_labels in dataset:
+            for view_file in view_files:
+                features = _run(images, augmentation is not None).numpy()
+                feature_shape = features.shape[1:]
+                view_file.write(features.tobytes())
+            labels.append(batch_labels.numpy().astype(np.int32))
+            count += len(batch_labels)
+    finally:
+        for view_file in view_files:
+            view_file.close()
+
+    np.save(os.path.join(tmp_dir, "labels.npy"), np.concatenate(labels) if labels else np.zeros(0, np.int32))
+    meta = {
+        "num_examples": count,
+        "feature_shape": [int(d) for d in feature_shape] if feature_shape else [],
+        "views": views,
+        "augmented": augmentation is not None,
+        "extraction_seconds": time.perf_counter() - started
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    print(f"✅ Extracted {count} x {views} feature views to {cache_dir} in {meta['extraction_seconds']:.1f}s")
+    return meta
+
+def feature_dataset(cache_dir, meta, batch_size, shuffle):
+    """tf.data over memory-mapped float16 features; each example draws one of its augmented views."""
+    shape = (meta["num_examples"],) + tuple(meta["feature_shape"])
+    view_arrays = [np.memmap(os.path.join(cache_dir, f"view_{v}.f16"), dtype=np.float16, mode="r", shape=shape)
+                   for v in range(meta["views"])]
+    labels = np.load(os.path.join(cache_dir, "labels.npy"))
+    num_views = meta["views"]
+
+    def _gather(indices, view_ids):
+        out = np.empty((len(indices),) + shape[1:], dtype=np.float16)
+        for v in np.unique(view_ids):
+            mask = view_ids == v
+            out[mask] = view_arrays[v][indices[mask]]
+        return out
+
+    def _load(indices):
+        view_ids = tf.random.uniform(tf.shape(indices), 0, num_views, dtype=tf.int32)
+        features = tf.numpy_function(_gather, [indices, view_ids], tf.float16)
+        features = tf.ensure_shape(features, (None,) + shape[1:])
+        return tf.cast(features, tf.float32), tf.gather(labels, indices)
+
+    dataset = tf.data.Dataset.range(meta["num_examples"])
+    if shuffle:
+        dataset = dataset.shuffle(meta["num_examples"], reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(_load, num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def build_feature_model(suffix, head_layers):
+    """Trainable suffix + the same head layer objects used by the end-to-end model."""
+    features = layers.Input(shape=suffix.input.shape[1:])
+    x = suffix(features)
+    for layer in head_layers:
+        x = layer(x)
+    return models.Model(features, x, name="feature_model")
+
+def train_from_features(full_model, base_model, head_layers, augmentation, train_ds, val_ds,
+                        fe_config, params, frozen_layers, dataset_fingerprints, img_size,
+                        compile_model, callbacks):
+    """Two-stage training: cache the frozen prefix once, then fit suffix + head on the cache.
+
+    The weights are shared with ``full_model``, which is what gets saved.
+    """
+    cut_index = find_clean_cut(base_model, frozen_layers)
+    cut_name = base_model.layers[cut_index].name
+    print(f"✂️ Frozen prefix cut at layer {cut_index} ({cut_name}); "
+          f"layers {cut_index + 1}-{frozen_layers - 1} stay frozen in the suffix")
+    prefix, suffix = split_base_model(base_model, cut_index)
+
+    weights = "imagenet" if params["fine_tuning"].get("pretrained", True) else "random"
+    views = fe_config.get("augmented_views", 3)
+    cache_root = fe_config.get("cache_dir", "data/features")
+    train_cache = os.path.join(cache_root, "train-" + _cache_key(
+        dataset_fingerprints["train"], "train", cut_name, views, img_size, weights))
+    val_cache = os.path.join(cache_root, "validation-" + _cache_key(
+        dataset_fingerprints["validation"], "validation", cut_name, 1, img_size, weights))
+
+    train_meta = extract_features(prefix, train_ds, train_cache, views=views, augmentation=augmentation)
+    val_meta = extract_features(prefix, val_ds, val_cache, views=1)
+
+    batch_size = params["batch_size"]
+    train_features = feature_dataset(train_cache, train_meta, batch_size, shuffle=True)
+    val_features = feature_dataset(val_cache, val_meta, batch_size, shuffle=False)
+
+    # Optional reference: time a few end-to-end epochs on a throwaway copy of the model
+    end_to_end_time = None
+    compare_epochs = fe_config.get("compare_end_to_end_epochs", 0)
+    if compare_epochs:
+        reference = tf.keras.models.clone_model(full_model)
+        compile_model(reference)
+        reference_timer = EpochTimer("end-to-end")
+        reference.fit(train_ds, validation_data=val_ds, epochs=compare_epochs, callbacks=[reference_timer])
+        end_to_end_time = reference_timer.mean_epoch_time()
+        del reference
+
+    feature_model = build_feature_model(suffix, head_layers)
+    compile_model(feature_model)
+    timer = EpochTimer("features")
+    feature_model.fit(train_features, validation_data=val_features, epochs=params["num_epochs"],
+                      callbacks=list(callbacks) + [timer])
+
+    feature_time = timer.mean_epoch_time()
+    print(f"📊 Feature extraction (one-off): train {train_meta['extraction_seconds']:.1f}s, "
+          f"validation {val_meta['extraction_seconds']:.1f}s")
+    if feature_time is not None:
+        summary = f"📊 Mean epoch: {feature_time:.1f}s from cached features"
+        if end_to_end_time:
+            summary += f" vs {end_to_end_time:.1f}s end-to-end ({end_to_end_time / feature_time:.1f}x faster)"
+        print(summary)
+    return feature_model
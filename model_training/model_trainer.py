@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import argparse
 import tensorflow as tf
@@ -7,8 +8,19 @@ from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.preprocessing import image_dataset_from_directory
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
 
+# Repo-root modules (model_bundle, preprocessing) are shared with the API and scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_bundle import save_metadata
 from preprocess import preprocess_pipeline
 from data_augmentation import get_augmentation_pipeline
+from tflite_export import export_tflite_models
+from dataset_cache import cached_dataset
+from dataset_manifest import load_store_dataset, update_manifest
+from dataset_cache import fingerprint_directory
+from feature_cache import train_from_features
+from training_callbacks import EpochTimer, ThroughputLogger
+from performance_profile import (apply_performance_profile, compile_kwargs, compute_dtypes, dataset_options,
+                                 float32_copy, map_parallel_calls, print_profile)
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser()
@@ -23,6 +35,10 @@ params = config["training_parameters"]
 paths = config["paths"]
 img_size = tuple(config["image_settings"]["input_size"])
 
+# Threading and precision must be set before TensorFlow executes any op
+profile = apply_performance_profile(config.get("performance"))
+print_profile(profile)
+
 dataset_path = paths["dataset"]
 train_path = os.path.join(dataset_path, paths["train_data"])
 val_path = os.path.join(dataset_path, paths["validation_data"])
@@ -30,51 +46,120 @@ model_path = paths["model_output"]
 
 # Dataset
 batch_size = params["batch_size"]
-train_ds = image_dataset_from_directory(train_path, image_size=img_size, batch_size=batch_size)
-val_ds = image_dataset_from_directory(val_path, image_size=img_size, batch_size=batch_size)
-class_names = train_ds.class_names
+cache_config = config.get("data_cache", {})
+if cache_config.get("enabled", False) and cache_config.get("format", "tfrecord") == "store":
+    # Incremental store: only images added/changed since the last manifest are decoded
+    store_dir = cache_config.get("cache_dir", "data/cache")
+    manifest = update_manifest(dataset_path, store_dir, img_size)
+    train_ds, class_names = load_store_dataset(dataset_path, paths["train_data"], store_dir, img_size, batch_size,
+                                               shuffle=True, manifest=manifest)
+    val_ds, _ = load_store_dataset(dataset_path, paths["validation_data"], store_dir, img_size, batch_size,
+                                   shuffle=False, manifest=manifest)
+elif cache_config.get("enabled", False):
+    # Decoded/resized once into sharded TFRecords, rebuilt only when the source changes
+    train_ds, class_names = cached_dataset(train_path, cache_config, img_size, batch_size, shuffle=True)
+    val_ds, _ = cached_dataset(val_path, cache_config, img_size, batch_size, shuffle=False)
+else:
+    train_ds = image_dataset_from_directory(train_path, image_size=img_size, batch_size=batch_size)
+    val_ds = image_dataset_from_directory(val_path, image_size=img_size, batch_size=batch_size)
+    class_names = train_ds.class_names
 print("Classes:", class_names)
 
 # Apply preprocessing
-train_ds = train_ds.map(preprocess_pipeline(size=img_size))
-val_ds = val_ds.map(preprocess_pipeline(size=img_size))
-
-# Apply data optimization
 AUTOTUNE = tf.data.AUTOTUNE
-train_ds = train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
-val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
+train_ds = train_ds.map(preprocess_pipeline(size=img_size), num_parallel_calls=map_parallel_calls(profile))
+val_ds = val_ds.map(preprocess_pipeline(size=img_size), num_parallel_calls=map_parallel_calls(profile))
+train_ds = train_ds.with_options(dataset_options(profile))
+val_ds = val_ds.with_options(dataset_options(profile))
 
-# Load base model
-base_model = MobileNetV2(input_shape=img_size + (3,), include_top=False, weights="imagenet")
-base_model.trainable = True
-for layer in base_model.layers[:params["fine_tuning"]["frozen_layers"]]:
-    layer.trainable = False
+# Apply data optimization
+if cache_config.get("enabled", False):
+    # Shards are already shuffled on read; no in-memory copy of the whole dataset
+    train_ds = train_ds.prefetch(buffer_size=AUTOTUNE)
+    val_ds = val_ds.prefetch(buffer_size=AUTOTUNE)
+else:
+    train_ds = train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
+    val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
 
 # Build model
-model = models.Sequential([
-    get_augmentation_pipeline(),
-    base_model,
-    layers.GlobalAveragePooling2D(),
-    layers.BatchNormalization(),
-    layers.Dense(128, activation="relu"),
-    layers.Dropout(0.3),
-    layers.Dense(len(class_names), activation="softmax")
-])
+def build_model(weights="imagenet"):
+    """Same architecture under the current global dtype policy: (model, base_model, augmentation, head_layers)."""
+    base_model = MobileNetV2(input_shape=img_size + (3,), include_top=False, weights=weights)
+    base_model.trainable = True
+    for layer in base_model.layers[:params["fine_tuning"]["frozen_layers"]]:
+        layer.trainable = False
+
+    augmentation = get_augmentation_pipeline()
+    head_layers = [
+        layers.GlobalAveragePooling2D(),
+        layers.BatchNormalization(),
+        layers.Dense(128, activation="relu"),
+        layers.Dropout(0.3),
+        # float32 softmax keeps the probabilities stable under mixed_bfloat16
+        layers.Dense(len(class_names), activation="softmax", dtype="float32")
+    ]
+    # Explicit Input: in feature-extraction mode the full model is never called before saving,
+    # and an unbuilt model can't be exported or report its input shape after reloading
+    model = models.Sequential([layers.Input(shape=img_size + (3,)), augmentation, base_model] + head_layers)
+    return model, base_model, augmentation, head_layers
+
+model, base_model, augmentation, head_layers = build_model()
 
 # Compile
-model.compile(
-    optimizer=tf.keras.optimizers.Adam(learning_rate=params["learning_rate"]),
-    loss=params["loss_function"],
-    metrics=["accuracy"]
-)
+def compile_model(target):
+    target.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=params["learning_rate"]),
+        loss=params["loss_function"],
+        metrics=["accuracy"],
+        **compile_kwargs(profile)
+    )
+compile_model(model)
 
 # Callbacks
 early_stopping = EarlyStopping(**params["callbacks"]["early_stopping"])
 reduce_lr = ReduceLROnPlateau(**params["callbacks"]["reduce_lr_on_plateau"])
+train_callbacks = [early_stopping, reduce_lr]
+if profile["log_throughput"]:
+    train_callbacks.append(ThroughputLogger(batch_size))
 
 # Train
-model.fit(train_ds, validation_data=val_ds, epochs=params["num_epochs"], callbacks=[early_stopping, reduce_lr])
+fe_config = config.get("feature_extraction", {})
+if fe_config.get("enabled", False):
+    # Two-stage: frozen prefix computed once, suffix + head trained from cached features
+    fingerprints = {
+        "train": fingerprint_directory(train_path, img_size)[0],
+        "validation": fingerprint_directory(val_path, img_size)[0]
+    }
+    train_from_features(model, base_model, head_layers, augmentation, train_ds, val_ds,
+                        fe_config, params, params["fine_tuning"]["frozen_layers"], fingerprints,
+                        img_size, compile_model, train_callbacks)
+else:
+    model.fit(train_ds, validation_data=val_ds, epochs=params["num_epochs"], callbacks=train_callbacks + [EpochTimer()])
 
 # Save
+if profile["mixed_precision"] != "float32":
+    # The mixed policy is stored in every layer: serving hosts without native bf16 and the
+    # TFLite converter would inherit it, so the saved artifact is a float32 copy
+    model = float32_copy(model, lambda: build_model(weights=None)[0])
 model.save(model_path)
-print(f"✅ Model saved at {model_path}")
\ No newline at end of file
+print(f"✅ Model saved at {model_path}")
+
+# The reloaded artifact is what the API serves: it must be built and give one output per class
+reloaded = tf.keras.models.load_model(model_path)
+probe_output = reloaded(tf.zeros((1,) + img_size + (3,)), training=False)
+dtypes = compute_dtypes(reloaded)
+if (tuple(reloaded.input_shape[1:3]) != img_size or probe_output.shape[-1] != len(class_names)
+        or dtypes != {"float32"}):
+    raise RuntimeError(f"Saved model check failed: input {reloaded.input_shape}, output {probe_output.shape}, "
+                       f"compute dtypes {sorted(dtypes)}")
+del reloaded
+# Class order and input contract next to the model, so loaders never need the dataset
+print(f"✅ Metadata saved at {save_metadata(model_path, class_names, img_size, dataset=dataset_path)}")
+
+# Optional TFLite export (float16 / int8 post-training quantization)
+tflite_config = config.get("export", {}).get("tflite", {})
+if tflite_config.get("enabled", False):
+    exported = export_tflite_models(model, model_path, tflite_config, calibration_ds=train_ds, val_ds=val_ds)
+    # Each .tflite gets its own metadata, so tflite-only deployments don't need the .keras next to it
+    for quantization, result in exported.items():
+        save_metadata(result["path"], class_names, img_size, dataset=dataset_path, quantization=quantization)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import os
+import tensorflow as tf
+
+DEFAULT_PROFILE = {
+    "intra_op_threads": 0,
+    "inter_op_threads": 0,
+    "jit_compile": "auto",
+    "mixed_precision": "auto",
+    "map_parallel_calls": "autotune",
+    "deterministic": False,
+    "steps_per_execution": 1,
+    "log_throughput": True
+}
+
+def cpu_supports_bfloat16():
+    """True when the CPU has native bfloat16 math (AVX512_BF16 / AMX); emulated bf16 is slower than float32."""
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+def resolve_precision(requested):
+    if requested == "auto":
+        return "mixed_bfloat16" if cpu_supports_bfloat16() else "float32"
+    if requested == "mixed_bfloat16" and not cpu_supports_bfloat16():
+        print("⚠️ mixed_bfloat16 requested but the CPU has no native bfloat16 support; it will be emulated")
+    return requested
+
+def apply_performance_profile(profile_config):
+    """Applies threading and precision settings. Must run before any TensorFlow op executes.
+
+    Returns the effective profile (defaults filled in, "auto" values resolved).
+    """
+    profile = dict(DEFAULT_PROFILE, **(profile_config or {}))
+
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(profile["intra_op_threads"])
+        tf.config.threading.set_inter_op_parallelism_threads(profile["inter_op_threads"])
+    except RuntimeError as e:
+        print(f"⚠️ Thread settings ignored, TensorFlow runtime already initialized: {e}")
+    # 0 means "let TensorFlow decide" (sized from the machine's cores)
+    profile["intra_op_threads"] = tf.config.threading.get_intra_op_parallelism_threads() or f"auto ({os.cpu_count()} cpus)"
+    profile["inter_op_threads"] = tf.config.threading.get_inter_op_parallelism_threads() or "auto"
+
+    profile["mixed_precision"] = resolve_precision(profile["mixed_precision"])
+    tf.keras.mixed_precision.set_global_policy(profile["mixed_precision"])
+    return profile
+
+def float32_copy(model, build_model):
+    """Rebuilds the model under the float32 policy and copies the trained weights into it.
+
+    Mixed-policy variables are already float32, so the weights transfer unchanged.
+    """
+    tf.keras.mixed_precision.set_global_policy("float32")
+    serving_model = build_model()
+    serving_model.set_weights(model.get_weights())
+    return serving_model
+
+def compute_dtypes(model):
+    """Set of compute dtypes over all (nested) layers."""
+    dtypes = set()
+    pending = list(model.layers)
+    while pending:
+        layer = pending.pop()
+        pending.extend(getattr(layer, "layers", []))
+        dtypes.add(layer.compute_dtype)
+    return dtypes
+
+def map_parallel_calls(profile):
+    value = profile["map_parallel_calls"]
+    return tf.data.AUTOTUNE if value == "autotune" else int(value)
+
+def dataset_options(profile):
+    """tf.data options shared by the train and validation pipelines."""
+    options = tf.data.Options()
+    options.deterministic = bool(profile["deterministic"])
+    return options
+
+def compile_kwargs(profile):
+    return {
+        "jit_compile": profile["jit_compile"],
+        "steps_per_execution": int(profile["steps_per_execution"])
+    }
+
+def print_profile(profile):
+    print("⚙️ Training performance profile:")
+    for key in DEFAULT_PROFILE:
+        print(f"   {key}: {profile[key]}")
@@ -1,19 +1,12 @@
-import tensorflow as tf
+import os
+import sys
 
-def normalize_img(image, label):
-    """Scale image pixels to [0, 1] range."""
-    image = tf.cast(image, tf.float32) / 255.0
-    return image, label
-
-def resize_img(image, label, size=(224, 224)):
-    """Resize image to the specified size."""
-    image = tf.image.resize(image, size)
-    return image, label
+# The normalization lives in the repo-root preprocessing module, shared with the API and camera loader
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preprocessing import preprocess_tf
 
 def preprocess_pipeline(size=(224, 224)):
-    """Returns a composed preprocessing pipeline."""
+    """Returns the shared resize + normalize step as a (image, label) map function."""
     def _process(image, label):
-        image, label = resize_img(image, label, size)
-        image, label = normalize_img(image, label)
-        return image, label
-    return _process
\ No newline at end of file
+        return preprocess_tf(image, size), label
+    return _process
@@ -0,0 +1,111 @@
+import os
+import sys
+import numpy as np
+import tensorflow as tf
+
+# Accuracy is measured with the same TFLite forward pass the API serves the artifact with
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.inference.backends import TFLiteBackend
+
+SUPPORTED_QUANTIZATIONS = ("float32", "float16", "int8")
+
+def tflite_output_path(model_path, quantization):
+    """models/foo.keras -> models/foo_int8.tflite"""
+    base, _ = os.path.splitext(model_path)
+    return f"{base}_{quantization}.tflite"
+
+def representative_dataset(dataset, num_samples):
+    """Calibration generator for int8 post-training quantization (one image per step)."""
+    def _generator():
+        seen = 0
+        for images, _ in dataset:
+            for image in images:
+                if seen >= num_samples:
+                    return
+                yield [tf.expand_dims(tf.cast(image, tf.float32), 0)]
+                seen += 1
+    return _generator
+
+def convert_to_tflite(model, quantization, calibration_ds=None, calibration_samples=200):
+    """Converts a Keras model to a TFLite flatbuffer with the requested quantization."""
+    if quantization not in SUPPORTED_QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization: {quantization}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if calibration_ds is None:
+            raise ValueError("int8 quantization needs a calibration dataset")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_ds, calibration_samples)
+        # Float I/O keeps the serving contract identical to the Keras model
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+            tf.lite.OpsSet.TFLITE_BUILTINS
+        ]
+    return converter.convert()
+
+def verify_tflite(tflite_path, model):
+    """Loads the exported artifact and checks its input/output shapes against the Keras model."""
+    backend = TFLiteBackend(tflite_path, model.input_shape[1:3], pool_size=1)
+    input_shape, output_shape = backend.io_shapes()
+    if input_shape[1:] != tuple(model.input_shape[1:]) or output_shape[-1] != model.output_shape[-1]:
+        raise RuntimeError(f"{tflite_path}: input {input_shape[1:]} / {output_shape[-1]} outputs, "
+                           f"expected {tuple(model.input_shape[1:])} / {model.output_shape[-1]}")
+
+def compare_accuracy(model, tflite_path, val_ds):
+    """Top-1 accuracy of the Keras model vs. the TFLite artifact on the same batches."""
+    backend = TFLiteBackend(tflite_path, model.input_shape[1:3], pool_size=1)
+
+    total = keras_correct = tflite_correct = agree = 0
+    for images, labels in val_ds:
+        images = images.numpy().astype(np.float32)
+        labels = labels.numpy()
+        keras_pred = np.argmax(model(images, training=False).numpy(), axis=1)
+        tflite_pred = np.argmax(backend.predict(images), axis=1)
+        total += len(labels)
+        keras_correct += int(np.sum(keras_pred == labels))
+        tflite_correct += int(np.sum(tflite_pred == labels))
+        agree += int(np.sum(keras_pred == tflite_pred))
+
+    if total == 0:
+        return None
+    keras_acc = keras_correct / total
+    tflite_acc = tflite_correct / total
+    return {
+        "samples": total,
+        "keras_accuracy": keras_acc,
+        "tflite_accuracy": tflite_acc,
+        "accuracy_delta": tflite_acc - keras_acc,
+        "prediction_agreement": agree / total
+    }
+
+def export_tflite_models(model, model_path, export_config, calibration_ds, val_ds):
+    """Writes one .tflite per configured quantization and reports its accuracy cost."""
+    results = {}
+    for quantization in export_config.get("quantizations", ["float16", "int8"]):
+        output_path = tflite_output_path(model_path, quantization)
+        flatbuffer = convert_to_tflite(
+            model, quantization,
+            calibration_ds=calibration_ds,
+            calibration_samples=export_config.get("calibration_samples", 200)
+        )
+        with open(output_path, "wb") as f:
+            f.write(flatbuffer)
+        size_mb = len(flatbuffer) / (1024 * 1024)
+        verify_tflite(output_path, model)
+        print(f"✅ TFLite ({quantization}) saved at {output_path} ({size_mb:.1f} MB)")
+
+        result = {"path": output_path, "size_mb": size_mb}
+        if export_config.get("compare_accuracy", True) and val_ds is not None:
+            comparison = compare_accuracy(model, output_path, val_ds)
+            if comparison:
+                result.update(comparison)
+                print(f"📏 {quantization}: keras={comparison['keras_accuracy']:.4f} "
+                      f"tflite={comparison['tflite_accuracy']:.4f} "
+                      f"delta={comparison['accuracy_delta']:+.4f} "
+                      f"agreement={comparison['prediction_agreement']:.4f}")
+        results[quantization] = result
+    return results
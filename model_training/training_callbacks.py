@@ -0,0 +1,54 @@
+import time
+import tensorflow as tf
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Records wall-clock seconds per epoch."""
+
+    def __init__(self, label="train"):
+        super().__init__()
+        self.label = label
+        self.epoch_times = []
+        self._started = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._started
+        self.epoch_times.append(elapsed)
+        print(f"⏱️ [{self.label}] epoch {epoch + 1}: {elapsed:.1f}s")
+
+    def mean_epoch_time(self):
+        return sum(self.epoch_times) / len(self.epoch_times) if self.epoch_times else None
+
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """Logs training images/s per epoch (validation time excluded).
+
+    Image count is steps x batch_size, so a partial last batch is slightly over-counted.
+    """
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.images_per_second = []
+        self._started = None
+        self._last_batch_end = None
+        self._steps = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+        self._last_batch_end = self._started
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        # With steps_per_execution > 1 this fires once per execution with the last step index
+        self._steps = max(self._steps, batch + 1)
+        self._last_batch_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = self._last_batch_end - self._started
+        if not self._steps or elapsed <= 0:
+            return
+        rate = self._steps * self.batch_size / elapsed
+        self.images_per_second.append(rate)
+        print(f"🚀 epoch {epoch + 1}: {rate:.1f} images/s ({self._steps} steps in {elapsed:.1f}s)")
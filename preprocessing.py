@@ -0,0 +1,57 @@
+"""Preprocesado único compartido por el entrenamiento, la API y el cargador de cámara.
+
+Convención de MobileNetV2: píxeles RGB uint8 [0, 255] -> float32 [-1, 1] y
+redimensionado bilineal a ``image_size``. TensorFlow y OpenCV se importan de forma
+perezosa para que la API con backend TFLite no cargue TensorFlow solo por esto.
+"""
+import numpy as np
+
+# Rango de entrada que espera el modelo (y que usan las capas de aumento de datos)
+INPUT_RANGE = (-1.0, 1.0)
+PIXEL_SCALE = 1.0 / 127.5
+PIXEL_OFFSET = -1.0
+
+
+def normalize(pixels, out=None):
+    """uint8 (..., H, W, 3) -> float32 [-1, 1] en una sola pasada vectorizada.
+
+    Acepta una imagen o un lote y, si se da ``out``, escribe directamente sobre él.
+    """
+    if out is None:
+        out = np.empty(np.shape(pixels), dtype=np.float32)
+    np.multiply(pixels, PIXEL_SCALE, out=out, casting="unsafe")
+    out += PIXEL_OFFSET
+    return out
+
+
+def resize_pil(image, image_size):
+    """Imagen PIL -> RGB de ``image_size`` (ancho, alto) con interpolación bilineal."""
+    from PIL import Image
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if image.size != tuple(image_size):
+        image = image.resize(tuple(image_size), Image.BILINEAR)
+    return image
+
+
+def preprocess_bgr_frame(frame, image_size, out=None):
+    """Frame BGR de OpenCV -> tensor (H, W, 3) RGB [-1, 1].
+
+    El cambio BGR -> RGB es una vista con paso negativo: no hay copia intermedia.
+    """
+    import cv2
+
+    if frame.shape[1::-1] != tuple(image_size):
+        frame = cv2.resize(frame, tuple(image_size), interpolation=cv2.INTER_LINEAR)
+    return normalize(frame[..., ::-1], out=out)
+
+
+def preprocess_tf(images, image_size):
+    """Lote (o imagen) de TensorFlow en [0, 255] -> float32 [-1, 1] a ``image_size`` (alto, ancho)."""
+    import tensorflow as tf
+
+    images = tf.cast(images, tf.float32)
+    if tuple(images.shape[-3:-1]) != tuple(image_size):
+        images = tf.image.resize(images, image_size, method="bilinear")
+    return images * PIXEL_SCALE + PIXEL_OFFSET
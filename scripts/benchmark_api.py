@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""Benchmark de carga de la API de predicción.
+
+Cada escenario levanta su propio servidor (``serve.py``) en un subproceso y un
+puerto libre, así el generador de carga no comparte GIL, hilos ni memoria con la
+API. Reproduce un corpus de JPEGs con la concurrencia y tasa indicadas y escribe
+un JSON con throughput, latencias p50/p95/p99, tasa de errores y el RSS pico del
+servidor para poder comparar entre commits.
+"""
+import argparse
+import base64
+import copy
+import glob
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("single", "json", "batch", "cached")
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_json(data, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return 'unknown'
+
+def process_tree_peak_rss_mb(pid):
+    """Suma del RSS pico (VmHWM) del proceso y sus hijos, leído de /proc; None fuera de Linux."""
+    def children(pid):
+        try:
+            with open(f"/proc/{pid}/task/{pid}/children") as f:
+                return [int(child) for child in f.read().split()]
+        except OSError:
+            return []
+
+    total_kb = None
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending += children(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total_kb = (total_kb or 0) + int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024 if total_kb is not None else None
+
+def build_stand_in_model(config, output_dir):
+    """Modelo diminuto inicializado al azar con la misma entrada y número de clases."""
+    import tensorflow as tf
+    num_classes = len(load_json(config['classes_path']))
+    height, width = config['image_size'][1], config['image_size'][0]
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(height, width, 3)),
+        tf.keras.layers.Conv2D(8, 3, strides=4, activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(num_classes, activation='softmax')
+    ])
+    path = os.path.join(output_dir, 'stand_in_model.keras')
+    model.save(path)
+    return path
+
+def load_corpus(corpus_dir, synthetic_count, seed=0):
+    """JPEGs del directorio indicado o, si no hay, fotogramas sintéticos de 640x480."""
+    if corpus_dir:
+        paths = sorted(p for ext in ('*.jpg', '*.jpeg', '*.JPG', '*.JPEG')
+                       for p in glob.glob(os.path.join(corpus_dir, '**', ext), recursive=True))
+        if paths:
+            corpus = []
+            for path in paths:
+                with open(path, 'rb') as f:
+                    corpus.append(f.read())
+            return corpus
+        print(f"⚠️ No se encontraron JPEGs en {corpus_dir}, usando imágenes sintéticas")
+
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for _ in range(synthetic_count):
+        pixels = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, format='JPEG', quality=85)
+        corpus.append(buf.getvalue())
+    return corpus
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class ServerProcess:
+    """``serve.py`` en un subproceso con la configuración del escenario; espera a /health/ready."""
+
+    def __init__(self, config, workers, tmp_dir, name, startup_timeout=300):
+        self.config_path = os.path.join(tmp_dir, f"api_config_{name}.json")
+        self.log_path = os.path.join(tmp_dir, f"serve_{name}.log")
+        save_json(config, self.config_path)
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self):
+        # La salida del servidor (un log de acceso por petición) va a un fichero aparte
+        with open(self.log_path, 'wb') as log:
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, 'serve.py'), '--config', self.config_path,
+                 '--host', '127.0.0.1', '--port', str(self.port), '--workers', str(self.workers)],
+                cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"serve.py terminó al arrancar (exit {self.process.returncode}):\n"
+                                   f"{self.log_tail()}")
+            try:
+                ready = requests.get(f"{self.url}/health/ready", timeout=2).json()
+                if ready.get('workers', {}).get('ready') == self.workers:
+                    return self
+            except (requests.RequestException, ValueError):
+                pass
+            time.sleep(0.5)
+        self.__exit__()
+        raise RuntimeError(f"serve.py no estuvo listo en {self.startup_timeout}s:\n{self.log_tail()}")
+
+    def log_tail(self, lines=20):
+        with open(self.log_path, 'r', encoding='utf-8', errors='replace') as f:
+            return ''.join(f.readlines()[-lines:])
+
+    def peak_rss_mb(self):
+        return process_tree_peak_rss_mb(self.process.pid)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+def scenario_config(base_config, scenario):
+    config = copy.deepcopy(base_config)
+    config.setdefault('cache', {})['enabled'] = scenario == 'cached'
+    return config
+
+def make_request_fn(scenario, url, corpus, batch_size):
+    """Devuelve (función que ejecuta la petición i, imágenes por petición)."""
+    local = threading.local()
+    encoded = [base64.b64encode(jpeg).decode('ascii') for jpeg in corpus] if scenario in ('json', 'batch') else None
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    if scenario in ('single', 'cached'):
+        def send(i):
+            # En "cached" se repite siempre el mismo frame, como una cámara con el producto quieto
+            jpeg = corpus[0] if scenario == 'cached' else corpus[i % len(corpus)]
+            return session().post(f"{url}/predict", data=jpeg,
+                                  headers={'Content-Type': 'image/jpeg'}, timeout=60)
+        return send, 1
+
+    if scenario == 'json':
+        def send(i):
+            return session().post(f"{url}/predict", json={'image': encoded[i % len(encoded)]}, timeout=60)
+        return send, 1
+
+    if scenario == 'batch':
+        def send(i):
+            start = (i * batch_size) % len(encoded)
+            images = [encoded[(start + j) % len(encoded)] for j in range(batch_size)]
+            return session().post(f"{url}/predict/batch", json={'images': images, 'top_k': 3},
+                                  headers={'Accept': 'application/json'}, timeout=300)
+        return send, batch_size
+
+    raise ValueError(f"Escenario desconocido: {scenario}")
+
+def run_load(send, total_requests, concurrency, rate):
+    """Ejecuta las peticiones; con ``rate`` > 0 se programan a tasa fija (bucle abierto)."""
+    latencies = [None] * total_requests
+    statuses = [None] * total_requests
+    started = time.perf_counter()
+
+    def task(i):
+        if rate > 0:
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        try:
+            response = send(i)
+            response.content
+            statuses[i] = response.status_code
+        except requests.RequestException as e:
+            statuses[i] = type(e).__name__
+        latencies[i] = time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(task, range(total_requests)))
+    return latencies, statuses, time.perf_counter() - started
+
+def summarize(latencies, statuses, elapsed, images_per_request):
+    values = np.array(latencies, dtype=np.float64) * 1000.0
+    ok = sum(1 for s in statuses if s == 200)
+    status_counts = {}
+    for status in statuses:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'requests': len(statuses),
+        'elapsed_s': elapsed,
+        'throughput_rps': len(statuses) / elapsed,
+        'throughput_images_per_s': ok * images_per_request / elapsed,
+        'latency_ms': {
+            'mean': float(values.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(values.max())
+        },
+        'error_rate': 1.0 - ok / len(statuses),
+        'status_counts': status_counts
+    }
+
+def run_scenario(scenario, base_config, corpus, args, tmp_dir):
+    with ServerProcess(scenario_config(base_config, scenario), args.workers, tmp_dir, scenario) as server:
+        send, images_per_request = make_request_fn(scenario, server.url, corpus, args.batch_size)
+        # Calentamiento del cliente y del servidor fuera de la medición
+        for i in range(min(args.warmup_requests, args.requests)):
+            send(i)
+        latencies, statuses, elapsed = run_load(send, args.requests, args.concurrency, args.rate)
+        server_stats = requests.get(f"{server.url}/predict/stats", timeout=10).json()
+        # Antes de parar el servidor: el pico es el de sus procesos, no el del generador de carga
+        server_peak_rss = server.peak_rss_mb()
+
+    result = summarize(latencies, statuses, elapsed, images_per_request)
+    result['images_per_request'] = images_per_request
+    result['server_stats'] = server_stats
+    result['server_peak_rss_mb'] = server_peak_rss
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga de la API de predicción')
+    parser.add_argument('--config', default='config/v1/api_config.json', help='Configuración de la API')
+    parser.add_argument('--model', help='Modelo a servir (por defecto, un modelo diminuto aleatorio)')
+    parser.add_argument('--corpus', help='Directorio con JPEGs a reproducir (por defecto, sintéticos)')
+    parser.add_argument('--synthetic-images', type=int, default=32)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Escenarios separados por comas: {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=200, help='Peticiones por escenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=0, help='Peticiones/s (0 = sin límite)')
+    parser.add_argument('--batch-size', type=int, default=16, help='Imágenes por petición en "batch"')
+    parser.add_argument('--warmup-requests', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=1, help='Workers de serve.py por escenario')
+    parser.add_argument('--output', help='JSON de salida (por defecto benchmarks/results/...)')
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    base_config = load_json(args.config)
+    corpus = load_corpus(args.corpus, args.synthetic_images)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.model:
+            base_config['model_path'] = args.model
+        else:
+            base_config['model_path'] = build_stand_in_model(base_config, tmp_dir)
+            # El modelo aleatorio solo tiene sentido con el backend keras
+            base_config.setdefault('inference', {})['backend'] = 'keras'
+
+        results = {}
+        for scenario in scenarios:
+            print(f"🏁 Escenario {scenario}: {args.requests} peticiones, concurrencia {args.concurrency}")
+            results[scenario] = run_scenario(scenario, base_config, corpus, args, tmp_dir)
+            latency = results[scenario]['latency_ms']
+            print(f"   {results[scenario]['throughput_rps']:.1f} req/s, "
+                  f"{results[scenario]['throughput_images_per_s']:.1f} img/s, "
+                  f"p50={latency['p50']:.1f} ms p95={latency['p95']:.1f} ms p99={latency['p99']:.1f} ms, "
+                  f"errores={results[scenario]['error_rate']:.1%}, "
+                  f"RSS servidor={results[scenario]['server_peak_rss_mb'] or 0:.0f} MB")
+
+    commit = git_commit()
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"benchmark_{commit}_{timestamp}.json")
+    save_json({
+        'meta': {
+            'commit': commit,
+            'timestamp': timestamp,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'model': args.model or 'stand-in',
+            'corpus': args.corpus or f"synthetic:{len(corpus)}",
+            'args': vars(args)
+        },
+        'scenarios': results
+    }, output)
+    print(f"📊 Resultados guardados en {output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Comprueba que entrenamiento, API y cámara preprocesan igual la misma imagen.
+
+Cada imagen pasa por los tres caminos reales:
+
+- entrenamiento: ``image_dataset_from_directory`` + ``preprocess_pipeline``
+- API: ``app.inference.imaging.decode_image`` (PIL, modo draft en JPEG)
+- cámara: ``cv2.imdecode`` (BGR) + ``preprocess_bgr_frame``
+
+y se comparan los tensores resultantes (y las predicciones, si se pasa ``--model``).
+
+Uso:
+    python scripts/check_preprocessing_parity.py --images "data/Training/v1/validation_data/*/*.jpg"
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "model_training"))
+
+PATHS = ("training", "api", "camera")
+
+def synthetic_image(path, size=(640, 480)):
+    """JPEG de prueba con degradados y bordes, para cuando no se pasan imágenes."""
+    from PIL import Image
+
+    x = np.linspace(0, 255, size[0], dtype=np.float32)
+    y = np.linspace(0, 255, size[1], dtype=np.float32)[:, None]
+    pixels = np.stack([np.broadcast_to(x, (size[1], size[0])),
+                       np.broadcast_to(y, (size[1], size[0])),
+                       (x[None, :] + y) % 256], axis=-1)
+    pixels[size[1] // 3: size[1] // 2, size[0] // 4: size[0] // 2] = (250, 20, 20)
+    Image.fromarray(pixels.astype(np.uint8)).save(path, format="JPEG", quality=90)
+    return path
+
+def training_inputs(paths, img_size):
+    """Mismo camino que model_trainer.py sin caché de datos."""
+    import tensorflow as tf
+    from preprocess import preprocess_pipeline
+
+    work_dir = tempfile.mkdtemp(prefix="parity_")
+    try:
+        class_dir = os.path.join(work_dir, "images")
+        os.makedirs(class_dir)
+        for i, path in enumerate(paths):
+            # Prefijo numérico para conservar el orden de entrada
+            shutil.copy(path, os.path.join(class_dir, f"{i:06d}{os.path.splitext(path)[1].lower()}"))
+        ds = tf.keras.preprocessing.image_dataset_from_directory(
+            work_dir, image_size=img_size, batch_size=len(paths), shuffle=False, verbose=False)
+        ds = ds.map(preprocess_pipeline(size=img_size))
+        return np.concatenate([images.numpy() for images, _ in ds])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def api_inputs(paths, img_size):
+    from app.inference.imaging import decode_image
+
+    batch = np.empty((len(paths), img_size[1], img_size[0], 3), dtype=np.float32)
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            decode_image(f.read(), img_size, out=batch[i])
+    return batch
+
+def camera_inputs(paths, img_size):
+    import cv2
+    from preprocessing import preprocess_bgr_frame
+
+    batch = np.empty((len(paths), img_size[1], img_size[0], 3), dtype=np.float32)
+    for i, path in enumerate(paths):
+        frame = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        preprocess_bgr_frame(frame, img_size, out=batch[i])
+    return batch
+
+def compare(inputs, tolerance):
+    ok = True
+    for a_index, a in enumerate(PATHS):
+        for b in PATHS[a_index + 1:]:
+            diff = np.abs(inputs[a] - inputs[b])
+            mean_diff = float(diff.mean())
+            status = "✅" if mean_diff <= tolerance else "❌"
+            ok = ok and mean_diff <= tolerance
+            print(f"{status} {a} vs {b}: diferencia media {mean_diff:.4f}, máxima {float(diff.max()):.4f}")
+    return ok
+
+def compare_predictions(inputs, model_path, max_probability_diff):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    probabilities = {name: model.predict(batch, verbose=0) for name, batch in inputs.items()}
+    ok = True
+    for name in PATHS[1:]:
+        same_top1 = probabilities[name].argmax(axis=1) == probabilities["training"].argmax(axis=1)
+        max_diff = float(np.abs(probabilities[name] - probabilities["training"]).max())
+        # El top-1 solo puede cambiar entre clases casi empatadas, así que manda la diferencia de probabilidad
+        path_ok = max_diff <= max_probability_diff
+        ok = ok and path_ok
+        print(f"{'✅' if path_ok else '❌'} predicciones training vs {name}: "
+              f"top-1 igual en {int(same_top1.sum())}/{len(same_top1)}, diferencia máxima {max_diff:.4f}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Paridad del preprocesado entre entrenamiento, API y cámara")
+    parser.add_argument("--images", help="Patrón glob de imágenes (por defecto, una imagen sintética)")
+    parser.add_argument("--size", type=int, nargs=2, default=(224, 224), metavar=("ANCHO", "ALTO"))
+    parser.add_argument("--model", help="Modelo .keras para comparar también las predicciones")
+    parser.add_argument("--tolerance", type=float, default=0.03,
+                        help="Diferencia media máxima permitida en la escala [-1, 1]")
+    parser.add_argument("--max-probability-diff", type=float, default=0.05)
+    args = parser.parse_args()
+
+    img_size = tuple(args.size)
+    tmp_dir = None
+    if args.images:
+        from dataset_cache import IMAGE_EXTENSIONS
+        # Solo formatos que el entrenamiento también lee
+        paths = sorted(p for p in glob.glob(args.images) if p.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="parity_img_")
+        paths = [synthetic_image(os.path.join(tmp_dir, "synthetic.jpg"))]
+    if not paths:
+        sys.exit(f"⚠️ No hay imágenes que coincidan con {args.images}")
+
+    try:
+        inputs = {
+            "training": training_inputs(paths, img_size),
+            "api": api_inputs(paths, img_size),
+            "camera": camera_inputs(paths, img_size)
+        }
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"🔍 {len(paths)} imagen(es) a {img_size[0]}x{img_size[1]}")
+    ok = compare(inputs, args.tolerance)
+    if args.model:
+        ok = compare_predictions(inputs, args.model, args.max_probability_diff) and ok
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 import os
 import json
+import hashlib
+import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.reports_store import ReportStore
+
+REPORT_SCHEMA_VERSION = 2
+STATS_CACHE_NAME = 'report_cache.json'
+STATS_CACHE_VERSION = 1
+SPLITS = ('train_data', 'validation_data')
+# Cabecera suficiente para formato y dimensiones en JPEG/PNG/WEBP/GIF/BMP
+HEADER_BYTES = 64 * 1024
+
+# Límites de los histogramas: lado menor en píxeles y tamaño de fichero en KB
+RESOLUTION_BUCKETS = ((224, '<224'), (512, '224-511'), (1024, '512-1023'), (None, '>=1024'))
+FILE_SIZE_BUCKETS = ((50, '<50KB'), (200, '50-200KB'), (1024, '200KB-1MB'), (None, '>=1MB'))
+
 def load_json(file_path):
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
@@ -11,18 +28,180 @@ def save_json(data, file_path):
     with open(file_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
+def save_json_atomic(data, file_path):
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, file_path)
+
 def create_folder(folder):
     if not os.path.exists(folder):
         os.makedirs(folder)
 
-def count_images(folder):
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def scan_class(dataset_path, split, cls):
+    """(ruta relativa, tamaño, mtime_ns) de las imágenes de una clase; una sola pasada de scandir."""
+    folder = os.path.join(dataset_path, split, cls)
     if not os.path.isdir(folder):
-        return 0
-    return sum(
-        1
-        for f in os.listdir(folder)
-        if f.lower().endswith(('.jpg', '.jpeg', '.png', '.webp'))
-    )
+        return []
+    files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                st = entry.stat()
+                files.append((os.path.join(split, cls, entry.name), st.st_size, st.st_mtime_ns))
+    return files
+
+def manifest_is_current(dataset_path, manifest, classes):
+    """True si ninguna carpeta de split o clase cambió (altas, bajas, renombrados) después del manifest."""
+    try:
+        updated_at = datetime.strptime(manifest['updated_at'], '%Y-%m-%dT%H:%M:%S').timestamp()
+    except (KeyError, ValueError):
+        return False
+    folders = [os.path.join(dataset_path, split) for split in SPLITS]
+    folders += [os.path.join(dataset_path, split, cls) for split in SPLITS for cls in classes]
+    for folder in folders:
+        try:
+            if os.stat(folder).st_mtime > updated_at:
+                return False
+        except FileNotFoundError:
+            continue
+    return True
+
+def load_manifest_counts(dataset_path, classes):
+    """Conteos por (split, clase) desde el manifest del dataset, sin listar directorios.
+
+    Devuelve None (se listan los directorios) si no hay manifest o está desactualizado.
+    """
+    path = os.path.join(dataset_path, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    manifest = load_json(path)
+    if not manifest_is_current(dataset_path, manifest, classes):
+        print(f"⚠️ El manifest ({manifest.get('updated_at', 'sin fecha')}) es anterior a los últimos cambios "
+              f"del dataset; se listan los directorios")
+        return None
+    counts = {}
+    for rel_path, entry in manifest.get('entries', {}).items():
+        if rel_path.lower().endswith(IMAGE_EXTENSIONS):
+            key = (entry['split'], entry['class'])
+            counts[key] = counts.get(key, 0) + 1
+    print(f"🗂 Conteos tomados del manifest ({manifest.get('updated_at', 'sin fecha')})")
+    return counts
+
+def load_manifest_hashes(dataset_path):
+    """MD5 ya calculados por dataset_manifest.py, por ruta relativa con su (tamaño, mtime)."""
+    path = os.path.join(dataset_path, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    return {rel_path: (entry['size'], entry['mtime_ns'], entry['hash'])
+            for rel_path, entry in load_json(path).get('entries', {}).items()}
+
+def read_file_stats(dataset_path, rel_path, known_md5=None):
+    """Formato y dimensiones leyendo solo la cabecera, más el MD5 del contenido (para duplicados)."""
+    from io import BytesIO
+    from PIL import Image
+
+    path = os.path.join(dataset_path, rel_path)
+    stats = {'format': None, 'width': None, 'height': None, 'md5': known_md5, 'error': None}
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_BYTES)
+            if known_md5 is None:
+                digest = hashlib.md5(header)
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+                stats['md5'] = digest.hexdigest()
+        try:
+            # Image.open no decodifica píxeles: solo analiza la cabecera
+            img = Image.open(BytesIO(header))
+        except Exception:
+            # Segmentos APP (EXIF/ICC) más largos que HEADER_BYTES: se abre el fichero completo
+            img = Image.open(path)
+        with img:
+            stats['format'] = img.format
+            stats['width'], stats['height'] = img.size
+    except Exception as e:
+        stats['error'] = f"{type(e).__name__}: {e}"
+    return stats
+
+def bucket(value, buckets):
+    for limit, label in buckets:
+        if limit is None or value < limit:
+            return label
+
+def summarize_files(entries):
+    """Histogramas de formato, resolución y tamaño para una lista de entradas de la caché."""
+    formats, resolutions, sizes = {}, {}, {}
+    widths, heights = [], []
+    corrupt = 0
+    for entry in entries:
+        size_label = bucket(entry['size'] / 1024, FILE_SIZE_BUCKETS)
+        sizes[size_label] = sizes.get(size_label, 0) + 1
+        if entry['error']:
+            corrupt += 1
+            continue
+        formats[entry['format']] = formats.get(entry['format'], 0) + 1
+        resolution_label = bucket(min(entry['width'], entry['height']), RESOLUTION_BUCKETS)
+        resolutions[resolution_label] = resolutions.get(resolution_label, 0) + 1
+        widths.append(entry['width'])
+        heights.append(entry['height'])
+    return {
+        'formats': formats,
+        'resolutions': {label: resolutions[label] for _, label in RESOLUTION_BUCKETS if label in resolutions},
+        'file_sizes': {label: sizes[label] for _, label in FILE_SIZE_BUCKETS if label in sizes},
+        'mean_width': round(sum(widths) / len(widths)) if widths else None,
+        'mean_height': round(sum(heights) / len(heights)) if heights else None,
+        'bytes': sum(entry['size'] for entry in entries),
+        'corrupt': corrupt
+    }
+
+def collect_stats(dataset_path, scanned, workers):
+    """Estadísticas por fichero, reutilizando la caché (ruta, tamaño, mtime) del dataset."""
+    cache_path = os.path.join(dataset_path, STATS_CACHE_NAME)
+    cache = load_json(cache_path) if os.path.exists(cache_path) else {}
+    cached = cache.get('files', {}) if cache.get('version') == STATS_CACHE_VERSION else {}
+    manifest_hashes = load_manifest_hashes(dataset_path)
+
+    files, pending = {}, []
+    for rel_path, size, mtime_ns in scanned:
+        entry = cached.get(rel_path)
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            files[rel_path] = entry
+        else:
+            known = manifest_hashes.get(rel_path)
+            known_md5 = known[2] if known and known[:2] == (size, mtime_ns) else None
+            pending.append((rel_path, size, mtime_ns, known_md5))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda item: read_file_stats(dataset_path, item[0], item[3]), pending)
+        for (rel_path, size, mtime_ns, _), stats in zip(pending, results):
+            files[rel_path] = dict(stats, size=size, mtime_ns=mtime_ns)
+
+    save_json_atomic({'version': STATS_CACHE_VERSION, 'updated_at': datetime.now().isoformat(timespec='seconds'),
+                      'files': files}, cache_path)
+    print(f"🔎 Estadísticas: {len(files) - len(pending)} ficheros desde caché, {len(pending)} leídos")
+    return files
+
+def find_duplicates(files):
+    """Grupos de ficheros con el mismo contenido: entre clases distintas y entre splits de una clase."""
+    by_md5 = {}
+    for rel_path, entry in files.items():
+        if entry['md5']:
+            by_md5.setdefault(entry['md5'], []).append(rel_path)
+    cross_class, split_leaks, within_class = [], 0, 0
+    for md5, paths in by_md5.items():
+        if len(paths) < 2:
+            continue
+        classes = {p.split(os.sep)[1] for p in paths}
+        if len(classes) > 1:
+            cross_class.append({'md5': md5, 'classes': sorted(classes), 'files': sorted(paths)})
+        elif len({p.split(os.sep)[0] for p in paths}) > 1:
+            split_leaks += 1
+        else:
+            within_class += 1
+    return {'cross_class': cross_class, 'split_leaks': split_leaks, 'within_class_groups': within_class}
 
 def classify_train(count, thresholds):
     if count < thresholds['baseline_model']:
@@ -40,28 +219,6 @@ def classify_validation(count, thresholds):
     else:
         return 'Strong'
 
-def extract_version_from_filename(filename):
-    # ejemplo: dataset_report_v1_20250512.json → v1
-    name = os.path.basename(filename)
-    parts = name.replace(".json", "").split("_")
-    return parts[2] if len(parts) >= 3 else "unknown"
-
-def update_report_index(index_path, version, report_name):
-    if os.path.exists(index_path):
-        index = load_json(index_path)
-    else:
-        index = {}
-
-    if version not in index:
-        index[version] = []
-
-    if report_name not in index[version]:
-        index[version].append(report_name)
-
-    # ordenar de más reciente a más antiguo
-    index[version].sort(reverse=True)
-    save_json(index, index_path)
-
 def main():
     parser = argparse.ArgumentParser(description='Generate dataset report')
     parser.add_argument('--dataset_path', required=True,
@@ -70,48 +227,90 @@ def main():
                         help='Archivo JSON con objetivos image_targets_per_class')
     parser.add_argument('--output', required=True,
                         help='Archivo JSON de salida del reporte')
+    parser.add_argument('--no-manifest', action='store_true',
+                        help='Ignorar manifest.json y contar listando los directorios')
+    parser.add_argument('--stats', action='store_true',
+                        help='Leer cabeceras: resolución, formato, tamaño, corruptos y duplicados entre clases')
+    parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                        help='Hilos para listar clases y leer ficheros')
     args = parser.parse_args()
 
-    train_base = os.path.join(args.dataset_path, 'train_data')
-    val_base   = os.path.join(args.dataset_path, 'validation_data')
+    started = datetime.now()
     targets    = load_json(args.targets)
+    classes    = [entry['class_name'] for entry in targets]
+    manifest_counts = None if args.no_manifest or args.stats else load_manifest_counts(args.dataset_path, classes)
+
+    scanned = {}
+    if manifest_counts is None:
+        # Todas las carpetas (split, clase) a la vez
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            keys = [(split, cls) for split in SPLITS for cls in classes]
+            for key, files in zip(keys, pool.map(lambda k: scan_class(args.dataset_path, *k), keys)):
+                scanned[key] = files
+
+    files_stats = None
+    duplicates = None
+    if args.stats:
+        all_files = [f for files in scanned.values() for f in files]
+        files_stats = collect_stats(args.dataset_path, all_files, args.workers)
+        duplicates = find_duplicates(files_stats)
 
     report = []
     for entry in targets:
         cls = entry['class_name']
         th  = entry['targets']
-        train_folder = os.path.join(train_base, cls)
-        val_folder   = os.path.join(val_base, cls)
-
-        train_count = count_images(train_folder)
-        val_count   = count_images(val_folder)
 
-        train_status = classify_train(train_count, th)
-        val_status   = classify_validation(val_count, th)
+        if manifest_counts is not None:
+            train_count = manifest_counts.get(('train_data', cls), 0)
+            val_count   = manifest_counts.get(('validation_data', cls), 0)
+        else:
+            train_count = len(scanned[('train_data', cls)])
+            val_count   = len(scanned[('validation_data', cls)])
 
-        report.append({
+        class_entry = {
             'class': cls,
             'train_count': train_count,
-            'train_status': train_status,
+            'train_status': classify_train(train_count, th),
             'validation_count': val_count,
-            'validation_status': val_status,
-        })
+            'validation_status': classify_validation(val_count, th),
+        }
+        if files_stats is not None:
+            class_entry['stats'] = {
+                split.replace('_data', ''): summarize_files([files_stats[f[0]] for f in scanned[(split, cls)]])
+                for split in SPLITS
+            }
+            class_entry['cross_class_duplicates'] = sum(
+                1 for group in duplicates['cross_class'] for path in group['files'] if path.split(os.sep)[1] == cls)
+        report.append(class_entry)
+
+    output = {
+        'schema_version': REPORT_SCHEMA_VERSION,
+        'generated_at': started.isoformat(timespec='seconds'),
+        'dataset': args.dataset_path,
+        'classes': report,
+    }
+    if files_stats is not None:
+        output['summary'] = summarize_files(list(files_stats.values()))
+        output['corrupt_files'] = sorted(path for path, entry in files_stats.items() if entry['error'])
+        output['duplicates'] = duplicates
 
     # Guardar reporte
     create_folder(os.path.dirname(args.output))
-    save_json(report, args.output)
-    print(f"📊 Dataset report saved to {args.output}")
+    save_json(output, args.output)
+    print(f"📊 Dataset report saved to {args.output} ({(datetime.now() - started).total_seconds():.2f}s)")
 
-    # Actualizar índice
-    version = extract_version_from_filename(args.output)
-    report_name = os.path.basename(args.output)
-    index_path = os.path.join(os.path.dirname(args.output), '..', 'index.json')
-    update_report_index(index_path, version, report_name)
-    print(f"🗂 Index updated: {index_path}")
+    # Indexar solo este informe (la API también sincroniza sola los que falten)
+    reports_dir = os.path.dirname(os.path.dirname(os.path.abspath(args.output)))
+    store = ReportStore(reports_dir)
+    store.ingest_file(args.output)
+    print(f"🗂 Index updated: {store.db_path}")
 
     for r in report:
         print(f"{r['class']}: train={r['train_count']} ({r['train_status']}), "
               f"validation={r['validation_count']} ({r['validation_status']})")
+    if files_stats is not None:
+        print(f"⚠️ Corruptos: {len(output['corrupt_files'])} · duplicados entre clases: "
+              f"{len(duplicates['cross_class'])} grupos · fugas train/validación: {duplicates['split_leaks']}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
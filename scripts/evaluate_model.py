@@ -0,0 +1,267 @@
+"""Evaluación offline del modelo sobre un split de ``data/Training/<versión>``.
+
+Pasa las imágenes por el mismo backend y decodificado que la API (``create_backend`` +
+``decode_image``) en lotes grandes. Mientras el modelo procesa un lote, un pool de hilos
+decodifica el siguiente. El informe JSON incluye:
+
+- matriz de confusión y precisión/recall/F1 por clase
+- calibración de la confianza (bins, ECE) y comportamiento con el umbral de ``script.js`` (0.82)
+- throughput (imágenes/s) y tiempos de decodificado por clase y de forward por imagen
+- comprobación del orden de clases de la API (metadatos del modelo, o ``class_labels.json`` invertido
+  en modelos sin metadatos) frente al del entrenamiento
+
+Uso:
+    python scripts/evaluate_model.py --config config/v1/api_config.json --dataset data/Training/v1 [--split validation]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "model_training"))
+
+# Umbral con el que script.js muestra la etiqueta al usuario
+DEFAULT_THRESHOLD = 0.82
+
+def load_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def decode_into(path, img_size, out):
+    """Decodifica en ``out``; devuelve los segundos empleados, o None si la imagen no se puede leer."""
+    from app.inference.imaging import decode_image
+
+    started = time.perf_counter()
+    try:
+        decode_image(path, img_size, out=out)
+    except Exception:
+        return None
+    return time.perf_counter() - started
+
+def run_batches(backend, paths, img_size, batch_size, workers):
+    """Genera (índices, probabilidades, segundos de decodificado, fallidas) por lote, con doble buffer."""
+    buffers = [np.empty((batch_size, img_size[1], img_size[0], 3), dtype=np.float32) for _ in range(2)]
+    starts = range(0, len(paths), batch_size)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(batch_number):
+            start = starts[batch_number]
+            buffer = buffers[batch_number % 2]
+            return [pool.submit(decode_into, path, img_size, buffer[i])
+                    for i, path in enumerate(paths[start:start + batch_size])]
+
+        pending = submit(0) if starts else None
+        for batch_number, start in enumerate(starts):
+            decode_seconds = [f.result() for f in pending]
+            # El siguiente lote se decodifica en el otro buffer mientras este pasa por el modelo
+            pending = submit(batch_number + 1) if batch_number + 1 < len(starts) else None
+            valid = [i for i, seconds in enumerate(decode_seconds) if seconds is not None]
+            batch = buffers[batch_number % 2]
+            if len(valid) == len(decode_seconds):
+                probabilities = backend.predict(batch[:len(valid)])
+            else:
+                probabilities = backend.predict(batch[valid]) if valid else np.empty((0, 0))
+            failed = [paths[start + i] for i, seconds in enumerate(decode_seconds) if seconds is None]
+            yield ([start + i for i in valid], np.asarray(probabilities, dtype=np.float64),
+                   [decode_seconds[i] for i in valid], failed)
+
+def per_class_metrics(confusion, class_names):
+    true_positives = np.diag(confusion)[:len(class_names)].astype(np.float64)
+    predicted = confusion.sum(axis=0)[:len(class_names)]
+    support = confusion.sum(axis=1)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    denominator = precision + recall
+    f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(true_positives), where=denominator > 0)
+    return {name: {"precision": round(float(precision[i]), 4), "recall": round(float(recall[i]), 4),
+                   "f1": round(float(f1[i]), 4), "support": int(support[i])}
+            for i, name in enumerate(class_names)}
+
+def calibration(confidences, correct, threshold, bins):
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    bin_index = np.clip(np.digitize(confidences, edges[1:-1]), 0, bins - 1)
+    table, ece = [], 0.0
+    for b in range(bins):
+        mask = bin_index == b
+        count = int(mask.sum())
+        if not count:
+            continue
+        mean_confidence = float(confidences[mask].mean())
+        accuracy = float(correct[mask].mean())
+        ece += count / len(confidences) * abs(accuracy - mean_confidence)
+        table.append({"range": [round(float(edges[b]), 2), round(float(edges[b + 1]), 2)], "count": count,
+                      "mean_confidence": round(mean_confidence, 4), "accuracy": round(accuracy, 4)})
+
+    shown = confidences >= threshold
+    return {
+        "bins": table,
+        "ece": round(ece, 4),
+        "threshold": threshold,
+        # Qué ve el usuario: etiqueta solo si la confianza supera el umbral
+        "coverage": round(float(shown.mean()), 4),
+        "accuracy_above_threshold": round(float(correct[shown].mean()), 4) if shown.any() else None,
+        "accuracy_below_threshold": round(float(correct[~shown].mean()), 4) if (~shown).any() else None,
+        "wrong_above_threshold": int((shown & ~correct).sum())
+    }
+
+def class_order_check(dataset_classes, api_classes, num_outputs):
+    mismatched = [i for i, (a, b) in enumerate(zip(dataset_classes, api_classes)) if a != b]
+    return {
+        "dataset": dataset_classes,
+        "api": api_classes,
+        "model_outputs": num_outputs,
+        "matches": not mismatched and len(dataset_classes) == len(api_classes) == num_outputs,
+        "mismatched_indices": mismatched
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluación offline del modelo sobre un split del dataset")
+    parser.add_argument("--config", default="config/v1/api_config.json", help="Config de la API (modelo, backend, clases)")
+    parser.add_argument("--dataset", default="data/Training/v1", help="Carpeta de la versión del dataset")
+    parser.add_argument("--split", default="validation", help="Split a evaluar (carpeta <split>_data)")
+    parser.add_argument("--model", help="Sustituye model_path del config")
+    parser.add_argument("--backend", choices=["keras", "tflite"], help="Sustituye inference.backend del config")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hilos de decodificado")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--bins", type=int, default=10, help="Bins de calibración")
+    parser.add_argument("--limit", type=int, help="Evalúa solo las primeras N imágenes de cada clase")
+    parser.add_argument("--output", help="Ruta del informe (por defecto reports/<versión>/)")
+    args = parser.parse_args()
+
+    from app.inference import create_backend, served_model_path
+    from app.inference.labels import load_class_labels
+    from dataset_cache import list_image_files
+    from model_bundle import load_bundle
+
+    config = load_json(args.config)
+    if args.model:
+        config["model_path"] = args.model
+    if args.backend:
+        config.setdefault("inference", {})["backend"] = args.backend
+    img_size = tuple(config["image_size"])
+    dataset_path = args.dataset.rstrip("/")
+    version = os.path.basename(dataset_path)
+
+    # Mismo listado y orden de clases que image_dataset_from_directory en el entrenamiento
+    paths, labels, class_names = list_image_files(os.path.join(dataset_path, f"{args.split}_data"))
+    if args.limit:
+        per_label = {}
+        kept = []
+        for i, label in enumerate(labels):
+            per_label[label] = per_label.get(label, 0) + 1
+            if per_label[label] <= args.limit:
+                kept.append(i)
+        paths, labels = [paths[i] for i in kept], [labels[i] for i in kept]
+    if not paths:
+        sys.exit(f"⚠️ No hay imágenes en {dataset_path}/{args.split}_data")
+    labels = np.asarray(labels)
+    print(f"🧪 {len(paths)} imágenes de {len(class_names)} clases ({args.split}), lotes de {args.batch_size}")
+
+    # Mismo orden de clases que la API: metadatos del modelo, o el orden heredado si no los tiene
+    _, legacy_class_names = load_class_labels(config["classes_path"])
+    bundle = load_bundle(served_model_path(config), img_size, fallback_class_names=legacy_class_names)
+    _, api_class_names = load_class_labels(config["classes_path"], bundle.class_names)
+    backend = create_backend(config, bundle)
+    backend.warmup(batch_size=args.batch_size)
+
+    num_classes = len(class_names)
+    confusion = None
+    confidences, correct, api_correct, evaluated = [], [], [], []
+    decode_totals = np.zeros(num_classes)
+    decode_counts = np.zeros(num_classes, dtype=np.int64)
+    failed = []
+    num_outputs = None
+
+    started = time.perf_counter()
+    for indices, probabilities, decode_seconds, batch_failed in run_batches(
+            backend, paths, img_size, args.batch_size, args.workers):
+        failed.extend(batch_failed)
+        if not indices:
+            continue
+        num_outputs = probabilities.shape[1]
+        if confusion is None:
+            # Columnas extra si el modelo tiene más salidas que clases tiene el split
+            confusion = np.zeros((num_classes, max(num_classes, num_outputs)), dtype=np.int64)
+        true = labels[indices]
+        predicted = probabilities.argmax(axis=1)
+        np.add.at(confusion, (true, predicted), 1)
+        np.add.at(decode_totals, true, decode_seconds)
+        np.add.at(decode_counts, true, 1)
+        confidences.append(probabilities.max(axis=1))
+        correct.append(predicted == true)
+        # Lo que mostraría la API con su orden de clases
+        api_correct.append(np.array([p < len(api_class_names) and api_class_names[p] == class_names[t]
+                                     for p, t in zip(predicted, true)]))
+        evaluated.extend(indices)
+    elapsed = time.perf_counter() - started
+
+    if not evaluated:
+        sys.exit("⚠️ No se pudo decodificar ninguna imagen")
+    confidences = np.concatenate(confidences)
+    correct = np.concatenate(correct)
+    api_correct = np.concatenate(api_correct)
+    forward = backend.stats()["forward_latency"]
+    per_class = per_class_metrics(confusion, class_names)
+    for i, name in enumerate(class_names):
+        class_mask = labels[evaluated] == i
+        per_class[name]["mean_confidence"] = round(float(confidences[class_mask].mean()), 4) if class_mask.any() else None
+        per_class[name]["decode_ms"] = round(decode_totals[i] / decode_counts[i] * 1000, 3) if decode_counts[i] else None
+
+    order = class_order_check(class_names, api_class_names, num_outputs)
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "dataset": dataset_path,
+        "split": args.split,
+        "model": config["model_path"] if config.get("inference", {}).get("backend", "keras") == "keras"
+                 else config["inference"]["tflite_model_path"],
+        "backend": backend.name,
+        "images": len(evaluated),
+        "failed_images": failed,
+        "accuracy": round(float(correct.mean()), 4),
+        "api_label_accuracy": round(float(api_correct.mean()), 4),
+        "class_order": order,
+        "classes": class_names,
+        "confusion_matrix": confusion.tolist(),
+        "per_class": per_class,
+        "calibration": calibration(confidences, correct, args.threshold, args.bins),
+        "performance": {
+            "batch_size": args.batch_size,
+            "decode_workers": args.workers,
+            "elapsed_seconds": round(elapsed, 3),
+            "images_per_second": round(len(evaluated) / elapsed, 2),
+            "forward_ms_per_image": round(forward["mean_ms"] * forward["count"] / len(evaluated), 3) if forward["mean_ms"] else None,
+            "forward_batch_p50_ms": forward["p50_ms"],
+            "forward_batch_p99_ms": forward["p99_ms"]
+        }
+    }
+
+    output = args.output or os.path.join("reports", version, f"evaluation_report_{version}_{datetime.now():%Y%m%d%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    calib = report["calibration"]
+    print(f"✅ Accuracy {report['accuracy']:.2%} · {report['performance']['images_per_second']} img/s · ECE {calib['ece']}")
+    print(f"   Umbral {args.threshold}: cobertura {calib['coverage']:.2%}, accuracy por encima "
+          f"{calib['accuracy_above_threshold']}, errores mostrados {calib['wrong_above_threshold']}")
+    for name, metrics in per_class.items():
+        print(f"   {name}: P {metrics['precision']:.2f} R {metrics['recall']:.2f} (n={metrics['support']})")
+    if not order["matches"]:
+        print(f"❌ El orden de clases de la API no coincide con el del entrenamiento "
+              f"(índices {order['mismatched_indices']}, salidas del modelo {num_outputs}); "
+              f"accuracy con las etiquetas de la API: {report['api_label_accuracy']:.2%}")
+    if failed:
+        print(f"⚠️ {len(failed)} imágenes no se pudieron decodificar")
+    print(f"📄 Informe: {output}")
+    sys.exit(0 if order["matches"] else 1)
+
+if __name__ == "__main__":
+    main()
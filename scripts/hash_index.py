@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Persistent content-hash index of a dataset version, used by the scraper to deduplicate.
+
+One SQLite file per version (``data/Training/<version>/hash_index.sqlite``) holds the
+MD5 and the 64-bit dHash of every image under ``<split>_data/<class>/``. Files are
+only re-hashed when their size or mtime changed, so syncing is O(new files).
+
+Near-duplicate lookup splits the dHash into four 16-bit bands, each indexed. Two hashes
+within Hamming distance d have at least one band within d // 4 bits of each other
+(pigeonhole), so the lookup probes every band value within that radius and only compares
+the matching rows. Thresholds of 12 bits or more (far beyond near-duplicates) fall back
+to a full scan.
+
+The scraper calls the index from a single executor thread so SQLite never blocks its loop.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+from io import BytesIO
+from itertools import combinations
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from image_hashing import dhash
+
+INDEX_FILENAME = "hash_index.sqlite"
+BANDS = 4
+BAND_BITS = 64 // BANDS
+# Largest per-band radius probed through the band indexes (137 values per band at radius 2)
+MAX_PROBE_RADIUS = 2
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png", "webp", "bmp", "gif")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    split TEXT NOT NULL,
+    class TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    md5 TEXT NOT NULL,
+    dhash INTEGER,
+    b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER
+);
+CREATE INDEX IF NOT EXISTS images_md5 ON images(md5);
+CREATE INDEX IF NOT EXISTS images_b0 ON images(b0);
+CREATE INDEX IF NOT EXISTS images_b1 ON images(b1);
+CREATE INDEX IF NOT EXISTS images_b2 ON images(b2);
+CREATE INDEX IF NOT EXISTS images_b3 ON images(b3);
+"""
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+def bands(hash_value):
+    mask = (1 << BAND_BITS) - 1
+    return [(hash_value >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+def band_variants(value, radius):
+    """Every band value within ``radius`` flipped bits of ``value``."""
+    variants = [value]
+    for flips in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), flips):
+            variant = value
+            for bit in bits:
+                variant ^= 1 << bit
+            variants.append(variant)
+    return variants
+
+def image_dhash(source):
+    """dHash of image bytes or a path; None when the file cannot be decoded."""
+    try:
+        img = Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        if img.format == "JPEG":
+            # Only a 9x8 thumbnail is needed, so let libjpeg decode at 1/8 scale
+            img.draft("L", (64, 64))
+        return dhash(img)
+    except Exception:
+        return None
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        buf = f.read()
+    return hashlib.md5(buf).hexdigest(), image_dhash(buf)
+
+class HashIndex:
+    def __init__(self, version_dir, db_path=None):
+        self.version_dir = version_dir
+        self.db_path = db_path or os.path.join(version_dir, INDEX_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        # check_same_thread=False: the scraper uses the index from one executor thread, not the loop's
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        # WAL lets readers in other processes keep going while one process writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _walk(self, allowed_exts):
+        for split_entry in os.scandir(self.version_dir):
+            if not (split_entry.is_dir() and split_entry.name.endswith("_data")):
+                continue
+            split = split_entry.name[:-len("_data")]
+            for class_entry in os.scandir(split_entry.path):
+                if not class_entry.is_dir():
+                    continue
+                for entry in os.scandir(class_entry.path):
+                    if entry.is_file() and entry.name.rsplit(".", 1)[-1].lower() in allowed_exts:
+                        yield split, class_entry.name, entry
+
+    def sync(self, allowed_exts=IMAGE_EXTENSIONS):
+        """Brings the index in line with the files on disk; only new or changed files are read.
+
+        Returns (added, removed).
+        """
+        known = {path: (size, mtime_ns) for path, size, mtime_ns
+                 in self.conn.execute("SELECT path, size, mtime_ns FROM images")}
+        seen = set()
+        added = 0
+        with self.conn:
+            for split, class_name, entry in self._walk(allowed_exts):
+                rel_path = os.path.relpath(entry.path, self.version_dir)
+                seen.add(rel_path)
+                stat = entry.stat()
+                if known.get(rel_path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                try:
+                    md5, hash_value = hash_file(entry.path)
+                except OSError:
+                    continue
+                self._upsert(rel_path, split, class_name, stat.st_size, stat.st_mtime_ns, md5, hash_value)
+                added += 1
+            removed = [(path,) for path in known if path not in seen]
+            self.conn.executemany("DELETE FROM images WHERE path = ?", removed)
+        return added, len(removed)
+
+    def _upsert(self, rel_path, split, class_name, size, mtime_ns, md5, hash_value):
+        band_values = bands(hash_value) if hash_value is not None else [None] * BANDS
+        self.conn.execute(
+            "INSERT OR REPLACE INTO images (path, split, class, size, mtime_ns, md5, dhash, b0, b1, b2, b3)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [rel_path, split, class_name, size, mtime_ns, md5,
+             _to_signed(hash_value) if hash_value is not None else None] + band_values)
+
+    def add(self, path, split, class_name, md5, hash_value):
+        """Records a file that was just written (committed immediately)."""
+        stat = os.stat(path)
+        with self.conn:
+            self._upsert(os.path.relpath(path, self.version_dir), split, class_name,
+                         stat.st_size, stat.st_mtime_ns, md5, hash_value)
+
+    def find_exact(self, md5):
+        row = self.conn.execute("SELECT path FROM images WHERE md5 = ? LIMIT 1", (md5,)).fetchone()
+        return row[0] if row else None
+
+    def find_near(self, hash_value, max_distance):
+        """Closest indexed image within ``max_distance`` bits as (path, distance), or None."""
+        if hash_value is None or max_distance < 0:
+            return None
+        radius = max_distance // BANDS
+        if radius <= MAX_PROBE_RADIUS:
+            probes = [band_variants(value, radius) for value in bands(hash_value)]
+            clauses = " OR ".join(f"b{i} IN ({', '.join('?' * len(values))})" for i, values in enumerate(probes))
+            rows = self.conn.execute(f"SELECT path, dhash FROM images WHERE {clauses}",
+                                     [value for values in probes for value in values])
+        else:
+            rows = self.conn.execute("SELECT path, dhash FROM images WHERE dhash IS NOT NULL")
+        best = None
+        for path, stored in rows:
+            distance = (_to_unsigned(stored) ^ hash_value).bit_count()
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (path, distance)
+        return best
+
+    def count(self, split=None, class_name=None):
+        query, params = "SELECT COUNT(*) FROM images WHERE 1 = 1", []
+        if split:
+            query += " AND split = ?"
+            params.append(split)
+        if class_name:
+            query += " AND class = ?"
+            params.append(class_name)
+        return self.conn.execute(query, params).fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync or query a dataset version's hash index")
+    parser.add_argument("--dataset", required=True, help="Dataset version directory, e.g. data/Training/v1")
+    parser.add_argument("--find", help="Image to look up in the index")
+    parser.add_argument("--max-distance", type=int, default=3)
+    args = parser.parse_args()
+
+    index = HashIndex(args.dataset)
+    added, removed = index.sync()
+    print(f"🗂️ {index.db_path}: {index.count()} images ({added} hashed, {removed} removed)")
+    if args.find:
+        md5, hash_value = hash_file(args.find)
+        exact = index.find_exact(md5)
+        near = index.find_near(hash_value, args.max_distance)
+        print(f"   exact: {exact or '-'}")
+        print(f"   near: {f'{near[0]} (distance {near[1]})' if near else '-'}")
+    index.close()
+
+if __name__ == "__main__":
+    main()
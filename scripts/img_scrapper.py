@@ -1,28 +1,57 @@
 #!/usr/bin/env python3
+"""Image scraper built as an asyncio pipeline.
+
+search -> download -> validate -> write, connected by bounded queues. Classes are
+searched concurrently and share the download/validate/write workers. Downloads go
+through one aiohttp session whose connector keeps a connection pool per host, and
+each domain is rate limited by its robots.txt crawl delay.
+"""
 import argparse
+import asyncio
+import contextlib
 import os
 import time
 import uuid
 import json
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import random
 from io import BytesIO
 from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import urllib.robotparser
 
-import requests
+import aiohttp
 from PIL import Image
-from duckduckgo_search import DDGS
-from duckduckgo_search.exceptions import RatelimitException
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from requests.exceptions import ProxyError, SSLError
+
+from hash_index import HashIndex, image_dhash
+from scrape_state import ScrapeState
 
 # ------------------------ Configurable defaults ------------------------
 DEFAULT_MAX_RESULTS = 30  # Reduced per-term results
 DEFAULT_MAX_RETRIES = 5   # Increase allowed retries
 DEFAULT_BACKOFF = 5       # Base backoff seconds
+DEFAULT_PIPELINE = {
+    "class_concurrency": 3,       # Classes searched at the same time
+    "download_workers": 10,       # Concurrent downloads across all domains
+    "validate_workers": 4,        # Threads decoding/hashing downloaded bodies
+    "connections_per_domain": 2,  # Pooled connections kept per host
+    "default_domain_delay": 0.0,  # Seconds between requests to a host without a robots.txt crawl delay
+    "queue_size": 256,            # Bound of each inter-stage queue
+    "request_timeout": 10,
+    "search_endpoint": None,      # JSON search endpoint (e.g. the local stub) instead of DuckDuckGo
+    "lease_seconds": 120,         # Class lease in the shared job state; renewed while the class runs
+    "max_url_attempts": 3         # Failed downloads are retried across runs up to this many times
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Seconds before a URL whose domain has every connection busy is tried again
+DOMAIN_BUSY_RETRY = 0.2
+# URLs ending in one of these but not in allowed_formats are dropped before connecting;
+# URLs without a recognisable extension still go through (many image CDNs omit it)
+KNOWN_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "gif", "bmp", "tif", "tiff", "svg", "ico",
+                    "avif", "heic", "html", "htm", "php", "pdf"}
+DYNAMIC_EXTENSIONS = {"php", "html", "htm"}
+IMAGE_CONTENT_TYPES = ("image/", "application/octet-stream", "binary/octet-stream")
+CHUNK_SIZE = 64 * 1024
+HEADER_LIMIT = 256 * 1024  # Give up on identifying the image after this many bytes
 # -----------------------------------------------------------------------
 
 USER_AGENTS = [
@@ -33,6 +62,9 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7; rv:114.0) Gecko/20100101 Firefox/114.0"
 ]
 
+class RatelimitError(Exception):
+    """Search provider asked us to slow down."""
+
 def load_json(path):
     with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
@@ -47,58 +79,6 @@ def load_trusted_domains(path):
 def compute_image_hash(content_bytes):
     return hashlib.md5(content_bytes).hexdigest()
 
-def collect_hashes_from_directory(directory):
-    hashes = set()
-    for root, _, files in os.walk(directory):
-        for file in files:
-            try:
-                buf = open(os.path.join(root, file), 'rb').read()
-                hashes.add(compute_image_hash(buf))
-            except:
-                continue
-    return hashes
-
-def create_session(config):
-    session = requests.Session()
-    proxies = config.get('proxies', {})
-    session.proxies.update(proxies)
-    session.headers.update({
-        'User-Agent': random.choice(USER_AGENTS),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'es-ES,es;q=0.9,en-US;q=0.8',
-        'Connection': 'keep-alive'
-    })
-    referer = config.get('referer')
-    if referer:
-        session.headers['Referer'] = referer
-    return session
-
-def attach_retry(session, config):
-    retry_cfg = config.get('retry_on_rate_limit', {})
-    retries = retry_cfg.get('max_retries', DEFAULT_MAX_RETRIES)
-    backoff = retry_cfg.get('wait_seconds', DEFAULT_BACKOFF)
-    retry_strategy = Retry(
-        total=retries,
-        backoff_factor=backoff,
-        status_forcelist=[429, 500, 502, 503, 504],
-        allowed_methods=['GET', 'HEAD']
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount('http://', adapter)
-    session.mount('https://', adapter)
-
-def get_crawl_delay(config, base_url):
-    try:
-        rp = urllib.robotparser.RobotFileParser()
-        rp.set_url(base_url.rstrip('/') + '/robots.txt')
-        rp.read()
-        delay = rp.crawl_delay('*')
-        if delay:
-            return delay
-    except:
-        pass
-    return config.get('sleep_between_queries', 1.5)
-
 def overflow_collector(out_dir, max_limit, allowed_exts, log_success):
     files = [f for f in os.listdir(out_dir)
              if os.path.isfile(os.path.join(out_dir, f)) and f.split('.')[-1].lower() in allowed_exts]
@@ -116,174 +96,668 @@ def overflow_collector(out_dir, max_limit, allowed_exts, log_success):
         except Exception as e:
             print(f"⚠️ Error removing {path}: {e}")
 
-def fetch_and_save(session, url, out_dir, class_name, train_hashes,
-                   allowed_exts, min_w, min_h, max_mb,
-                   trusted_domains, overwrite, log_success, log_errors):
-    session.headers['User-Agent'] = random.choice(USER_AGENTS)
-    # Dynamic referer and optimized Accept for images
+def domain_allowed(host, trusted_domains):
+    """Exact host or any subdomain of a trusted domain (images.pexels.com -> pexels.com)."""
+    if not trusted_domains:
+        return True
+    host = (host or '').lower()
+    return any(host == domain or host.endswith('.' + domain) for domain in trusted_domains)
+
+def url_extension(url):
+    path = urlparse(url).path
+    name = path.rsplit('/', 1)[-1]
+    return name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+
+def prefilter_url(url, allowed_exts, trusted_domains):
+    """Reject reason decided from the URL alone, before any network I/O; None when it may pass."""
     parsed = urlparse(url)
-    base = f"{parsed.scheme}://{parsed.netloc}"
-    session.headers['Referer'] = base
-    session.headers['Accept'] = 'image/webp,image/apng,image/*;q=0.8'
-    original_verify = session.verify
-    original_proxies = session.proxies.copy()
+    if parsed.scheme not in ('http', 'https'):
+        return "scheme"
+    if not domain_allowed(parsed.hostname, trusted_domains):
+        return "untrusted_domain"
+    ext = url_extension(url)
+    if ext in KNOWN_EXTENSIONS and ext not in allowed_exts and ext not in DYNAMIC_EXTENSIONS:
+        return "extension"
+    return None
+
+def read_image_header(head):
+    """(format, width, height) once ``head`` holds the whole image header, else None."""
     try:
-        try:
-            resp = session.get(url, timeout=10)
-        except ProxyError:
-            if log_errors:
-                print(f"⚠️ Proxy error for {url}, retrying without proxy")
-            session.proxies.clear()
-            resp = session.get(url, timeout=10)
-        except SSLError:
-            if log_errors:
-                print(f"⚠️ SSL error for {url}, retrying without verify")
-            session.verify = False
-            resp = session.get(url, timeout=10)
-
-        if resp.status_code == 403:
-            if log_errors:
-                print(f"🚫 403 for {url}")
-            return False
-        if resp.status_code != 200 or not resp.content:
-            if log_errors:
-                print(f"⚠️ HTTP {resp.status_code} for {url}")
-            return False
-
-        buf = resp.content
-        img_hash = compute_image_hash(buf)
-        if img_hash in train_hashes:
-            return False
+        img = Image.open(BytesIO(head))
+    except Exception:
+        return None
+    return (img.format or '').lower(), img.width, img.height
 
+def parse_crawl_delay(robots_txt):
+    """Crawl-delay of the '*' group; urllib.robotparser drops non-integer delays like 0.5."""
+    applies = False
+    for raw in robots_txt.splitlines():
+        line = raw.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = (part.strip() for part in line.split(':', 1))
+        if key.lower() == 'user-agent':
+            applies = value == '*'
+        elif key.lower() == 'crawl-delay' and applies:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+def validate_image(buf, allowed_exts, min_w, min_h, max_mb):
+    """Returns (format, reject_reason); runs in a worker thread."""
+    if len(buf) / (1024 * 1024) > max_mb:
+        return None, "too_large"
+    try:
         img = Image.open(BytesIO(buf))
-        fmt = (img.format or '').lower()
-        if fmt not in allowed_exts:
-            return False
-        if img.width < min_w or img.height < min_h:
-            return False
-        if len(buf) / (1024 * 1024) > max_mb:
-            return False
+    except Exception:
+        return None, "not_an_image"
+    fmt = (img.format or '').lower()
+    if fmt not in allowed_exts:
+        return None, "format"
+    if img.width < min_w or img.height < min_h:
+        return None, "resolution"
+    return fmt, None
+
+class ClassJob:
+    """Per-class progress shared by the pipeline stages."""
+
+    def __init__(self, name, terms, split, out_dir, saved, target):
+        self.name = name
+        self.terms = terms
+        self.split = split
+        self.out_dir = out_dir
+        self.saved = saved
+        self.target = target
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    @property
+    def done(self):
+        return self.saved >= self.target
+
+    def enqueued(self):
+        self.pending += 1
+        self.idle.clear()
+
+    def finished(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.idle.set()
+
+class RateLimiter:
+    """Spaces out calls by at least `interval` seconds (plus optional jitter)."""
+
+    def __init__(self, interval, jitter=0.0):
+        self.interval = interval
+        self.jitter = jitter
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_start - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = loop.time() + self.interval + random.uniform(0, self.jitter)
 
+class DomainLimiter:
+    """Per-domain politeness: bounded concurrency and the robots.txt crawl delay between requests.
+
+    Never sleeps: ``acquire`` books the URL's turn on its domain and returns how long to wait,
+    so the download worker can requeue the URL and fetch from other domains meanwhile.
+    """
+
+    def __init__(self, connections_per_domain, default_delay, robots_timeout=5):
+        self.connections_per_domain = connections_per_domain
+        self.default_delay = default_delay
+        self.robots_timeout = robots_timeout
+        self._delays = {}
+        self._next_start = {}
+        self._active = {}
+        self._robots_locks = {}
+
+    async def _crawl_delay(self, http, scheme, domain):
+        try:
+            async with http.get(f"{scheme}://{domain}/robots.txt",
+                                timeout=aiohttp.ClientTimeout(total=self.robots_timeout)) as resp:
+                if resp.status != 200:
+                    return self.default_delay
+                delay = parse_crawl_delay(await resp.text(errors='ignore'))
+        except Exception:
+            return self.default_delay
+        return delay or self.default_delay
+
+    async def _delay(self, http, scheme, domain):
+        if domain not in self._delays:
+            lock = self._robots_locks.setdefault(domain, asyncio.Lock())
+            async with lock:
+                if domain not in self._delays:
+                    self._delays[domain] = await self._crawl_delay(http, scheme, domain)
+        return self._delays[domain]
+
+    async def acquire(self, http, url, not_before=None):
+        """Returns (0, None) once the URL holds a slot on its domain (pair with ``release``).
+
+        Otherwise returns (seconds to wait, booked start) without holding anything; the
+        booked start is passed back on the next call so the URL keeps its turn.
+        """
+        parsed = urlparse(url)
         domain = parsed.netloc.lower()
-        if trusted_domains and domain not in trusted_domains:
-            return False
-
-        filename = f"{class_name}_{uuid.uuid4().hex}.{fmt}"
-        save_path = os.path.join(out_dir, filename)
-        if not overwrite and os.path.exists(save_path):
-            return False
-        with open(save_path, 'wb') as f:
+        delay = await self._delay(http, parsed.scheme or 'https', domain)
+        now = asyncio.get_running_loop().time()
+        if not_before is None:
+            not_before = max(now, self._next_start.get(domain, 0.0))
+            self._next_start[domain] = not_before + delay
+        if not_before > now:
+            return not_before - now, not_before
+        if self._active.get(domain, 0) >= self.connections_per_domain:
+            return DOMAIN_BUSY_RETRY, now + DOMAIN_BUSY_RETRY
+        self._active[domain] = self._active.get(domain, 0) + 1
+        return 0, None
+
+    def release(self, url):
+        domain = urlparse(url).netloc.lower()
+        self._active[domain] -= 1
+
+class ScrapePipeline:
+    def __init__(self, config, trusted_domains):
+        self.config = config
+        self.trusted_domains = trusted_domains
+        self.settings = dict(DEFAULT_PIPELINE, download_workers=config.get('concurrency', 10))
+        self.settings.update(config.get('pipeline', {}))
+        self.retry_cfg = config.get('retry_on_rate_limit', {})
+        self.min_w, self.min_h = config.get('min_resolution', [0, 0])
+        self.max_mb = config.get('max_file_size_mb', 5)
+        self.allowed_exts = tuple(fmt.lower() for fmt in config.get('allowed_formats', []))
+        self.log_success = config.get('log_successful_downloads', True)
+        self.log_errors = config.get('log_errors', True)
+        self.proxies = config.get('proxies', {})
+        # Near-duplicate threshold in dHash bits; negative disables the perceptual check
+        self.near_distance = config.get('near_duplicate_distance', 3)
+        version_dir = os.path.join(config['output_base_path'], config['version'])
+        self.index = HashIndex(version_dir, config.get('hash_index_path'))
+        # Index queries and writes run on this one thread, in order, instead of blocking the loop
+        self.index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hash-index")
+        self.state = ScrapeState(version_dir, config.get('state_path'),
+                                 lease_seconds=self.settings['lease_seconds'],
+                                 max_url_attempts=self.settings['max_url_attempts'])
+
+        base_sleep = config.get('sleep_between_queries', 1.5)
+        # One search provider for every class, so the query spacing is global
+        self.search_limiter = RateLimiter(base_sleep, jitter=base_sleep * 0.5)
+        self.domains = DomainLimiter(self.settings['connections_per_domain'], self.settings['default_domain_delay'])
+        self.stats = {"terms_searched": 0, "urls_queued": 0, "downloaded": 0, "download_failed": 0,
+                      "bytes_downloaded": 0, "duplicates": 0, "near_duplicates": 0, "saved": 0, "rejected": {},
+                      "rejected_before_connect": 0, "rejected_mid_download": 0, "bytes_saved": 0,
+                      "aborted_unknown_length": 0}
+        self._ddgs = None
+        # URLs waiting out a crawl delay or a retry back-off before going back on the URL queue
+        self.deferred = set()
+
+    # ---------------- search stage ----------------
+
+    async def search(self, http, term):
+        endpoint = self.settings.get('search_endpoint')
+        max_results = self.config.get('max_results', DEFAULT_MAX_RESULTS)
+        attempts = 0
+        while True:
+            await self.search_limiter.wait()
+            try:
+                if endpoint:
+                    async with http.get(endpoint, params={"q": term, "max_results": max_results}) as resp:
+                        if resp.status in RETRY_STATUSES:
+                            raise RatelimitError(f"HTTP {resp.status}")
+                        results = await resp.json()
+                else:
+                    results = await asyncio.to_thread(self._ddgs_search, term, max_results)
+                self.stats["terms_searched"] += 1
+                return [r.get('image') for r in results if r.get('image')]
+            except RatelimitError:
+                attempts += 1
+                if attempts > self.retry_cfg.get('max_retries', DEFAULT_MAX_RETRIES):
+                    print(f"⚠️ Skipping term {term} after rate limit")
+                    return None
+                base_backoff = self.retry_cfg.get('wait_seconds', DEFAULT_BACKOFF)
+                sleep_time = base_backoff * (2 ** (attempts - 1)) + random.uniform(0, base_backoff)
+                print(f"⏳ Exponential back-off {sleep_time:.1f}s (attempt {attempts})")
+                await asyncio.sleep(sleep_time)
+            except Exception as e:
+                if self.log_errors:
+                    print(f"❌ Search failed for {term}: {e}")
+                return None
+
+    def _ddgs_search(self, term, max_results):
+        from duckduckgo_search import DDGS
+        from duckduckgo_search.exceptions import RatelimitException
+
+        if self._ddgs is None:
+            self._ddgs = DDGS()
+        try:
+            return self._ddgs.images(term, max_results=max_results)
+        except RatelimitException as e:
+            raise RatelimitError(str(e))
+
+    async def enqueue(self, job, url, url_queue):
+        job.enqueued()
+        self.stats["urls_queued"] += 1
+        await url_queue.put((job, url, 0, None))
+
+    async def run_class(self, http, job, url_queue, round_number):
+        if job.done:
+            return
+        # URLs an interrupted run queued but never finished go first
+        resumed = self.state.frontier(job.name, job.split)
+        if resumed:
+            print(f"♻️ {job.name}: resuming {len(resumed)} queued URLs")
+        for url in resumed:
+            await self.enqueue(job, url, url_queue)
+        new_urls = len(resumed)
+        while not job.done:
+            print(f"🔄 {job.name} round {round_number}: {job.saved}/{job.target}")
+            searched = self.state.searched_terms(job.name, job.split, round_number)
+            for term in job.terms:
+                if job.done:
+                    break
+                if term in searched:
+                    continue
+                print(f"🔍 Searching: {term}")
+                results = await self.search(http, term)
+                if results is None:
+                    continue
+                for url in results:
+                    reason = prefilter_url(url, self.allowed_exts, self.trusted_domains)
+                    # Known URLs (saved, rejected, failed or queued by any run) are skipped
+                    if not self.state.claim_url(url, job.name, job.split, *(("rejected", reason) if reason else ())):
+                        continue
+                    new_urls += 1
+                    if reason:
+                        self.count_rejection(reason)
+                        self.stats["rejected_before_connect"] += 1
+                        continue
+                    await self.enqueue(job, url, url_queue)
+                self.state.record_term(job.name, job.split, round_number, term, len(results))
+            # A round ends once every URL it queued went through the pipeline
+            await job.idle.wait()
+            if job.done:
+                break
+            if not new_urls:
+                # Close the round anyway: otherwise every term stays "searched" for it and later
+                # runs of a short class would stop at once without searching again
+                next_round = self.state.advance_round(job.name, job.split)
+                print(f"⚠️ {job.name}: no new URLs this round, stopping (next run starts round {next_round})")
+                break
+            round_number = self.state.advance_round(job.name, job.split)
+            new_urls = 0
+
+    # ---------------- download stage ----------------
+
+    def count_saved(self, content_length, received):
+        """Bytes the old full-body download would have pulled on top of what we read."""
+        self.stats["rejected_mid_download"] += 1
+        self.stats["bytes_downloaded"] += received
+        if content_length is None:
+            self.stats["aborted_unknown_length"] += 1
+        else:
+            self.stats["bytes_saved"] += max(0, content_length - received)
+
+    async def read_body(self, resp):
+        """Streams the body, aborting once it is too big or its image header disqualifies it.
+
+        Returns (bytes, None) or (None, reject_reason).
+        """
+        max_bytes = self.max_mb * 1024 * 1024
+        length = resp.content_length
+        if length is not None and length > max_bytes:
+            self.count_saved(length, 0)
+            return None, "too_large"
+        content_type = resp.content_type or ''
+        if content_type and not content_type.startswith(IMAGE_CONTENT_TYPES):
+            self.count_saved(length, 0)
+            return None, "content_type"
+
+        chunks = []
+        received = 0
+        header_checked = False
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            chunks.append(chunk)
+            received += len(chunk)
+            if received > max_bytes:
+                self.count_saved(length, received)
+                return None, "too_large"
+            if header_checked:
+                continue
+            header = read_image_header(b''.join(chunks))
+            if header is None:
+                if received < HEADER_LIMIT:
+                    continue
+                self.count_saved(length, received)
+                return None, "not_an_image"
+            fmt, width, height = header
+            reason = None
+            if fmt not in self.allowed_exts:
+                reason = "format"
+            elif width < self.min_w or height < self.min_h:
+                reason = "resolution"
+            if reason:
+                self.count_saved(length, received)
+                return None, reason
+            header_checked = True
+        return b''.join(chunks) or None, None
+
+    async def fetch(self, http, url):
+        """One request with per-request headers, inside a domain slot the caller holds.
+
+        Returns (bytes or None, reject_reason or None, retryable status or None).
+        """
+        parsed = urlparse(url)
+        headers = {
+            'User-Agent': random.choice(USER_AGENTS),
+            'Referer': f"{parsed.scheme}://{parsed.netloc}",
+            'Accept': 'image/webp,image/apng,image/*;q=0.8'
+        }
+        proxy = self.proxies.get(parsed.scheme)
+        ssl = None
+        while True:
+            try:
+                async with http.get(url, headers=headers, proxy=proxy, ssl=ssl) as resp:
+                    if resp.status == 403:
+                        if self.log_errors:
+                            print(f"🚫 403 for {url}")
+                        return None, None, None
+                    if resp.status in RETRY_STATUSES:
+                        return None, None, resp.status
+                    if resp.status != 200:
+                        if self.log_errors:
+                            print(f"⚠️ HTTP {resp.status} for {url}")
+                        return None, None, None
+                    return (*await self.read_body(resp), None)
+            except (aiohttp.ClientProxyConnectionError, aiohttp.ClientHttpProxyError):
+                if proxy is None:
+                    raise
+                if self.log_errors:
+                    print(f"⚠️ Proxy error for {url}, retrying without proxy")
+                proxy = None
+            except aiohttp.ClientSSLError:
+                if ssl is False:
+                    raise
+                if self.log_errors:
+                    print(f"⚠️ SSL error for {url}, retrying without verify")
+                ssl = False
+
+    def defer(self, url_queue, item, delay):
+        """Puts the item back on the URL queue after `delay` without holding a download worker."""
+        async def _requeue():
+            await asyncio.sleep(delay)
+            await url_queue.put(item)
+        task = asyncio.create_task(_requeue())
+        self.deferred.add(task)
+        task.add_done_callback(self.deferred.discard)
+
+    async def download_worker(self, http, url_queue, validate_queue):
+        max_retries = self.retry_cfg.get('max_retries', DEFAULT_MAX_RETRIES)
+        base_backoff = self.retry_cfg.get('wait_seconds', DEFAULT_BACKOFF)
+        while True:
+            job, url, attempt, not_before = await url_queue.get()
+            # Whoever takes the item over (requeue or next stage) finishes it; otherwise it ends here
+            handed_off = False
+            try:
+                if job.done:
+                    continue
+                wait, not_before = await self.domains.acquire(http, url, not_before)
+                if wait:
+                    self.defer(url_queue, (job, url, attempt, not_before), wait)
+                    handed_off = True
+                    continue
+                try:
+                    buf, reason, retry_status = await self.fetch(http, url)
+                except Exception as e:
+                    buf, reason, retry_status = None, None, None
+                    if self.log_errors:
+                        print(f"❌ Error downloading {url}: {e}")
+                finally:
+                    self.domains.release(url)
+                if retry_status and attempt < max_retries:
+                    # Back off on the queue, not in the worker
+                    if self.log_errors:
+                        print(f"⏳ HTTP {retry_status} for {url}, retry {attempt + 1}/{max_retries}")
+                    self.defer(url_queue, (job, url, attempt + 1, None),
+                               base_backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+                    handed_off = True
+                    continue
+                if retry_status and self.log_errors:
+                    print(f"⚠️ HTTP {retry_status} for {url}")
+                if reason:
+                    self.reject(url, reason)
+                    continue
+                if buf is None:
+                    self.stats["download_failed"] += 1
+                    self.state.record_failure(url)
+                    continue
+                self.stats["downloaded"] += 1
+                self.stats["bytes_downloaded"] += len(buf)
+                await validate_queue.put((job, url, buf))
+                handed_off = True
+            finally:
+                if not handed_off:
+                    job.finished()
+                url_queue.task_done()
+
+    # ---------------- validate stage ----------------
+
+    def count_rejection(self, reason):
+        self.stats["rejected"][reason] = self.stats["rejected"].get(reason, 0) + 1
+
+    def reject(self, url, reason):
+        self.count_rejection(reason)
+        self.state.record_outcome(url, "rejected", reason)
+
+    async def index_call(self, method, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.index_executor, method, *args)
+
+    def mark_duplicate(self, url, kind):
+        self.stats[kind + "s"] += 1
+        self.state.record_outcome(url, "rejected", kind)
+
+    async def validate_worker(self, validate_queue, write_queue):
+        while True:
+            job, url, buf = await validate_queue.get()
+            handed_off = False
+            try:
+                if job.done:
+                    continue
+                img_hash = await asyncio.to_thread(compute_image_hash, buf)
+                if await self.index_call(self.index.find_exact, img_hash):
+                    self.mark_duplicate(url, "duplicate")
+                    continue
+                fmt, reason = await asyncio.to_thread(
+                    validate_image, buf, self.allowed_exts, self.min_w, self.min_h, self.max_mb)
+                if reason:
+                    self.reject(url, reason)
+                    continue
+                perceptual_hash = await asyncio.to_thread(image_dhash, buf)
+                if await self.index_call(self.index.find_near, perceptual_hash, self.near_distance):
+                    self.mark_duplicate(url, "near_duplicate")
+                    continue
+                await write_queue.put((job, url, buf, img_hash, perceptual_hash, fmt))
+                handed_off = True
+            finally:
+                if not handed_off:
+                    job.finished()
+                validate_queue.task_done()
+
+    # ---------------- write stage ----------------
+
+    def write_file(self, path, buf):
+        # Written under a temporary name so a crash never leaves a truncated image behind
+        tmp_path = path + '.part'
+        with open(tmp_path, 'wb') as f:
             f.write(buf)
-        if log_success:
-            print(f"✅ Saved: {filename}")
-        return True
+        os.replace(tmp_path, path)
 
-    except Exception as e:
-        if log_errors:
-            print(f"❌ Error saving {url}: {e}")
+    async def is_duplicate(self, url, img_hash, perceptual_hash):
+        """Re-check at write time: two copies may have passed validation before either was saved."""
+        if await self.index_call(self.index.find_exact, img_hash):
+            self.mark_duplicate(url, "duplicate")
+            return True
+        if await self.index_call(self.index.find_near, perceptual_hash, self.near_distance):
+            self.mark_duplicate(url, "near_duplicate")
+            return True
         return False
-    finally:
-        session.verify = original_verify
-        session.proxies = original_proxies
-
-def search_and_save_images(terms, class_name, config, trusted_domains):
-    base_path = config['output_base_path']
-    version = config['version']
-    mode = config['mode']
-    limits = config['limits']
-    min_limit = limits.get('min_image_limit_per_class', 0)
-    max_limit = limits.get('max_image_limit_per_class')
-    min_w, min_h = config.get('min_resolution', [0,0])
-    max_mb = config.get('max_file_size_mb', 5)
-    allowed_exts = tuple(fmt.lower() for fmt in config.get('allowed_formats', []))
-    overwrite = config.get('overwrite_existing', False)
-    log_success = config.get('log_successful_downloads', True)
-    log_errors = config.get('log_errors', True)
-
-    out_dir = os.path.join(base_path, version, f"{mode}_data", class_name)
-    train_dir = os.path.join(base_path, version, "train_data", class_name)
-    os.makedirs(out_dir, exist_ok=True)
-
-    existing = [f for f in os.listdir(out_dir) if f.split('.')[-1].lower() in allowed_exts]
-    images_saved = len(existing)
-    print(f"📦 {class_name}: {images_saved} existing images")
-    if max_limit and images_saved > max_limit:
-        overflow_collector(out_dir, max_limit, allowed_exts, log_success)
-        images_saved = max_limit
-        print(f"🔽 Trimmed to max limit: {images_saved} images")
-
-    train_hashes = collect_hashes_from_directory(train_dir)
-    session = create_session(config)
-    attach_retry(session, config)
-    base_url = session.headers.get('Referer', 'https://www.google.com')
-    delay = get_crawl_delay(config, base_url)
-
-    with DDGS() as ddgs:
-        round_count = 0
-        while images_saved < min_limit:
-            round_count += 1
-            print(f"🔄 Round {round_count}: {images_saved}/{min_limit}")
-            all_urls = []
-            for term in terms:
-                print(f"🔍 Searching: {term}")
-                attempts = 0
-                retry_cfg = config.get('retry_on_rate_limit', {})
-                results = []
-                while True:
-                    try:
-                        results = ddgs.images(term, max_results=config.get('max_results', DEFAULT_MAX_RESULTS))
-                        break
-                    except RatelimitException:
-                        attempts += 1
-                        if attempts > retry_cfg.get('max_retries', DEFAULT_MAX_RETRIES):
-                            print(f"⚠️ Skipping term {term} after rate limit")
-                            break
-                        base_backoff = retry_cfg.get('wait_seconds', DEFAULT_BACKOFF)
-                        sleep_time = base_backoff * (2 ** (attempts - 1)) + random.uniform(0, base_backoff)
-                        print(f"⏳ Exponential back-off {sleep_time:.1f}s (attempt {attempts})")
-                        time.sleep(sleep_time)
-                urls = [r.get('image') for r in results if r.get('image')]
-                all_urls.extend(urls)
-                base_sleep = config.get('sleep_between_queries', 1.5)
-                jitter = base_sleep * 0.5
-                time.sleep(base_sleep + random.uniform(0, jitter))
-
-            unique_urls = list(dict.fromkeys(all_urls))
-            random.shuffle(unique_urls)
-
-            prev_count = images_saved
-            with ThreadPoolExecutor(max_workers=config.get('concurrency', 10)) as executor:
-                futures = {executor.submit(
-                    fetch_and_save, session, url, out_dir, class_name,
-                    train_hashes, allowed_exts, min_w, min_h, max_mb,
-                    trusted_domains, overwrite, log_success, log_errors
-                ): url for url in unique_urls}
-                for future in as_completed(futures):
-                    url = futures[future]
+
+    async def write_worker(self, write_queue):
+        # Single writer: counts and the hash index are only mutated here, so no locking is needed
+        while True:
+            job, url, buf, img_hash, perceptual_hash, fmt = await write_queue.get()
+            try:
+                if job.done or await self.is_duplicate(url, img_hash, perceptual_hash):
+                    continue
+                # Fresh uuid name: a saved file is never overwritten (duplicates are caught by the index)
+                filename = f"{job.name}_{uuid.uuid4().hex}.{fmt}"
+                save_path = os.path.join(job.out_dir, filename)
+                try:
+                    await asyncio.to_thread(self.write_file, save_path, buf)
+                except OSError as e:
+                    if self.log_errors:
+                        print(f"❌ Error saving {filename}: {e}")
+                    self.state.record_failure(url, "write_error")
+                    continue
+                await self.index_call(self.index.add, save_path, job.split, job.name, img_hash, perceptual_hash)
+                self.state.record_outcome(url, "saved", path=os.path.relpath(save_path, job.out_dir))
+                job.saved += 1
+                self.stats["saved"] += 1
+                if self.log_success:
+                    print(f"✅ Saved: {filename}")
+            finally:
+                job.finished()
+                write_queue.task_done()
+
+    # ---------------- orchestration ----------------
+
+    def prepare_job(self, name, terms):
+        base_path = self.config['output_base_path']
+        version = self.config['version']
+        mode = self.config['mode']
+        limits = self.config['limits']
+        min_limit = limits.get('min_image_limit_per_class', 0)
+        max_limit = limits.get('max_image_limit_per_class')
+
+        out_dir = os.path.join(base_path, version, f"{mode}_data", name)
+        os.makedirs(out_dir, exist_ok=True)
+
+        existing = [f for f in os.listdir(out_dir) if f.split('.')[-1].lower() in self.allowed_exts]
+        images_saved = len(existing)
+        print(f"📦 {name}: {images_saved} existing images")
+        if max_limit and images_saved > max_limit:
+            overflow_collector(out_dir, max_limit, self.allowed_exts, self.log_success)
+            images_saved = max_limit
+            print(f"🔽 Trimmed to max limit: {images_saved} images")
+
+        target = min(min_limit, max_limit) if max_limit else min_limit
+        return ClassJob(name, terms, mode, out_dir, images_saved, target)
+
+    async def run(self, classes):
+        settings = self.settings
+        url_queue = asyncio.Queue(settings['queue_size'])
+        validate_queue = asyncio.Queue(settings['queue_size'])
+        write_queue = asyncio.Queue(settings['queue_size'])
+        connector = aiohttp.TCPConnector(limit=settings['download_workers'],
+                                         limit_per_host=settings['connections_per_domain'],
+                                         ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=settings['request_timeout'])
+        headers = {'Accept-Language': 'es-ES,es;q=0.9,en-US;q=0.8'}
+        referer = self.config.get('referer')
+        if referer:
+            headers['Referer'] = referer
+
+        jobs = [self.prepare_job(name, terms) for name, terms in classes]
+        # Every split and class of the version is deduplicated against; only new files get hashed
+        sync_started = time.perf_counter()
+        added, removed = await self.index_call(self.index.sync, self.allowed_exts)
+        print(f"🗂️ Hash index: {await self.index_call(self.index.count)} images ({added} hashed, {removed} removed) "
+              f"in {time.perf_counter() - sync_started:.2f}s")
+        started = time.perf_counter()
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as http:
+            workers = [asyncio.create_task(self.download_worker(http, url_queue, validate_queue))
+                       for _ in range(settings['download_workers'])]
+            workers += [asyncio.create_task(self.validate_worker(validate_queue, write_queue))
+                        for _ in range(settings['validate_workers'])]
+            workers.append(asyncio.create_task(self.write_worker(write_queue)))
+
+            class_slots = asyncio.Semaphore(settings['class_concurrency'])
+            active = set()
+            ran = []
+
+            async def run_limited(job):
+                async with class_slots:
+                    claim = self.state.claim_class(job.name, job.split, job.target)
+                    if claim is None:
+                        print(f"⏭️ {job.name}: leased by another scraper process, skipping")
+                        return
+                    active.add(job)
                     try:
-                        if future.result():
-                            images_saved += 1
-                        if max_limit and images_saved > max_limit:
-                            break
-                    except Exception as e:
-                        if log_errors:
-                            print(f"❌ Error downloading {url}: {e}")
-
-            if max_limit and images_saved > max_limit:
-                overflow_collector(out_dir, max_limit, allowed_exts, log_success)
-                images_saved = max_limit
-            if images_saved == prev_count:
-                print("⚠️ No new images this round, aborting")
-                break
+                        print(f"\n🔽 Clase: {job.name}" + (" (resuming)" if claim["resumed"] else ""))
+                        await self.run_class(http, job, url_queue, claim["round"])
+                    finally:
+                        active.discard(job)
+                        self.state.release_class(job.name, job.split, "done" if job.done else "short", job.saved)
+                    ran.append(job)
+                    status = "🎉" if job.saved >= job.target else "❌"
+                    print(f"{status} {job.name}: {job.saved}/{job.target} images")
 
-    if images_saved < min_limit:
-        print(f"❌ {class_name}: only {images_saved}, minimum {min_limit}")
-        exit(1)
-    print(f"🎉 {class_name}: completed with {images_saved} images")
+            async def heartbeat():
+                # Keeps the class leases alive (and progress visible) while classes run
+                while True:
+                    await asyncio.sleep(settings['lease_seconds'] / 3)
+                    for job in list(active):
+                        self.state.renew(job.name, job.split, job.saved)
 
-if __name__ == '__main__':
+            workers.append(asyncio.create_task(heartbeat()))
+            classes_task = asyncio.ensure_future(asyncio.gather(*(run_limited(job) for job in jobs)))
+            try:
+                # Workers only return by failing; without them the queues stop draining and
+                # the classes would wait on their rounds forever, so the run fails instead
+                done, _ = await asyncio.wait([classes_task, *workers], return_when=asyncio.FIRST_COMPLETED)
+                if classes_task not in done:
+                    dead = done.pop()
+                    error = None if dead.cancelled() else dead.exception()
+                    raise RuntimeError(f"Pipeline worker exited: {error!r}") from error
+                await classes_task
+            finally:
+                for task in [classes_task, *workers, *self.deferred]:
+                    task.cancel()
+                await asyncio.gather(classes_task, *workers, *self.deferred, return_exceptions=True)
+                await self.index_call(self.index.close)
+                self.index_executor.shutdown()
+                self.state.close()
+
+        self.print_summary(time.perf_counter() - started)
+        return ran
+
+    def print_summary(self, elapsed):
+        stats = self.stats
+        print("\n📊 Scraping summary")
+        print(f"   elapsed: {elapsed:.1f}s")
+        print(f"   terms searched: {stats['terms_searched']}, URLs queued: {stats['urls_queued']}")
+        print(f"   downloaded: {stats['downloaded']} ({stats['bytes_downloaded'] / (1024 * 1024):.1f} MB), "
+              f"failed: {stats['download_failed']}")
+        print(f"   duplicates: {stats['duplicates']} exact, {stats['near_duplicates']} near; "
+              f"rejected: {stats['rejected']}")
+        # The previous scraper downloaded every body in full before checking domain, format, size or resolution
+        print(f"   early rejection: {stats['rejected_before_connect']} before connecting, "
+              f"{stats['rejected_mid_download']} mid-download; "
+              f"{stats['bytes_saved'] / (1024 * 1024):.1f} MB not downloaded"
+              + (f" (+{stats['aborted_unknown_length']} aborted bodies of unknown length)"
+                 if stats['aborted_unknown_length'] else ""))
+        print(f"   saved: {stats['saved']} ({stats['saved'] / elapsed if elapsed else 0:.1f} images/s)")
+
+def main():
     parser = argparse.ArgumentParser(description='Image scraping')
     parser.add_argument('--config', required=True)
+    parser.add_argument('--classes', help='Comma-separated class names (to split classes across processes)')
     args = parser.parse_args()
 
     cfg = load_json(args.config)
@@ -291,10 +765,21 @@ if __name__ == '__main__':
     if cfg.get('use_trusted_domains', False):
         trusted = load_trusted_domains(cfg.get('trusted_domains_path', ''))
 
-    classes = load_json(cfg.get('classes_path', ''))
-    for entry in classes:
+    classes = []
+    for entry in load_json(cfg.get('classes_path', '')):
         cls = entry.get('class', {})
-        name = cls.get('name')
-        terms = cls.get('terms_to_seek', [])
-        print(f"\n🔽 Clase: {name}")
-        search_and_save_images(terms, name, cfg, trusted)
\ No newline at end of file
+        classes.append((cls.get('name'), cls.get('terms_to_seek', [])))
+    if args.classes:
+        selected = {name.strip() for name in args.classes.split(',')}
+        classes = [(name, terms) for name, terms in classes if name in selected]
+
+    jobs = asyncio.run(ScrapePipeline(cfg, trusted).run(classes))
+    min_limit = cfg['limits'].get('min_image_limit_per_class', 0)
+    short = [job for job in jobs if job.saved < min_limit]
+    for job in short:
+        print(f"❌ {job.name}: only {job.saved}, minimum {min_limit}")
+    if short:
+        exit(1)
+
+if __name__ == '__main__':
+    main()
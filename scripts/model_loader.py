@@ -1,85 +1,354 @@
-import kagglehub
-import tensorflow as tf
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.preprocessing import image_dataset_from_directory
-import numpy as np
-import cv2
+"""Camera / video recognition with a streaming inference pipeline.
+
+Capture, preprocessing, inference and output run on separate threads linked by
+bounded queues. When inference falls behind, the oldest queued frame is dropped
+instead of letting latency grow; a cheap frame-difference check skips inference
+on frames that did not change, and predictions are averaged over a sliding
+window. Speech runs on its own thread so it never blocks the capture loop.
+
+Usage:
+    python scripts/model_loader.py --model iavisionpay_model.keras              # camera 0
+    python scripts/model_loader.py --source clip.mp4 --headless --report out.json
+
+Class names come from the model's ``.meta.json`` (written by ``model_trainer.py``), so
+startup needs neither the dataset nor the network; ``--classes`` covers older models.
+"""
+import argparse
+import json
 import os
-import pyttsx3
-
-# Download dataset
-dataset_path = kagglehub.dataset_download("salmaneunus/mechanical-tools-dataset")
-print("Dataset downloaded in:", dataset_path)
-
-# Adjust correct paths
-train_path = os.path.join(dataset_path, "train_data_V2", "train_data_V2")  
-val_path = os.path.join(dataset_path, "validation_data_V2", "validation_data_V2")  
-
-if not os.path.exists(train_path) or not os.path.exists(val_path):
-    raise Exception(f"⚠️ The correct folders were not found. Verify that {train_path} and {val_path} exist.")
-
-# Prepare dataset
-img_size = (224, 224)
-batch_size = 32
-
-train_ds = image_dataset_from_directory(
-    train_path,
-    image_size=img_size,
-    batch_size=batch_size
-)
-
-val_ds = image_dataset_from_directory(
-    val_path,
-    image_size=img_size,
-    batch_size=batch_size
-)
-
-class_names = train_ds.class_names
-print("Classes detected:", class_names)
-
-print("Starting camera recognition. Press 'q' to exit...")
-
-model_path = 'iavisionpay_model.keras'
-img_size = (224, 224)
-
-model = tf.keras.models.load_model(model_path)
-engine = pyttsx3.init()
-engine.setProperty('rate', 160)
-engine.setProperty('volume', 1.0)
-last_prediction = ""
-
-cap = cv2.VideoCapture(0)
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    # Preprocessing
-    img = cv2.resize(frame, img_size)
-    img_array = tf.keras.applications.mobilenet_v2.preprocess_input(np.expand_dims(img, axis=0))
-
-    # Prediction
-    predictions = model.predict(img_array, verbose=0)
-    predicted_index = np.argmax(predictions)
-    predicted_label = class_names[predicted_index]
-    confidence = predictions[0][predicted_index]
-
-    # Show prediction
-    label_text = f"{predicted_label} ({confidence*100:.1f}%)"
-    cv2.putText(frame, label_text, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-    cv2.imshow("Reconocimiento de herramientas", frame)
-
-    # Text to speech with confidence > 85%
-    if predicted_label != last_prediction and confidence > 0.90:
-        phrase = f"{predicted_label}"
-        engine.say(phrase)
-        engine.runAndWait()
-        last_prediction = predicted_label
-
-    # Exit with 'q'
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_bundle import BundleError, load_bundle
+from preprocessing import preprocess_bgr_frame
+
+STOP = object()
+# Side of the grayscale thumbnail used for the frame-difference check
+DIFF_SIZE = 32
+
+def put_latest(q, item):
+    """Puts without blocking, dropping the oldest queued item if full; returns how many were dropped."""
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+def put_stop(q):
+    # The sentinel must never be dropped
+    while True:
+        try:
+            q.put(STOP, timeout=0.1)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+class PipelineStats:
+    def __init__(self):
+        self.read = 0
+        self.skipped = 0
+        self.dropped_capture = 0
+        self.dropped_inference = 0
+        self.unchanged = 0
+        self.inferred = 0
+        self.shown = 0
+        self.latencies = []
+        self.inference_seconds = []
+
+    def summary(self, elapsed):
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        inference = np.array(self.inference_seconds) * 1000 if self.inference_seconds else np.zeros(1)
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "frames_read": self.read,
+            "frames_skipped": self.skipped,
+            "frames_dropped_capture": self.dropped_capture,
+            "frames_dropped_inference": self.dropped_inference,
+            "frames_unchanged": self.unchanged,
+            "frames_inferred": self.inferred,
+            "frames_shown": self.shown,
+            "capture_fps": round(self.read / elapsed, 2) if elapsed else None,
+            "output_fps": round(self.shown / elapsed, 2) if elapsed else None,
+            "inference_fps": round(self.inferred / elapsed, 2) if elapsed else None,
+            "latency_ms": {"p50": round(float(np.percentile(latencies, 50)), 2),
+                           "p95": round(float(np.percentile(latencies, 95)), 2),
+                           "max": round(float(latencies.max()), 2)},
+            "inference_ms": {"mean": round(float(inference.mean()), 2),
+                             "p95": round(float(np.percentile(inference, 95)), 2)}
+        }
+
+class PredictionSmoother:
+    """Mean of the last ``window`` probability vectors."""
+
+    def __init__(self, window):
+        self.window = deque(maxlen=max(1, window))
+
+    def update(self, probabilities):
+        self.window.append(probabilities)
+
+    def current(self):
+        if not self.window:
+            return None
+        return np.mean(self.window, axis=0)
+
+class Speaker:
+    """Text to speech on its own thread; only the latest pending phrase is kept."""
+
+    def __init__(self, rate=160, volume=1.0):
+        self.phrases = queue.Queue(maxsize=1)
+        self.rate, self.volume = rate, volume
+        threading.Thread(target=self._run, name="speech", daemon=True).start()
+
+    def say(self, phrase):
+        put_latest(self.phrases, phrase)
+
+    def _run(self):
+        import pyttsx3
+
+        # The engine has to live on the thread that calls runAndWait
+        engine = pyttsx3.init()
+        engine.setProperty('rate', self.rate)
+        engine.setProperty('volume', self.volume)
+        while True:
+            engine.say(self.phrases.get())
+            engine.runAndWait()
+
+def capture_loop(cap, frames, stats, skip, pace_fps, lossless, stop_event):
+    frame_interval = 1.0 / pace_fps if pace_fps else 0.0
+    next_frame_at = time.perf_counter()
+    index = 0
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        captured_at = time.perf_counter()
+        stats.read += 1
+        index += 1
+        if index % skip:
+            stats.skipped += 1
+        elif lossless:
+            frames.put((captured_at, frame))
+        else:
+            stats.dropped_capture += put_latest(frames, (captured_at, frame))
+        if frame_interval:
+            # Video files are replayed at their own frame rate, like a live camera
+            next_frame_at += frame_interval
+            time.sleep(max(0.0, next_frame_at - time.perf_counter()))
+    put_stop(frames)
+
+class InferenceReference:
+    """Thumbnail of the last frame that actually went through inference.
+
+    Set by the inference thread, so a changed frame dropped from the jobs queue never
+    becomes the reference that later frames are compared against.
+    """
+
+    def __init__(self, diff_threshold, refresh_every):
+        self.diff_threshold = diff_threshold
+        self.refresh_every = refresh_every
+        self._lock = threading.Lock()
+        self._thumbnail = None
+        self._since_inference = 0
+
+    def changed(self, thumbnail):
+        with self._lock:
+            # Mean absolute difference of small grayscale thumbnails, in 0-255 units
+            if (self._thumbnail is None or self._since_inference >= self.refresh_every
+                    or np.abs(thumbnail - self._thumbnail).mean() >= self.diff_threshold):
+                return True
+            self._since_inference += 1
+            return False
+
+    def inferred(self, thumbnail):
+        with self._lock:
+            self._thumbnail = thumbnail
+            self._since_inference = 0
+
+def preprocess_loop(frames, jobs, stats, img_size, reference, lossless):
+    while True:
+        item = frames.get()
+        if item is STOP:
+            put_stop(jobs)
+            return
+        captured_at, frame = item
+        thumbnail = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (DIFF_SIZE, DIFF_SIZE),
+                               interpolation=cv2.INTER_AREA).astype(np.int16)
+        batch = None
+        if reference.changed(thumbnail):
+            batch = np.empty((1, img_size[1], img_size[0], 3), dtype=np.float32)
+            # Preprocessing (BGR -> RGB, resize, [-1, 1]), same as training and the API
+            preprocess_bgr_frame(frame, img_size, out=batch[0])
+        if lossless:
+            jobs.put((captured_at, frame, batch, thumbnail))
+        else:
+            stats.dropped_inference += put_latest(jobs, (captured_at, frame, batch, thumbnail))
+
+def inference_loop(backend, jobs, results, stats, reference):
+    while True:
+        item = jobs.get()
+        if item is STOP:
+            # The output loop always drains results, so a blocking put is safe here
+            results.put(STOP)
+            return
+        captured_at, frame, batch, thumbnail = item
+        probabilities = None
+        if batch is not None:
+            started = time.perf_counter()
+            probabilities = backend.predict(batch)[0]
+            stats.inference_seconds.append(time.perf_counter() - started)
+            stats.inferred += 1
+            reference.inferred(thumbnail)
+        else:
+            stats.unchanged += 1
+        results.put((captured_at, frame, probabilities))
+
+def stop_capture(thread, frames, stop_event):
+    """Stops the capture thread and waits for it; draining ``frames`` unblocks a lossless put."""
+    stop_event.set()
+    while thread.is_alive():
+        try:
+            frames.get(timeout=0.05)
+        except queue.Empty:
+            pass
+    thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Camera / video recognition")
+    parser.add_argument("--model", default="iavisionpay_model.keras")
+    parser.add_argument("--source", default="0", help="Camera index or video file")
+    parser.add_argument("--classes", help="Comma-separated class names, for models saved without metadata")
+    parser.add_argument("--headless", action="store_true", help="No window and no speech (benchmarks)")
+    parser.add_argument("--no-speech", action="store_true")
+    parser.add_argument("--skip", type=int, default=1, help="Only process every Nth frame")
+    parser.add_argument("--diff-threshold", type=float, default=3.0,
+                        help="Mean grayscale difference (0-255) below which inference is skipped")
+    parser.add_argument("--refresh-every", type=int, default=30,
+                        help="Run inference at least once every N processed frames")
+    parser.add_argument("--window", type=int, default=5, help="Predictions averaged for the label")
+    parser.add_argument("--queue-size", type=int, default=2)
+    parser.add_argument("--speech-threshold", type=float, default=0.90)
+    parser.add_argument("--max-speed", action="store_true",
+                        help="Video files: read as fast as possible without dropping frames")
+    parser.add_argument("--report", help="Write the FPS / latency summary to this JSON file")
+    args = parser.parse_args()
+
+    started_main = time.perf_counter()
+    from app.inference import KerasBackend
+
+    # Metadata first: a wrong or incomplete bundle fails before TensorFlow is imported
+    try:
+        bundle = load_bundle(args.model, fallback_class_names=args.classes.split(",") if args.classes else None)
+        print("Classes:", bundle.class_names)
+        model = bundle.load_keras_model()
+    except BundleError as e:
+        sys.exit(f"⚠️ {e}")
+    class_names = bundle.class_names
+    img_size = bundle.image_size
+    backend = KerasBackend(model, img_size)
+    bundle.record_first_prediction(backend.warmup())
+    bundle.log_cold_start()
+
+    is_camera = args.source.isdigit()
+    cap = cv2.VideoCapture(int(args.source) if is_camera else args.source)
+    if not cap.isOpened():
+        raise Exception(f"⚠️ Could not open video source {args.source}")
+    pace_fps = None if is_camera or args.max_speed else (cap.get(cv2.CAP_PROP_FPS) or 30.0)
+    lossless = args.max_speed and not is_camera
+
+    stats = PipelineStats()
+    stop_event = threading.Event()
+    frames = queue.Queue(maxsize=args.queue_size)
+    jobs = queue.Queue(maxsize=args.queue_size)
+    results = queue.Queue(maxsize=args.queue_size * 2)
+    reference = InferenceReference(args.diff_threshold, args.refresh_every)
+    threads = [
+        threading.Thread(target=capture_loop, name="capture", daemon=True,
+                         args=(cap, frames, stats, max(1, args.skip), pace_fps, lossless, stop_event)),
+        threading.Thread(target=preprocess_loop, name="preprocess", daemon=True,
+                         args=(frames, jobs, stats, img_size, reference, lossless)),
+        threading.Thread(target=inference_loop, name="inference", daemon=True,
+                         args=(backend, jobs, results, stats, reference)),
+    ]
+    speaker = None if args.headless or args.no_speech else Speaker()
+    smoother = PredictionSmoother(args.window)
+    last_prediction = ""
+    first_frame_at = None
+
+    print("Starting recognition. Press 'q' to exit..." if not args.headless else f"Processing {args.source}...")
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # Output stays on the main thread: OpenCV windows must be driven from it
+    while True:
+        item = results.get()
+        if item is STOP:
+            break
+        captured_at, frame, probabilities = item
+        if probabilities is not None:
+            if first_frame_at is None:
+                first_frame_at = time.perf_counter()
+                print(f"⏱️ First frame classified {(first_frame_at - started_main) * 1000:.0f} ms after startup")
+            smoother.update(probabilities)
+        smoothed = smoother.current()
+        stats.latencies.append(time.perf_counter() - captured_at)
+        stats.shown += 1
+        if smoothed is None:
+            continue
+        predicted_index = int(np.argmax(smoothed))
+        predicted_label = class_names[predicted_index]
+        confidence = smoothed[predicted_index]
+
+        if not args.headless:
+            # Show prediction
+            label_text = f"{predicted_label} ({confidence*100:.1f}%)"
+            cv2.putText(frame, label_text, (10, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            cv2.imshow("Reconocimiento de herramientas", frame)
+            # Exit with 'q'
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+        # Text to speech only for confident, new labels
+        if speaker and predicted_label != last_prediction and confidence > args.speech_threshold:
+            speaker.say(predicted_label)
+            last_prediction = predicted_label
+
+    elapsed = time.perf_counter() - started
+    # The capture thread must be gone before the capture is released
+    stop_capture(threads[0], frames, stop_event)
+    cap.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+    summary = dict(stats.summary(elapsed), source=args.source)
+    summary["startup_ms"] = {phase: round(seconds * 1000, 1) for phase, seconds in bundle.timings.items()}
+    if first_frame_at is not None:
+        summary["startup_ms"]["first_frame"] = round((first_frame_at - started_main) * 1000, 1)
+    print(f"📈 {summary['output_fps']} FPS shown, {summary['inference_fps']} inferences/s "
+          f"({summary['frames_inferred']} inferred, {summary['frames_unchanged']} unchanged, "
+          f"{summary['frames_dropped_capture'] + summary['frames_dropped_inference']} dropped, "
+          f"{summary['frames_skipped']} skipped of {summary['frames_read']})")
+    print(f"   End-to-end latency p50 {summary['latency_ms']['p50']} ms, p95 {summary['latency_ms']['p95']} ms; "
+          f"inference {summary['inference_ms']['mean']} ms")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
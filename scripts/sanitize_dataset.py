@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Saneamiento del dataset en paralelo (sustituye a sh/limpiar_png.sh).
+
+Recorre ``data/Training/<versión>/<split>_data/<clase>/`` con un pool de procesos y, por imagen:
+
+- detecta ficheros corruptos o truncados (decodificación completa) y los mueve a cuarentena
+- aplica la orientación EXIF y elimina los metadatos (EXIF, ICC, XMP, textos PNG)
+- convierte a RGB (la transparencia se aplana sobre blanco)
+- normaliza el formato (``auto``: JPEG y PNG se mantienen, el resto pasa a JPEG)
+- opcionalmente reduce a ``--max-side`` píxeles el lado mayor
+
+Un registro (``sanitation.json`` en el dataset) guarda tamaño, mtime y MD5 de cada fichero
+ya saneado con los mismos ajustes, así que las re-ejecuciones solo abren los ficheros nuevos.
+
+Uso:
+    python scripts/sanitize_dataset.py --dataset data/Training/v1 [--max-side 1024] [--workers 8]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from PIL import Image, ImageOps
+
+LEDGER_NAME = "sanitation.json"
+QUARANTINE_DIR = "_quarantine"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff')
+# Claves de ``Image.info`` que se consideran metadatos a eliminar
+METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment", "photoshop")
+EXIF_ORIENTATION = 0x0112
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png"}
+# Solo estos errores al decodificar indican un fichero corrupto; los de escritura no
+DECODE_ERRORS = (OSError, SyntaxError, Image.DecompressionBombError)
+
+def load_json(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_json_atomic(data, file_path):
+    # Escribir y renombrar: nunca queda un JSON a medias si se interrumpe
+    tmp_path = file_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, file_path)
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_dataset(dataset_path):
+    """(ruta relativa, ruta absoluta, stat) de cada imagen en ``<split>_data/<clase>/``."""
+    files = []
+    with os.scandir(dataset_path) as split_entries:
+        split_dirs = [e for e in split_entries if e.is_dir() and e.name.endswith('_data')]
+    for split_entry in split_dirs:
+        with os.scandir(split_entry.path) as class_entries:
+            class_dirs = [e for e in class_entries if e.is_dir()]
+        for class_entry in class_dirs:
+            with os.scandir(class_entry.path) as image_entries:
+                for entry in image_entries:
+                    if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        rel_path = os.path.relpath(entry.path, dataset_path)
+                        files.append((rel_path, entry.path, entry.stat()))
+    return files
+
+def target_format(source_format, requested):
+    if requested == 'auto':
+        return source_format if source_format in FORMAT_EXTENSIONS else 'JPEG'
+    return requested.upper()
+
+def has_metadata(img):
+    if any(key in img.info for key in METADATA_KEYS):
+        return True
+    # Chunks de texto PNG (tEXt/iTXt/zTXt)
+    return bool(getattr(img, 'text', None))
+
+def flatten_to_rgb(img):
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+def unique_path(path):
+    base, ext = os.path.splitext(path)
+    candidate, n = path, 1
+    while os.path.exists(candidate):
+        candidate = f"{base}_{n}{ext}"
+        n += 1
+    return candidate
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def sanitize_file(task):
+    """Sanea un fichero en un proceso del pool; devuelve el resultado para el informe y el registro."""
+    dataset_path, rel_path, options = task
+    path = os.path.join(dataset_path, rel_path)
+    result = {"path": rel_path, "status": "ok", "actions": [], "bytes_before": os.path.getsize(path)}
+    try:
+        with Image.open(path) as img:
+            source_format = img.format
+            img.load()  # Decodificación completa: los truncados fallan aquí
+            actions = []
+            if has_metadata(img):
+                actions.append("strip_metadata")
+            fixed = img
+            if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+                fixed = ImageOps.exif_transpose(img)
+                actions.append("exif_orientation")
+            if fixed.mode != 'RGB':
+                actions.append(f"mode:{fixed.mode}->RGB")
+            fmt = target_format(source_format, options['format'])
+            if fmt != source_format:
+                actions.append(f"format:{source_format}->{fmt}")
+            max_side = options['max_side']
+            if max_side and max(fixed.size) > max_side:
+                actions.append(f"resize:{fixed.size[0]}x{fixed.size[1]}")
+            expected_ext = FORMAT_EXTENSIONS[fmt]
+            ext = os.path.splitext(rel_path)[1].lower()
+            if ext != expected_ext and not (fmt == 'JPEG' and ext == '.jpeg'):
+                actions.append(f"extension:{ext}->{expected_ext}")
+
+            if not actions:
+                return result
+            result["status"] = "changed"
+            result["actions"] = actions
+            if options['dry_run']:
+                return result
+
+            out = flatten_to_rgb(fixed)
+            if out is img:
+                out = img.copy()  # img se cierra al salir del with
+            if max_side and max(out.size) > max_side:
+                out.thumbnail((max_side, max_side), Image.LANCZOS)
+    except DECODE_ERRORS as e:
+        result["status"] = "corrupt"
+        result["error"] = f"{type(e).__name__}: {e}"
+        if not options['dry_run']:
+            quarantine_path = unique_path(os.path.join(dataset_path, QUARANTINE_DIR, rel_path))
+            os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+            shutil.move(path, quarantine_path)
+            result["quarantined_to"] = os.path.relpath(quarantine_path, dataset_path)
+        return result
+    except Exception as e:
+        result.update(status="error", actions=[], error=f"{type(e).__name__}: {e}")
+        return result
+
+    new_path = path
+    if any(a.startswith("extension:") for a in actions):
+        new_path = unique_path(os.path.splitext(path)[0] + expected_ext)
+    tmp_path = new_path + '.tmp'
+    try:
+        # Sin exif/icc_profile en save() y sin info: el escritor PNG toma icc_profile de im.info
+        out.info = {}
+        save_kwargs = {"quality": options['quality'], "optimize": True} if fmt == 'JPEG' else {"optimize": True}
+        out.save(tmp_path, format=fmt, **save_kwargs)
+        # Solo se da por saneado (y entra en el registro) si el fichero escrito ya no lleva metadatos
+        with Image.open(tmp_path) as written:
+            left = [key for key in METADATA_KEYS if key in written.info] + list(getattr(written, 'text', None) or {})
+        if left:
+            raise ValueError(f"metadatos tras reescribir: {', '.join(left)}")
+        os.replace(tmp_path, new_path)
+        if new_path != path:
+            try:
+                os.remove(path)
+            except OSError:
+                # No quedan dos copias: se deshace la escritura y el original sigue como estaba
+                remove_quietly(new_path)
+                raise
+    except Exception as e:
+        # Error de escritura (disco lleno, permisos, metadatos que persisten...): el original no se
+        # toca ni va a cuarentena
+        remove_quietly(tmp_path)
+        result.update(status="error", actions=[], error=f"{type(e).__name__}: {e}")
+        return result
+    if new_path != path:
+        result["renamed_from"] = rel_path
+        result["path"] = os.path.relpath(new_path, dataset_path)
+    result["bytes_after"] = os.path.getsize(new_path)
+    return result
+
+def ledger_entry(dataset_path, rel_path):
+    path = os.path.join(dataset_path, rel_path)
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "md5": file_md5(path)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Saneamiento paralelo de imágenes del dataset")
+    parser.add_argument('--dataset', required=True, help="Carpeta de la versión, ej: data/Training/v1")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', choices=['auto', 'jpeg', 'png'], default='auto',
+                        help="auto: mantiene JPEG/PNG y convierte el resto a JPEG")
+    parser.add_argument('--max-side', type=int, default=0, help="Reduce el lado mayor a este tamaño (0 = no)")
+    parser.add_argument('--quality', type=int, default=95, help="Calidad JPEG al reescribir")
+    parser.add_argument('--dry-run', action='store_true', help="Solo informa, no modifica nada")
+    parser.add_argument('--force', action='store_true', help="Ignora el registro y revisa todo")
+    parser.add_argument('--report', help="Ruta del informe (por defecto reports/<versión>/sanitation/)")
+    args = parser.parse_args()
+
+    dataset_path = args.dataset.rstrip('/')
+    version = os.path.basename(dataset_path)
+    options = {"format": args.format, "max_side": args.max_side, "quality": args.quality, "dry_run": args.dry_run}
+    settings_key = json.dumps({k: options[k] for k in ("format", "max_side", "quality")}, sort_keys=True)
+
+    ledger_path = os.path.join(dataset_path, LEDGER_NAME)
+    ledger = load_json(ledger_path) if os.path.exists(ledger_path) and not args.force else {}
+    # Con otros ajustes, lo ya saneado puede no cumplirlos: se revisa todo
+    known = ledger.get("files", {}) if ledger.get("settings") == settings_key else {}
+
+    started = time.perf_counter()
+    files = scan_dataset(dataset_path)
+    pending = [rel_path for rel_path, _, stat in files
+               if known.get(rel_path, {}).get("size") != stat.st_size
+               or known.get(rel_path, {}).get("mtime_ns") != stat.st_mtime_ns]
+    print(f"🧼 {dataset_path}: {len(files)} imágenes, {len(files) - len(pending)} ya saneadas, "
+          f"{len(pending)} por revisar con {args.workers} procesos")
+
+    results = []
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            tasks = [(dataset_path, rel_path, options) for rel_path in pending]
+            results = list(pool.map(sanitize_file, tasks, chunksize=max(1, len(tasks) // (args.workers * 8))))
+
+    summary = {"scanned": len(files), "skipped": len(files) - len(pending), "checked": len(pending),
+               "ok": 0, "changed": 0, "corrupt": 0, "error": 0, "actions": {}, "bytes_before": 0, "bytes_after": 0}
+    current = {rel_path for rel_path, _, _ in files}
+    files_ledger = {path: entry for path, entry in known.items() if path in current}
+    for result in results:
+        summary[result["status"]] += 1
+        for action in result["actions"]:
+            name = action.split(':', 1)[0]
+            summary["actions"][name] = summary["actions"].get(name, 0) + 1
+        if "bytes_after" in result:
+            summary["bytes_before"] += result["bytes_before"]
+            summary["bytes_after"] += result["bytes_after"]
+        files_ledger.pop(result.get("renamed_from", result["path"]), None)
+        # Los errores de escritura no se registran: se reintentan en la siguiente ejecución
+        if result["status"] not in ("corrupt", "error") and not args.dry_run:
+            files_ledger[result["path"]] = ledger_entry(dataset_path, result["path"])
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+
+    if not args.dry_run:
+        save_json_atomic({"settings": settings_key, "updated_at": datetime.now().isoformat(timespec='seconds'),
+                          "files": files_ledger}, ledger_path)
+
+    report_path = args.report or os.path.join(
+        'reports', version, 'sanitation', f"sanitation_report_{version}_{datetime.now():%Y%m%d%H%M%S}.json")
+    os.makedirs(os.path.dirname(report_path) or '.', exist_ok=True)
+    save_json_atomic({"dataset": dataset_path, "options": options, "summary": summary,
+                      "files": [r for r in results if r["status"] != "ok"]}, report_path)
+
+    print(f"✅ {summary['changed']} modificadas, {summary['corrupt']} corruptas "
+          f"(cuarentena en {os.path.join(dataset_path, QUARANTINE_DIR)}), {summary['ok']} sin cambios")
+    if summary["error"]:
+        print(f"⚠️ {summary['error']} no se pudieron reescribir (sin cambios, ver 'error' en el informe)")
+    if summary["actions"]:
+        print("   Acciones: " + ", ".join(f"{k}={v}" for k, v in sorted(summary["actions"].items())))
+    print(f"⏱️ {summary['elapsed_seconds']}s · informe: {report_path}")
+
+if __name__ == '__main__':
+    main()
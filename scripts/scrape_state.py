@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Persistent scraping job state of a dataset version, so interrupted runs resume.
+
+``data/Training/<version>/scrape_state.sqlite`` records:
+
+- classes: per-class progress, current search round and a lease (owner + expiry) so
+  several scraper processes can share the file while working on disjoint classes
+- terms: which search terms were already run in each round
+- urls: every URL seen with its outcome (pending / saved / rejected + reason / failed)
+
+A URL row is the claim on it: it is inserted once, so no process downloads it twice,
+rejected URLs are never fetched again and failed ones are retried up to a limit.
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import time
+
+STATE_FILENAME = "scrape_state.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classes (
+    class TEXT NOT NULL,
+    split TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    round INTEGER NOT NULL DEFAULT 1,
+    saved INTEGER NOT NULL DEFAULT 0,
+    target INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL,
+    updated_at REAL,
+    PRIMARY KEY (class, split)
+);
+CREATE TABLE IF NOT EXISTS terms (
+    class TEXT NOT NULL,
+    split TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    results INTEGER NOT NULL,
+    searched_at REAL NOT NULL,
+    PRIMARY KEY (class, split, round, term)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    class TEXT NOT NULL,
+    split TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    reason TEXT,
+    path TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_class ON urls(class, split, outcome);
+"""
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ScrapeState:
+    def __init__(self, version_dir, db_path=None, lease_seconds=120, max_url_attempts=3):
+        self.db_path = db_path or os.path.join(version_dir, STATE_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_url_attempts = max_url_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        # WAL + NORMAL: concurrent readers, and no fsync on every per-URL commit
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------------- classes ----------------
+
+    def _lease_is_stale(self, owner, lease_expires, now):
+        if owner is None or owner == self.owner or lease_expires is None or lease_expires < now:
+            return True
+        # A crashed process on this host does not have to wait for its lease to expire
+        host, _, pid = owner.rpartition(":")
+        return host == socket.gethostname() and pid.isdigit() and not _pid_alive(int(pid))
+
+    def claim_class(self, name, split, target):
+        """Takes the class lease; returns the row as a dict, or None if another live process holds it."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO classes (class, split, target, updated_at) VALUES (?, ?, ?, ?)",
+                (name, split, target, now))
+            status, round_number, owner, lease_expires = self.conn.execute(
+                "SELECT status, round, owner, lease_expires FROM classes WHERE class = ? AND split = ?",
+                (name, split)).fetchone()
+            if not self._lease_is_stale(owner, lease_expires, now):
+                self.conn.execute("ROLLBACK")
+                return None
+            self.conn.execute(
+                "UPDATE classes SET owner = ?, lease_expires = ?, status = 'running', target = ?, updated_at = ?"
+                " WHERE class = ? AND split = ?",
+                (self.owner, now + self.lease_seconds, target, now, name, split))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return {"status": status, "round": round_number, "resumed": status == "running"}
+
+    def renew(self, name, split, saved):
+        now = time.time()
+        self.conn.execute(
+            "UPDATE classes SET lease_expires = ?, saved = ?, updated_at = ? WHERE class = ? AND split = ? AND owner = ?",
+            (now + self.lease_seconds, saved, now, name, split, self.owner))
+
+    def release_class(self, name, split, status, saved):
+        self.conn.execute(
+            "UPDATE classes SET status = ?, saved = ?, owner = NULL, lease_expires = NULL, updated_at = ?"
+            " WHERE class = ? AND split = ? AND owner = ?",
+            (status, saved, time.time(), name, split, self.owner))
+
+    def advance_round(self, name, split):
+        self.conn.execute("UPDATE classes SET round = round + 1 WHERE class = ? AND split = ?", (name, split))
+        return self.conn.execute("SELECT round FROM classes WHERE class = ? AND split = ?", (name, split)).fetchone()[0]
+
+    # ---------------- terms ----------------
+
+    def searched_terms(self, name, split, round_number):
+        rows = self.conn.execute("SELECT term FROM terms WHERE class = ? AND split = ? AND round = ?",
+                                 (name, split, round_number))
+        return {term for (term,) in rows}
+
+    def record_term(self, name, split, round_number, term, results):
+        self.conn.execute("INSERT OR REPLACE INTO terms VALUES (?, ?, ?, ?, ?, ?)",
+                          (name, split, round_number, term, results, time.time()))
+
+    # ---------------- urls ----------------
+
+    def claim_url(self, url, name, split, outcome="pending", reason=None):
+        """Inserts the URL; False when any run already knows it (saved, rejected, failed or queued)."""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO urls (url, class, split, outcome, reason, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, name, split, outcome, reason, time.time()))
+        return cursor.rowcount == 1
+
+    def frontier(self, name, split):
+        """URLs this class queued but never finished, plus failures that still have attempts left."""
+        rows = self.conn.execute(
+            "SELECT url FROM urls WHERE class = ? AND split = ?"
+            " AND (outcome = 'pending' OR (outcome = 'failed' AND attempts < ?))",
+            (name, split, self.max_url_attempts))
+        return [url for (url,) in rows]
+
+    def record_outcome(self, url, outcome, reason=None, path=None):
+        self.conn.execute("UPDATE urls SET outcome = ?, reason = ?, path = ?, updated_at = ? WHERE url = ?",
+                          (outcome, reason, path, time.time(), url))
+
+    def record_failure(self, url, reason=None):
+        self.conn.execute(
+            "UPDATE urls SET outcome = 'failed', reason = ?, attempts = attempts + 1, updated_at = ? WHERE url = ?",
+            (reason, time.time(), url))
+
+    # ---------------- reporting ----------------
+
+    def class_progress(self):
+        return self.conn.execute(
+            "SELECT class, split, status, round, saved, target, owner FROM classes ORDER BY split, class").fetchall()
+
+    def outcome_counts(self):
+        return self.conn.execute(
+            "SELECT outcome, COALESCE(reason, ''), COUNT(*) FROM urls GROUP BY outcome, reason ORDER BY 3 DESC").fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the scraping job state of a dataset version")
+    parser.add_argument("--dataset", required=True, help="Dataset version directory, e.g. data/Training/v1")
+    args = parser.parse_args()
+
+    state = ScrapeState(args.dataset)
+    print(f"🗂️ {state.db_path}")
+    for name, split, status, round_number, saved, target, owner in state.class_progress():
+        print(f"   {split}/{name}: {status} {saved}/{target} (round {round_number}{', ' + owner if owner else ''})")
+    print("   URLs:")
+    for outcome, reason, count in state.outcome_counts():
+        print(f"      {outcome}{' (' + reason + ')' if reason else ''}: {count}")
+    state.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Local stand-in for the image search and the image hosts, to benchmark the scraper offline.
+
+GET /search?q=<term>&max_results=N returns [{"image": url}, ...] in DuckDuckGo's shape.
+Image URLs are spread over several loopback hosts (127.0.0.1, 127.0.0.2, ...) so the
+scraper's per-domain pools and rate limits are exercised. Each host serves a
+robots.txt with an optional crawl delay, and a configurable share of the results
+are duplicates, tiny images, oversized images, SVGs or non-images. ``--chunked``
+drops Content-Length so size limits must be enforced while streaming.
+
+Usage:
+    python scripts/scraper_stub_server.py --port 8900 --hosts 4 --latency-ms 50
+    # scraping config: "pipeline": {"search_endpoint": "http://127.0.0.1:8900/search"}
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+from io import BytesIO
+
+from aiohttp import web
+from PIL import Image
+
+def render_image(seed, size):
+    """Deterministic JPEG whose bytes depend only on the seed."""
+    rng = random.Random(seed)
+    img = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(8):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        box = (x0, y0, min(size[0], x0 + rng.randrange(10, 120)), min(size[1], y0 + rng.randrange(10, 120)))
+        img.paste(tuple(rng.randrange(256) for _ in range(3)), box)
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+def render_large_image(size=(3000, 2000)):
+    """Incompressible noise JPEG, several MB, to exercise max_file_size_mb."""
+    img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+def every(index, n):
+    """True for the last index of each block of n; 0 disables the case."""
+    return bool(n) and index % n == n - 1
+
+def create_stub_app(args):
+    image_cache = {}
+    stats = {"searches": 0, "images": 0, "bytes": 0}
+
+    def image_url(term, index):
+        host = f"127.0.0.{index % args.hosts + 1}"
+        digest = hashlib.md5(term.encode("utf-8")).hexdigest()[:8]
+        # Every `duplicate_every`-th result points at content already served for this term
+        if args.duplicate_every and index and index % args.duplicate_every == 0:
+            return f"http://{host}:{args.port}/img/{digest}/dup{index}.jpg?same={index - 1}"
+        if every(index, args.svg_every):
+            return f"http://{host}:{args.port}/img/{digest}/{index}.svg"
+        return f"http://{host}:{args.port}/img/{digest}/{index}.jpg"
+
+    async def search(request):
+        term = request.query.get("q", "")
+        max_results = int(request.query.get("max_results", 30))
+        stats["searches"] += 1
+        await asyncio.sleep(args.search_latency_ms / 1000)
+        return web.json_response([{"image": image_url(term, i), "title": term} for i in range(max_results)])
+
+    async def robots(request):
+        lines = ["User-agent: *", "Allow: /"]
+        if args.crawl_delay:
+            lines.append(f"Crawl-delay: {args.crawl_delay}")
+        return web.Response(text="\n".join(lines) + "\n")
+
+    async def image(request):
+        await asyncio.sleep(args.latency_ms / 1000)
+        name = request.match_info["name"]
+        index = int(request.query.get("same", name.split(".")[0].removeprefix("dup")))
+        key = (request.match_info["digest"], index)
+        if name.endswith(".svg"):
+            body, content_type = b'<svg xmlns="http://www.w3.org/2000/svg"/>', "image/svg+xml"
+        elif every(index, args.bad_every):
+            body, content_type = b"<html>not an image</html>", "text/html"
+        elif every(index, args.large_every):
+            if "large" not in image_cache:
+                image_cache["large"] = render_large_image()
+            body, content_type = image_cache["large"], "image/jpeg"
+        else:
+            size = (32, 32) if every(index, args.tiny_every) else tuple(args.size)
+            if key not in image_cache:
+                image_cache[key] = render_image(f"{key[0]}-{index}", size)
+            body, content_type = image_cache[key], "image/jpeg"
+        stats["images"] += 1
+        if not args.chunked:
+            stats["bytes"] += len(body)
+            return web.Response(body=body, content_type=content_type)
+        resp = web.StreamResponse(headers={"Content-Type": content_type})
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        try:
+            for start in range(0, len(body), 16 * 1024):
+                await resp.write(body[start:start + 16 * 1024])
+                stats["bytes"] += len(body[start:start + 16 * 1024])
+            await resp.write_eof()
+        except (ConnectionResetError, RuntimeError):
+            pass  # The scraper aborted the download early
+        return resp
+
+    async def stub_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/search", search)
+    app.router.add_get("/robots.txt", robots)
+    app.router.add_get("/img/{digest}/{name}", image)
+    app.router.add_get("/stats", stub_stats)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub search/image server for scraper benchmarks")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--hosts", type=int, default=4, help="Loopback hosts the image URLs are spread over")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Delay before each image response")
+    parser.add_argument("--search-latency-ms", type=float, default=200)
+    parser.add_argument("--crawl-delay", type=float, default=0, help="Crawl-delay advertised in robots.txt")
+    parser.add_argument("--size", type=int, nargs=2, default=(640, 480))
+    parser.add_argument("--duplicate-every", type=int, default=10)
+    parser.add_argument("--tiny-every", type=int, default=15)
+    parser.add_argument("--bad-every", type=int, default=20)
+    parser.add_argument("--large-every", type=int, default=25)
+    parser.add_argument("--svg-every", type=int, default=30)
+    parser.add_argument("--chunked", action="store_true", help="Stream bodies without Content-Length")
+    args = parser.parse_args()
+
+    # 0.0.0.0 so every 127.0.0.x alias reaches the same server
+    web.run_app(create_stub_app(args), host="0.0.0.0", port=args.port)
+
+if __name__ == "__main__":
+    main()
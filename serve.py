@@ -0,0 +1,164 @@
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+def resolve_server_settings(config, args):
+    """Combina la sección ``server`` del config con los flags de la línea de comandos."""
+    server_config = config.get("server", {})
+    workers = args.workers or server_config.get("workers") or os.cpu_count() or 1
+    cores = os.cpu_count() or 1
+    return {
+        "host": args.host or server_config.get("host", "0.0.0.0"),
+        "port": args.port or server_config.get("port", 5000),
+        "workers": workers,
+        # Por defecto se reparten los núcleos entre workers para no sobresuscribir la CPU
+        "intra_op_threads": server_config.get("intra_op_threads") or max(1, cores // workers),
+        "inter_op_threads": server_config.get("inter_op_threads") or 1,
+        "backlog": server_config.get("backlog", 2048),
+        # Relanzamiento de workers que mueren antes de estar listos: espera exponencial y límite
+        "restart_backoff_seconds": server_config.get("restart_backoff_seconds", 1.0),
+        "max_restart_backoff_seconds": server_config.get("max_restart_backoff_seconds", 60.0),
+        "max_startup_failures": server_config.get("max_startup_failures", 5)
+    }
+
+def bind_socket(host, port, backlog):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def configure_worker_threads(config, intra_op_threads, inter_op_threads):
+    """Límites de hilos por worker; debe ejecutarse antes de que TensorFlow se inicialice."""
+    for name in ("TF_NUM_INTRAOP_THREADS", "OMP_NUM_THREADS"):
+        os.environ[name] = str(intra_op_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+
+    if config.get("inference", {}).get("backend", "keras") == "keras":
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+def run_worker(worker_id, config, settings, listen_fd, ready_flags):
+    # El modelo se carga después del fork: cada worker tiene su propia copia (shared-nothing)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_worker_threads(config, settings["intra_op_threads"], settings["inter_op_threads"])
+
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    started = time.perf_counter()
+    app = create_app(config)
+    app.config["WORKERS_STATUS"] = lambda: {"ready": sum(ready_flags), "total": settings["workers"]}
+
+    server = make_server(settings["host"], settings["port"], app, threaded=True, fd=listen_fd)
+
+    def _shutdown(signum, frame):
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    # Listo solo ahora: a partir de serve_forever este worker acepta conexiones del socket compartido
+    app.config["MODEL_READY"] = True
+    ready_flags[worker_id] = 1
+    print(f"✅ Worker {worker_id} (pid {os.getpid()}) listo en {time.perf_counter() - started:.1f}s")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="IAVisionPay API (servidor de producción multi-proceso)")
+    parser.add_argument("--config", required=True, help="Ruta del archivo de configuración JSON")
+    parser.add_argument("--workers", type=int, help="Número de procesos worker (por defecto: núcleos)")
+    parser.add_argument("--host", help="Host de escucha")
+    parser.add_argument("--port", type=int, help="Puerto de escucha")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    settings = resolve_server_settings(config, args)
+
+    # El socket se abre una sola vez en el proceso padre y lo heredan todos los workers
+    listen_socket = bind_socket(settings["host"], settings["port"], settings["backlog"])
+    context = multiprocessing.get_context("fork")
+    # Un flag por worker: al morir solo se descuenta si había llegado a estar listo
+    ready_flags = context.Array("b", settings["workers"])
+
+    print(f"🚀 Iniciando {settings['workers']} workers en {settings['host']}:{settings['port']} "
+          f"(intra_op={settings['intra_op_threads']}, inter_op={settings['inter_op_threads']})")
+
+    def spawn(worker_id):
+        process = context.Process(
+            target=run_worker,
+            args=(worker_id, config, settings, listen_socket.fileno(), ready_flags),
+            name=f"iavision-worker-{worker_id}",
+            daemon=False
+        )
+        process.start()
+        return process
+
+    workers = {worker_id: spawn(worker_id) for worker_id in range(settings["workers"])}
+    stopping = False
+    exit_code = 0
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    # Supervisión: relanza los workers que mueran inesperadamente. Los que mueren sin llegar a
+    # estar listos (p. ej. falta el modelo) se relanzan con espera exponencial y, tras
+    # max_startup_failures intentos seguidos, se abandonan
+    startup_failures = {worker_id: 0 for worker_id in workers}
+    respawn_at = {}
+    while not stopping:
+        time.sleep(1)
+        now = time.monotonic()
+        for worker_id, process in list(workers.items()):
+            if process is None:
+                if now >= respawn_at[worker_id] and not stopping:
+                    workers[worker_id] = spawn(worker_id)
+                continue
+            if process.is_alive() or stopping:
+                continue
+            if ready_flags[worker_id]:
+                ready_flags[worker_id] = 0
+                startup_failures[worker_id] = 0
+                print(f"⚠️ Worker {worker_id} terminó (exit {process.exitcode}), relanzando")
+                workers[worker_id] = spawn(worker_id)
+                continue
+            startup_failures[worker_id] += 1
+            if startup_failures[worker_id] >= settings["max_startup_failures"]:
+                print(f"❌ Worker {worker_id} falló al arrancar {startup_failures[worker_id]} veces seguidas "
+                      f"(exit {process.exitcode}); no se relanza más")
+                del workers[worker_id]
+                continue
+            delay = min(settings["max_restart_backoff_seconds"],
+                        settings["restart_backoff_seconds"] * 2 ** (startup_failures[worker_id] - 1))
+            print(f"⚠️ Worker {worker_id} terminó antes de estar listo (exit {process.exitcode}), "
+                  f"reintento {startup_failures[worker_id]} en {delay:.0f}s")
+            workers[worker_id] = None
+            respawn_at[worker_id] = now + delay
+        if not workers:
+            print("❌ Ningún worker pudo arrancar; revisa el config y el modelo")
+            exit_code = 1
+            break
+
+    print("🛑 Deteniendo workers...")
+    running = [process for process in workers.values() if process is not None]
+    for process in running:
+        process.terminate()
+    for process in running:
+        process.join(timeout=10)
+    listen_socket.close()
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,17 @@
 #!/bin/bash
 
-# Rutas a limpiar
-TRAIN_DIR="data/Training/v1/train_data"
-VAL_DIR="data/Training/v1/validation_data"
+# Saneamiento del dataset (metadatos, orientación EXIF, corruptos, formato) en paralelo.
+# Sustituye al antiguo bucle de `mogrify -strip`, que solo trataba PNGs y de uno en uno.
+# Uso: sh/limpiar_png.sh [versión] [opciones extra de scripts/sanitize_dataset.py]
 
-echo "🧼 Limpiando metadatos PNG en: $TRAIN_DIR y $VAL_DIR"
+VERSION="${1:-v1}"
+[ $# -gt 0 ] && shift
+DATASET_DIR="data/Training/$VERSION"
 
-# Verifica que ImageMagick esté instalado
-if ! command -v mogrify &> /dev/null; then
-    echo "❌ Error: ImageMagick no está instalado."
-    echo "➡️ Instálalo con: sudo yum install -y ImageMagick (EC2)"
+if [ ! -d "$DATASET_DIR" ]; then
+    echo "⚠️ Directorio no encontrado: $DATASET_DIR"
     exit 1
 fi
 
-# Limpieza recursiva
-for DIR in "$TRAIN_DIR" "$VAL_DIR"; do
-  if [ -d "$DIR" ]; then
-    find "$DIR" -type f -iname '*.png' -exec mogrify -strip {} \;
-    echo "✅ Limpieza completada en: $DIR"
-  else
-    echo "⚠️ Directorio no encontrado: $DIR"
-  fi
-done
+echo "🧼 Saneando imágenes en: $DATASET_DIR"
+python3 scripts/sanitize_dataset.py --dataset "$DATASET_DIR" "$@"
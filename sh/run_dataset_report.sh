@@ -27,4 +27,5 @@ echo
 python scripts/dataset_report_generator.py \
   --dataset_path "$DATASET_PATH" \
   --targets      "$TARGETS_FILE" \
-  --output       "$OUTPUT_FILE"
+  --output       "$OUTPUT_FILE" \
+  --stats